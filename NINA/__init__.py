@@ -1,6 +1,8 @@
 """Project: NINA - A battle royale simualtion engine, with a discor bot UI.
 
 This is the main module for the bot. It contains the entry point for the bot.
+Importing it is cheap and has no side effects, the bot itself is only imported by `start_bot`.
+So is the engine, in `NINA.ext.NINA`, which doesn't need discord.py or Pillow until it renders.
 
 Typical usage example:
     For a standard startup, use start_bot.
@@ -21,11 +23,6 @@ import logging
 import signal
 import sys
 
-import colorama
-import discord
-from discord.ext import commands
-
-from NINA import bot
 from NINA.data import config
 from NINA.data import const
 
@@ -37,7 +34,6 @@ def sigint_handler(sign, frame):
     sys.exit(0)
 
 
-signal.signal(signal.SIGINT, sigint_handler)
 logger = logging.getLogger("NINA.launchpad")
 
 
@@ -47,64 +43,47 @@ async def start_bot(conf: config.Config, debug: bool = False) -> None:
     Also sets up logging.
     Also handles neat shutdown.
     """
+    # pylint: disable=import-outside-toplevel
+    import colorama
+    import discord
+    from discord.ext import commands
+
+    from NINA import bot
+    from NINA.ext import lazy
+    from NINA.ext import logs
+
+    signal.signal(signal.SIGINT, sigint_handler)
     colorama.just_fix_windows_console()
     print("Beginning setup...")
     if debug:
         print(colorama.Fore.RED + colorama.Style.BRIGHT + "DEBUG MODE ACTIVE!" + colorama.Style.RESET_ALL)
     try:
-        # Set up logging
+        # Set up logging, written to the file by a thread so logging never waits for the disk
         dt_fmr = "%Y-%m-%d %H:%M:%S"
-        const.HANDLER.setFormatter(logging.Formatter("%(asctime)s:%(levelname)s:%(name)s: %(message)s", dt_fmr))
+        file_handler = const.setup_handler()
+        file_handler.setFormatter(logging.Formatter("%(asctime)s:%(levelname)s:%(name)s: %(message)s", dt_fmr))
+        handler = logs.start(file_handler)
 
-        # Set up setup logging
-        logger.setLevel(logging.INFO)
-        logger.addHandler(const.HANDLER)
+        # Set up logging for every NINA module at once, they all log under the NINA logger
+        nina_logger = logging.getLogger("NINA")
+        nina_logger.setLevel(logging.INFO)
+        nina_logger.addHandler(handler)
 
         # Set up asyncio logging
         async_logger = logging.getLogger("asyncio")
         async_logger.setLevel(logging.INFO)
-        async_logger.addHandler(const.HANDLER)
-
-        # Set up botcore logging
-        core_logger = logging.getLogger("NINA.botcore")
-        core_logger.setLevel(logging.INFO)
-        core_logger.addHandler(const.HANDLER)
-
-        # Set up error handling logging
-        err_logger = logging.getLogger("NINA.commanderrorhandler")
-        err_logger.setLevel(logging.INFO)
-        err_logger.addHandler(const.HANDLER)
-
-        # Set up override logging
-        ovrd_logger = logging.getLogger("NINA.override")
-        ovrd_logger.setLevel(logging.INFO)
-        ovrd_logger.addHandler(const.HANDLER)
-
-        # Set up core command logging
-        corecmd_logger = logging.getLogger("NINA.core")
-        corecmd_logger.setLevel(logging.INFO)
-        corecmd_logger.addHandler(const.HANDLER)
-
-        # Set up simulation logging
-        sim_logger = logging.getLogger("NINA.simulation")
-        sim_logger.setLevel(logging.INFO)
-        sim_logger.addHandler(const.HANDLER)
+        async_logger.addHandler(handler)
 
         # Set up discord.py logging
         dscrd_logger = logging.getLogger("discord")
         dscrd_logger.setLevel(logging.INFO)
-        dscrd_logger.addHandler(const.HANDLER)
+        dscrd_logger.addHandler(handler)
 
         logger.info("Logging set up.")
 
         if debug:
-            logger.setLevel(logging.DEBUG)
+            nina_logger.setLevel(logging.DEBUG)
             async_logger.setLevel(logging.DEBUG)
-            corecmd_logger.setLevel(logging.DEBUG)
-            err_logger.setLevel(logging.DEBUG)
-            ovrd_logger.setLevel(logging.DEBUG)
-            corecmd_logger.setLevel(logging.DEBUG)
-            sim_logger.setLevel(logging.DEBUG)
             dscrd_logger.setLevel(logging.DEBUG)
     # pylint: disable=broad-except
     except Exception as e:
@@ -115,6 +94,18 @@ async def start_bot(conf: config.Config, debug: bool = False) -> None:
         return
     print(f"LOGGING: {const.OK}")
 
+    # The rendering modules are only imported lazily. Load them now, before renders start running in threads.
+    try:
+        logger.info("Preloaded %s.", ", ".join(lazy.preload()))
+    # pylint: disable=broad-except
+    except Exception as e:
+        logger.exception("Failed to load the rendering modules.")
+        print(f"RENDERING: {const.FAILED}")
+        print(f"ERROR: {e}")
+        print("Aborting...")
+        return
+    print(f"RENDERING: {const.OK}")
+
     # Create bot instance
     try:
         bot_instance = bot.NINABot(
@@ -1,6 +1,6 @@
 """This main bot class module for the Project: NINA bot.
 
-A module that contains purely the bot class - `NINABot`.
+A module that contains the bot class - `NINABot`, and the command tree it uses.
 It's a subclass of `discord.ext.commands.Bot`.
 It's not sharded, as it's not meant for use in more than one server.
 
@@ -15,21 +15,37 @@ Typical usage example:
 # Copyright (c) 2023-present Tech. TTGames
 
 import logging
-import pathlib
 
 import aiohttp
 import discord
+from discord import app_commands
 from discord.ext import commands
 
 from NINA import cogs
 from NINA.data import config
 from NINA.data import const
+from NINA.ext import games
 from NINA.ext import http
-from NINA.ext.NINA import Simulation
+from NINA.ext import metrics
+from NINA.ext import NINA
+from NINA.ext import outbound
+from NINA.ext import prefetch
+from NINA.ext import spans
+from NINA.ext import workers
 
 logger = logging.getLogger("NINA.botcore")
 
 
+class MeteredTree(app_commands.CommandTree):
+    """A command tree timing the commands it runs, see `metrics.COMMANDS`."""
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.type is discord.InteractionType.application_command:
+            command = interaction.command
+            metrics.started(interaction.id, command.qualified_name if command else "unknown")
+        return True
+
+
 class NINABot(commands.Bot):
     """The main bot class for the Project: NINA bot.
 
@@ -39,10 +55,14 @@ class NINABot(commands.Bot):
 
     Attributes:
         stat_confg: The config for the bot.
+        http_middleware: The middleware of the HTTP session, holding its retry and rate limit metrics.
+        games: The games hosted by the bot, one per channel.
+        metrics_server: The server of the metrics, if they're served.
     """
     stat_confg: config.Config
-    sim: Simulation | None
-    basp: pathlib.Path
+    http_middleware: http.ResilientMiddleware
+    games: games.GameRegistry
+    metrics_server: metrics.MetricsServer | None
 
     def __init__(self, *args, confg: config.Config | None, **kwargs) -> None:
         """Initialises the bot instance.
@@ -57,12 +77,50 @@ class NINABot(commands.Bot):
         """
         if confg is None:
             confg = config.Config()
-        super().__init__(*args, **kwargs)
+        # Tracing Discord's requests tells when interactions are acknowledged.
+        super().__init__(*args, tree_cls=MeteredTree, http_trace=metrics.trace_config(), **kwargs)
         self.stat_confg = confg
         self.full_tree = None
         headers = {"User-agent": f"{type(self).__name__}/{const.VERSION[1:]}"}
-        self.httpsession = aiohttp.ClientSession(headers=headers, middlewares=(http.create_retry_middleware(1),))
-        self.sim = None
+        self.http_middleware = http.ResilientMiddleware(attempts=confg.get("http_retries", 3))
+        # Most requests go to the same few CDNs, so connections are kept alive and lookups cached.
+        connector = aiohttp.TCPConnector(limit=64,
+                                         limit_per_host=confg.get("http_per_host", 8),
+                                         ttl_dns_cache=300,
+                                         keepalive_timeout=60)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=30)
+        self.httpsession = aiohttp.ClientSession(headers=headers,
+                                                 connector=connector,
+                                                 timeout=timeout,
+                                                 middlewares=(self.http_middleware,))
+        self.games = games.GameRegistry(NINA.DATA_DIR / "games")
+        NINA.ARCHIVE_RENDERS = confg.get("archive_renders", False)
+        NINA.TILE_CACHE.budget = confg.get("tile_cache_mb", 256) * 1024 * 1024
+        NINA.BOARD_CACHE.budget = confg.get("board_cache_mb", 128) * 1024 * 1024
+        NINA.EVENT_BATCH = confg.get("event_batch", 10)
+        outbound.SCHEDULER.rate = confg.get("send_rate", outbound.RATE)
+        NINA.IMAGE_STORE.budget = confg.get("image_store_mb", 1024) * 1024 * 1024
+        NINA.VARIANT_STORE.budget = confg.get("variant_store_mb", 256) * 1024 * 1024
+        NINA.VARIANT_MAX_AGE = confg.get("variant_max_age_days", 30) * 24 * 60 * 60
+        prefetch.PER_HOST = confg.get("prefetch_per_host", 4)
+        prefetch.REVALIDATE_AFTER = confg.get("revalidate_after_hours", 24) * 60 * 60
+        prefetch.MAX_SIZE = confg.get("max_download_mb", 32) * 1024 * 1024
+        workers.POOL.workers = confg.get("render_workers", 2)
+        spans.ENABLED = confg.get("spans", False)
+        self.metrics_server = None
+        if confg.get("metrics_port", 0):
+            # The caches and stores can be replaced, so they're looked up on every scrape.
+            # pylint: disable=unnecessary-lambda
+            self.metrics_server = metrics.MetricsServer(
+                confg.get("metrics_host", "127.0.0.1"), confg.get("metrics_port", 0), {
+                    "outbound": outbound.SCHEDULER.totals,
+                    "tile_cache": lambda: NINA.TILE_CACHE.stats(),
+                    "board_cache": lambda: NINA.BOARD_CACHE.stats(),
+                    "image_store": lambda: NINA.IMAGE_STORE.stats(),
+                    "variant_store": lambda: NINA.VARIANT_STORE.stats(),
+                    "http": self.http_middleware.metrics.stats,
+                    "workers": workers.POOL.stats,
+                })
 
     async def setup_hook(self) -> None:
         """Runs just before the bot connects to Discord.
@@ -74,6 +132,7 @@ class NINABot(commands.Bot):
         logger.info("Project: NINA version: %s", const.VERSION)
         logger.info("Discord.py version: %s", discord.__version__)
         logger.info("Discord username: %s", self.user.name)
+        await NINA.load_stores()
         logger.info("Loading cogs...")
         for extension in cogs.EXTENSIONS:
             try:
@@ -82,6 +141,16 @@ class NINABot(commands.Bot):
                 logger.error("Failed to load cog %s: %s", extension, err)
         self.full_tree = await self.tree.fetch_commands()
         logger.info("Finished loading cogs.")
+        if self.metrics_server is not None:
+            try:
+                await self.metrics_server.start()
+            except OSError as err:
+                logger.error("Failed to serve metrics: %s", err)
+
+    async def on_app_command_completion(self, interaction: discord.Interaction,
+                                        _command: app_commands.Command | app_commands.ContextMenu) -> None:
+        """Counts the latency of a completed command. Failed ones are counted by the error handler."""
+        metrics.completed(interaction.id, "ok")
 
     async def close(self) -> None:
         """Closes the bot.
@@ -90,5 +159,8 @@ class NINABot(commands.Bot):
         We additionally clean up the database engine/pool.
         """
         logger.info("Closing bot...")
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
         await self.httpsession.close()
+        workers.POOL.shutdown()
         return await super().close()
@@ -16,24 +16,27 @@ Typical usage example:
 # Copyright (c) 2023-present Tech. TTGames
 
 import asyncio
+import itertools
 import logging
-import os
 import random
-import shutil
 
 import discord
 from discord import app_commands
 from discord.ext import commands
-import owo
 
 from NINA import bot
-from NINA.data.const import PROG_DIR
 from NINA.ext import checks
 from NINA.ext import exceptions
+from NINA.ext import games
+from NINA.ext import imgops
 from NINA.ext import NINA
-from NINA.ext.NINA import Tribute
+from NINA.ext import outbound
+from NINA.ext import prefetch
+from NINA.ext import storage
 
 logger = logging.getLogger("NINA.core")
+PROGRESS_INTERVAL = 2
+"""The amount of seconds between progress updates of long running commands."""
 
 
 async def tribute_autocomplete(
@@ -46,13 +49,16 @@ async def tribute_autocomplete(
         interaction: The interaction requesting autocompletion.
         current: The current input in the field.
     """
-    choices = []
-    for tribute in interaction.client.sim.cast:
-        if len(choices) >= 25:
-            break
-        if current.lower() in tribute.name.lower():
-            choices.append(app_commands.Choice(name=tribute.name, value=tribute.name))
-    return choices
+    sim = (await interaction.client.games.get(interaction)).sim
+    if sim is None or sim.names is None:
+        return []
+    return [app_commands.Choice(name=tribute.name, value=tribute.name) for tribute in sim.names.search(current)]
+
+
+def _progress_done(future: asyncio.Future) -> None:
+    """Reports a progress update that failed, as nothing waits for it."""
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning("Could not update the progress: %s", future.exception())
 
 
 class Core(commands.Cog, name="SimCore"):
@@ -61,6 +67,7 @@ class Core(commands.Cog, name="SimCore"):
     This cog contains the commands that are used to interact with the simulation
     via the Discord bot. This includes commands to import data, ready up, run a cycle,
     check the status, and more.
+    Every channel hosts its own game, see `NINA.ext.games`. Commands changing a game hold its lock.
     """
 
     def __init__(self, bot_instance: bot.NINABot) -> None:
@@ -74,29 +81,21 @@ class Core(commands.Cog, name="SimCore"):
             bot_instance: The bot instance.
         """
         self._bt = bot_instance
-        self._dir = PROG_DIR / "data"
-        os.makedirs(self._dir, exist_ok=True)
-        self.owo_toggwe = False
-        if self._bt.sim is None:
-            cast_fi, events_fi = self._dir / "cast.toml", self._dir / "events.toml"
-            if cast_fi.exists() and events_fi.exists():
-                try:
-                    self._bt.sim = NINA.Simulation(cast_fi, events_fi, self.owo_toggwe)
-                    logger.info("Loaded last simulation data.")
-                except (ValueError, KeyError):
-                    self._bt.sim = None
-                    os.remove(cast_fi)
-                    os.remove(events_fi)
-                    logger.info("Local files invalid/corrupt. Purged from system.")
-            self._bt.basp = self._dir
-        self.lock = False
         logger.info("Loaded %s", self.__class__.__name__)
 
-    def t(self, string: str) -> str:
-        """Adjusts text according to the current owo_toggwe mode."""
-        if self.owo_toggwe:
-            return owo.owo(string)
-        return string
+    async def _game(self, ctx: discord.Interaction) -> games.Game:
+        """The game of the channel of an interaction.
+
+        Args:
+            ctx: The interaction context.
+
+        Raises:
+            `NINA.exceptions.UsageError`: The game is busy with another command.
+        """
+        game = await self._bt.games.get(ctx)
+        if game.lock.locked():
+            raise exceptions.UsageError("Bot simulation lock active.")
+        return game
 
     @app_commands.command(
         name="setup",
@@ -120,21 +119,19 @@ class Core(commands.Cog, name="SimCore"):
             cast: The cast attachment.
             events: The events attachment.
         """
-        if self.lock:
-            raise exceptions.UsageError("Bot cog lock active.")
-        self.lock = True
-        t = self.t
-        logger.info("Setting up simulation for %s.", ctx.user.name)
-        await ctx.response.defer(thinking=True, ephemeral=True)
-        cast_fi, events_fi = self._dir / "cast.toml", self._dir / "events.toml"
-        async with ctx.channel.typing():
-            with open(cast_fi, "wb") as f:
-                f.write(await cast.read())
-            with open(events_fi, "wb") as f:
-                f.write(await events.read())
-        self.lock = False
+        game = await self._game(ctx)
+        async with game.lock:
+            t = game.t
+            logger.info("Setting up simulation %s for %s.", game.key, ctx.user.name)
+            await ctx.response.defer(thinking=True, ephemeral=True)
+            async with ctx.channel.typing():
+                try:
+                    await asyncio.gather(storage.save_attachment(self._bt.httpsession, cast, game.cast_file),
+                                         storage.save_attachment(self._bt.httpsession, events, game.events_file))
+                except ValueError as err:
+                    raise exceptions.UsageError(str(err)) from err
         await ctx.followup.send(t("Configuration loaded."), ephemeral=True)
-        logger.info("Simulation set up for %s.", ctx.user.name)
+        logger.info("Simulation %s set up for %s.", game.key, ctx.user.name)
 
     @app_commands.command(
         name="ready",
@@ -169,11 +166,15 @@ class Core(commands.Cog, name="SimCore"):
             recolor_dc: Whether to recolor the districts.
             owo_toggwe: Whether to owo_toggwe everything.
         """
-        if self.lock:
-            raise exceptions.UsageError("Bot simulation lock active.")
-        self.lock = True
-        cast_fi, events_fi = self._dir / "cast.toml", self._dir / "events.toml"
-        if not cast_fi.exists() or not events_fi.exists():
+        game = await self._game(ctx)
+        async with game.lock:
+            await self._ready(ctx, game, seed, randomize_dc, recolor_dc, owo_toggwe)
+        logger.info("Simulation %s readied for %s.", game.key, ctx.user.name)
+
+    async def _ready(self, ctx: discord.Interaction, game: games.Game, seed: str | None, randomize_dc: bool,
+                     recolor_dc: bool, owo_toggwe: bool) -> None:
+        """Readies a game, with its lock held. See `ready`."""
+        if not await game.is_setup():
             setup_id = 0
             for command in self._bt.full_tree:
                 if command.name == "setup":
@@ -184,48 +185,107 @@ class Core(commands.Cog, name="SimCore"):
                 ephemeral=True,
             )
             return
-        self.owo_toggwe = owo_toggwe
-        if not self.owo_toggwe:
+        game.owo_toggwe = owo_toggwe
+        if not game.owo_toggwe:
             a = random.randint(0, 7911979)
-            self.owo_toggwe = a == 0
-        t = self.t
+            game.owo_toggwe = a == 0
+        t = game.t
         # Reset the sim just in case.
-        self._bt.sim = NINA.Simulation(cast_fi, events_fi, self.owo_toggwe)
-        logger.info("Readying simulation for %s.", ctx.user.name)
+        game.sim = sim = await game.new_simulation()
+        logger.info("Readying simulation %s for %s.", game.key, ctx.user.name)
         await ctx.response.defer(thinking=True)
-        await self._bt.sim.ready(seed, randomize_dc, recolor_dc, ctx)
+        await sim.ready(seed, randomize_dc, recolor_dc, ctx)
         embed = discord.Embed(color=discord.Color.from_rgb(255, 255, 255),
                               title=t("Simulation primary ready up protocol complete."),
                               description=t("Fetching images..."))
-        embed.set_author(name=t(self._bt.sim.name), icon_url=self._bt.sim.logo)
-        embed.set_footer(text=t("Random seed:") + f"{self._bt.sim.seed}")
-        await ctx.followup.send(embed=embed)
-        cast_fdir = self._dir / "cast"
-        purgables = ["session_cast", "status", "cycles"]
-        for target in purgables:
-            pth = self._dir / target
-            if pth.exists():
-                shutil.rmtree(pth)
-        if cast_fdir.exists():
-            active_tributes = {tribute.hash_ident for tribute in self._bt.sim.cast}
-            cached_tributes = {dirname.name for dirname in cast_fdir.iterdir()}
-
-            extras = cached_tributes - active_tributes
-            if extras:
-                logger.info("Purging cache of %i tributes.", len(extras))
-                for extra in extras:
-                    shutil.rmtree(cast_fdir / extra)
-        else:
-            os.makedirs(cast_fdir)
-        sesh = self._bt.httpsession
-        image_tasks = [tribute.fetch_image("alive", sesh) for tribute in self._bt.sim.cast]
-        await asyncio.gather(*image_tasks)
-        # Separated to allow for PIL to be used for BW images.
-        image_tasks = [tribute.fetch_image("dead", sesh) for tribute in self._bt.sim.cast]
-        await asyncio.gather(*image_tasks)
-        await ctx.followup.send(t("Images fetched. Simulation ready."))
-        logger.info("Simulation readied for %s.", ctx.user.name)
-        self.lock = False
+        embed.set_author(name=t(sim.name), icon_url=sim.logo)
+        embed.set_footer(text=t("Random seed:") + f"{sim.seed}")
+        message = await outbound.followup(ctx, outbound.Priority.PROGRESS, embed=embed, wait=True)
+        # These only hold archived renders of the last game, the shared cast directory is the pre-store image cache.
+        # Session images are kept in the variant store, so a ready with the same cast and colors reuses them.
+        # They're deleted in the background, the ready doesn't need to wait.
+        await storage.purge([
+            game.data_dir / "session_cast", game.data_dir / "status", game.data_dir / "cycles", NINA.DATA_DIR / "cast"
+        ])
+        prefetcher = prefetch.Prefetcher(self._bt.httpsession, NINA.IMAGE_STORE, prefetch.PER_HOST,
+                                         prefetch.REVALIDATE_AFTER, prefetch.MAX_SIZE)
+        reporter = asyncio.create_task(self._report_prefetch(ctx, game, message, embed, prefetcher))
+        try:
+            paths = await asyncio.gather(*[tribute.fetch_images(prefetcher) for tribute in sim.cast])
+        finally:
+            reporter.cancel()
+        logger.info("Images fetched: %s", prefetcher.progress())
+        logger.info("HTTP: %s", self._bt.http_middleware.metrics.stats())
+        await self._show_prefetch(ctx, game, message, embed, prefetcher)
+        # Pin the images of every loaded game, not just this one.
+        keep = itertools.chain(itertools.chain.from_iterable(paths), self._pinned_images())
+        await NINA.IMAGE_STORE.trim(keep=keep)
+        await NINA.VARIANT_STORE.trim(max_age=NINA.VARIANT_MAX_AGE)
+        await NINA.save_stores()
+        logger.info("Image store: %s", NINA.IMAGE_STORE.stats())
+        logger.info("Variant store: %s", NINA.VARIANT_STORE.stats())
+        await outbound.followup(ctx, outbound.Priority.RESULT, content=t("Images fetched. Simulation ready."))
+
+    def _pinned_images(self) -> list:
+        """The stored images of the casts of every readied game."""
+        paths = []
+        for game in self._bt.games:
+            if game.sim is None or game.sim.cycle == -2:
+                continue
+            for tribute in game.sim.cast:
+                for itype in tribute.images:
+                    key = NINA.IMAGE_STORE.key(tribute.source(itype))
+                    if key is not None:
+                        paths.append(NINA.IMAGE_STORE.path(key))
+        return paths
+
+    async def _report_prefetch(self, ctx: discord.Interaction, game: games.Game, message: discord.WebhookMessage,
+                               embed: discord.Embed, prefetcher: prefetch.Prefetcher) -> None:
+        """Keeps the ready message updated with the image fetching progress, until cancelled.
+
+        Args:
+            ctx: The interaction context.
+            game: The game being readied.
+            message: The ready message.
+            embed: The embed of the ready message.
+            prefetcher: The prefetcher fetching the images.
+        """
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            self._show_prefetch(ctx, game, message, embed, prefetcher).add_done_callback(_progress_done)
+
+    def _show_prefetch(self, ctx: discord.Interaction, game: games.Game, message: discord.WebhookMessage,
+                       embed: discord.Embed, prefetcher: prefetch.Prefetcher) -> asyncio.Future:
+        """Shows the image fetching progress on the ready message.
+
+        Updates are coalesced, so a backed up channel only gets the latest one.
+
+        Args:
+            ctx: The interaction context.
+            game: The game being readied.
+            message: The ready message.
+            embed: The embed of the ready message.
+            prefetcher: The prefetcher fetching the images.
+
+        Returns:
+            A future resolving once the progress is shown.
+        """
+        t = game.t
+        progress = prefetcher.progress()
+        embed.description = t(f"Fetching images... {progress['done']}/{progress['requested']}\n"
+                              f"Downloaded: {progress['downloaded']}, unchanged: {progress['revalidated']}, "
+                              f"cached: {progress['cached']}, failed: {progress['failed']}\n"
+                              f"Throughput: {progress['rate']:.1f} images/s, "
+                              f"{progress['byte_rate'] / 1024 / 1024:.2f} MiB/s")
+
+        async def _edit():
+            """Edits the ready message, the progress isn't worth failing the ready over."""
+            try:
+                await message.edit(embed=embed)
+            except discord.HTTPException as err:
+                logger.warning("Could not update the fetching progress: %s", err)
+
+        return outbound.submit(ctx, outbound.Priority.PROGRESS, _edit, coalesce=("progress", message.id))
 
     @app_commands.command(
         name="status",
@@ -233,27 +293,52 @@ class Core(commands.Cog, name="SimCore"):
     )
     @app_commands.guild_only()
     @app_commands.default_permissions(manage_messages=True)
+    @app_commands.describe(mosaic="Whether to pack the districts into as few images and messages as possible.")
     @checks.sim_ready_check()
-    async def status(self, ctx: discord.Interaction) -> None:
+    async def status(self, ctx: discord.Interaction, mosaic: bool = True) -> None:
         """Displays the current simulation status.
 
         This command is used to display the current simulation status.
         It displays every cast member of the district, their kill count, and their status.
+        All districts are rendered concurrently. In mosaic mode, they're packed into a few images,
+        sent as several embeds per message while staying under the upload limit.
 
         Args:
             ctx: The interaction context.
+            mosaic: Whether to pack the districts into mosaics.
         """
         await ctx.response.defer(thinking=True)
-        t = self.t
-        emd = discord.Embed(title=t("Current Simulation Status"))
-        emd.set_author(name=t(f"{self._bt.sim.name}"), icon_url=self._bt.sim.logo)
-        for district in self._bt.sim.districts:
-            image = await district.get_render(self._bt.sim)
-            op_image = discord.File(image, filename=image.name)
-            emd.description = t(f"Status for {district.name}")
-            emd.set_image(url=f"attachment://{image.name}")
-            emd.colour = discord.Color.from_str(district.color)
-            await ctx.followup.send(embed=emd, file=op_image)
+        game = await self._bt.games.get(ctx)
+        t = game.t
+        sim = game.sim
+        if not mosaic:
+            images = await asyncio.gather(*[district.get_render(sim) for district in sim.districts])
+            emd = discord.Embed(title=t("Current Simulation Status"))
+            emd.set_author(name=t(f"{sim.name}"), icon_url=sim.logo)
+            for district, image in zip(sim.districts, images):
+                op_image = discord.File(image.fp(), filename=image.filename)
+                emd.description = t(f"Status for {district.name}")
+                emd.set_image(url=f"attachment://{image.filename}")
+                emd.colour = discord.Color.from_str(district.color)
+                await outbound.followup(ctx, outbound.Priority.STATUS, embed=emd, file=op_image)
+            return
+
+        embeds, files, size = [], [], 0
+        for page, image in await NINA.generate_status_mosaics(sim):
+            if embeds and (len(embeds) == NINA.MAX_EMBEDS or size + len(image) > imgops.MAX_DISCORD_SIZE):
+                await outbound.followup(ctx, outbound.Priority.STATUS, embeds=embeds, files=files)
+                embeds, files, size = [], [], 0
+            emd = discord.Embed(
+                color=discord.Color.from_rgb(255, 255, 255),
+                title=t("Current Simulation Status"),
+                description=NINA.truncatelast(t("Status for " + ", ".join(district.name for district in page)), 4096),
+            )
+            emd.set_author(name=t(f"{sim.name}"), icon_url=sim.logo)
+            emd.set_image(url=f"attachment://{image.filename}")
+            embeds.append(emd)
+            files.append(discord.File(image.fp(), filename=image.filename))
+            size += len(image)
+        await outbound.followup(ctx, outbound.Priority.STATUS, embeds=embeds, files=files)
 
     @app_commands.command(
         name="cycle",
@@ -261,27 +346,28 @@ class Core(commands.Cog, name="SimCore"):
     )
     @app_commands.guild_only()
     @app_commands.default_permissions(manage_messages=True)
+    @app_commands.describe(batch="The maximum amount of events per message. Defaults to the configured amount.")
     @checks.sim_ready_check()
-    async def cycle(self, ctx: discord.Interaction) -> None:
+    async def cycle(self, ctx: discord.Interaction, batch: app_commands.Range[int, 1, 10] | None = None) -> None:
         """Runs a cycle of the simulation.
 
         This command is used to run a cycle of the simulation.
-        It takes no arguments.
+        Events are delivered in batches of up to `batch` per message.
 
         Args:
             ctx: The interaction context.
+            batch: The maximum amount of events per message.
         """
-        if self.lock:
-            raise exceptions.UsageError("Bot simulation lock active.")
-        self.lock = True
-        t = self.t
-        sim = self._bt.sim
-        # recovery.Safe doesn't seem to be working at the moment. Bypassed
-        # with recovery.Safe(self._bt.sim) as sim:
-        await ctx.response.defer(thinking=True)
-        await sim.computecycle(ctx)
-        await ctx.followup.send(t(f"Cycle {sim.cycle - 1} complete!"))
-        self.lock = False
+        game = await self._game(ctx)
+        async with game.lock:
+            t = game.t
+            sim = game.sim
+            # recovery.Safe doesn't seem to be working at the moment. Bypassed
+            # with recovery.Safe(game.sim) as sim:
+            await ctx.response.defer(thinking=True)
+            await sim.computecycle(ctx, batch or game.event_batch)
+            await outbound.followup(ctx, outbound.Priority.RESULT, content=t(f"Cycle {sim.cycle - 1} complete!"))
+        logger.info("Outbound queue: %s", outbound.SCHEDULER.queue(outbound.destination(ctx)).stats())
 
     @app_commands.command(
         name="tributestatus",
@@ -302,13 +388,12 @@ class Core(commands.Cog, name="SimCore"):
             ctx: The interaction context.
             tribute: The tribute to display.
         """
-        for possibly_correct in self._bt.sim.cast:
-            if possibly_correct.name == tribute:
-                tribute = possibly_correct
-                break
-        if not isinstance(tribute, Tribute):
+        game = await self._bt.games.get(ctx)
+        sim = game.sim
+        tribute = sim.names.lookup(tribute)
+        if tribute is None:
             raise exceptions.UsageError("Invalid Tribute provided.")
-        t = self.t
+        t = game.t
         nmd_s = ["Alive", "Dead"][tribute.status]
         emd = discord.Embed(
             color=discord.Colour.from_str(tribute.district.color),
@@ -317,13 +402,13 @@ class Core(commands.Cog, name="SimCore"):
             t(f"**Kills:** {tribute.kills}\n") + t(f"**Power:** {tribute.effectivepower()}"),
         )
         file = discord.utils.MISSING
-        if tribute.status and tribute.images["dead"] == "BW":
+        if tribute.status and tribute.derivation("dead"):
             fil = await tribute.get_image("dead")
             file = discord.File(fil)
             emd.set_image(url=f"attachment://{file.filename}")
         else:
             emd.set_thumbnail(url=tribute.images[nmd_s.lower()])
-        emd.set_author(name=t(f"{self._bt.sim.name}"), icon_url=self._bt.sim.logo)
+        emd.set_author(name=t(f"{sim.name}"), icon_url=sim.logo)
         emd.add_field(name=t("Items"),
                       value=NINA.truncatelast(
                           t("\n".join([f"{item.name} - {uses}" for item, uses in tribute.items.items()])), 1024))
@@ -357,17 +442,16 @@ class Core(commands.Cog, name="SimCore"):
             fill: The fill color for the font. Hexcode.
             width: The width of the stroke.
         """
-        if self.lock:
-            raise exceptions.UsageError("Bot simulation lock active.")
-        self.lock = True
-        if width < 0:
-            width = None
-        await ctx.response.defer(thinking=True)
-        NINA.DRAW_ARGS["fill"] = fill or NINA.DRAW_ARGS["fill"]
-        NINA.DRAW_ARGS["stroke_fill"] = stroke or NINA.DRAW_ARGS["stroke_fill"]
-        NINA.DRAW_ARGS["stroke_width"] = width or NINA.DRAW_ARGS["stroke_width"]
-        await ctx.followup.send("Font tweaked.")
-        self.lock = False
+        game = await self._game(ctx)
+        async with game.lock:
+            if width < 0:
+                width = None
+            await ctx.response.defer(thinking=True)
+            # The simulation shares the dict, so this applies to the running one too.
+            game.draw_args["fill"] = fill or game.draw_args["fill"]
+            game.draw_args["stroke_fill"] = stroke or game.draw_args["stroke_fill"]
+            game.draw_args["stroke_width"] = width or game.draw_args["stroke_width"]
+            await ctx.followup.send("Font tweaked.")
 
 
 async def setup(bot_instance: bot.NINABot) -> None:
@@ -24,6 +24,7 @@ from discord.ext import commands
 
 from NINA import bot
 from NINA.ext import exceptions
+from NINA.ext import metrics
 
 logger = logging.getLogger("NINA.commanderrorhandler")
 
@@ -83,6 +84,7 @@ class ErrorHandling(commands.Cog, name="AppCommandErrorHandler"):
         """
         if not ctx.response.is_done():
             await ctx.response.defer(ephemeral=True)
+        metrics.completed(ctx.id, "error")
         if isinstance(ctx.command, app_commands.Command):
             # Splitting because we don't want AttributeError
             if hasattr(ctx.command, "on_error"):
@@ -29,17 +29,14 @@ from discord.ext import commands
 
 from NINA import bot
 from NINA import cogs
-from NINA.data import config
 from NINA.data import const
 from NINA.ext import checks
 from NINA.ext import views
+from NINA.ext import workers
 
-_CNFG = config.Config()
-"""Submodule private global constant for the config."""
 logger = logging.getLogger("NINA.override")
 
 
-@app_commands.guilds(_CNFG["guild_id"])
 class Overrides(commands.GroupCog, name="override", description="Owner override commands."):
     """Owner override commands.
 
@@ -90,7 +87,7 @@ class Overrides(commands.GroupCog, name="override", description="Owner override
         logger.info("Finished reloading cogs.")
         if sync:
             self._bt.full_tree = await self._bt.tree.sync()
-            guild = self._bt.get_guild(_CNFG["guild_id"])
+            guild = self._bt.get_guild(self._bt.stat_confg["guild_id"])
             await self._bt.tree.sync(guild=guild)
             logger.info("Finished syncing tree.")
 
@@ -109,6 +106,26 @@ class Overrides(commands.GroupCog, name="override", description="Owner override
         logger.info("Closing...")
         await self._bt.close()
 
+    @app_commands.command(name="workers", description="Restarts the render workers.")
+    @checks.is_owner_check()
+    @app_commands.describe(amount="The new amount of render workers. 0 renders in threads of the bot process.")
+    async def restart_workers(self,
+                              ctx: discord.Interaction,
+                              amount: app_commands.Range[int, 0, 32] | None = None) -> None:
+        """Restarts the render workers, without touching the gateway session.
+
+        Renders already running finish on the old workers.
+
+        Args:
+            ctx: The interaction context.
+            amount: The new amount of render workers. Defaults to the current amount.
+        """
+        if amount is not None:
+            workers.POOL.workers = amount
+        workers.POOL.restart()
+        logger.info("Render workers restarted: %s", workers.POOL.stats())
+        await ctx.response.send_message(f"Restarted {workers.POOL.workers} render workers.")
+
     @app_commands.command(name="pull", description="Pulls the latest changes from the git repo. DANGEROUS!")
     @checks.is_owner_check()
     async def pull(self, ctx: discord.Interaction) -> None:
@@ -267,7 +284,7 @@ class Overrides(commands.GroupCog, name="override", description="Owner override
         await ctx.send("Syncing...")
         logger.info("Syncing...")
         self._bt.full_tree = await self._bt.tree.sync()
-        guild = self._bt.get_guild(_CNFG["guild_id"])
+        guild = self._bt.get_guild(self._bt.stat_confg["guild_id"])
         await self._bt.tree.sync(guild=guild)
         await ctx.send("Synced.")
         logger.info("Synced.")
@@ -276,9 +293,9 @@ class Overrides(commands.GroupCog, name="override", description="Owner override
 async def setup(bot_instance: bot.NINABot):
     """Sets up the overrides.
 
-    We add the override cog to the bot.
+    We add the override cog to the bot, in the development guild of its config.
 
     Args:
         bot_instance: The bot.
     """
-    await bot_instance.add_cog(Overrides(bot_instance))
+    await bot_instance.add_cog(Overrides(bot_instance), guild=discord.Object(bot_instance.stat_confg["guild_id"]))
@@ -14,13 +14,16 @@ Typical usage example:
 # SPDX-License-Identifier: EPL-2.0
 # Copyright (c) 2023-present Tech. TTGames
 
-import tomllib
-from typing import overload
+from __future__ import annotations
 
-import discord
+import tomllib
+from typing import overload, TYPE_CHECKING
 
 from NINA.data import const
 
+if TYPE_CHECKING:
+    import discord
+
 BURNABLE = False
 
 
@@ -2,11 +2,14 @@
 
 This module contains constants for the bot. These constants are used
 throughout the bot and are not meant to be changed by the user.
+Importing it has no side effects. The log handler is only set up by `setup_handler`,
+and the constants needing discord.py or colorama are only made on first access.
 
 Typical usage example:
     ```py
     from NINA.data import const
     print(const.VERSION)
+    handler = const.setup_handler()
     ```
 """
 # License: EPL-2.0
@@ -15,9 +18,7 @@ Typical usage example:
 
 import logging.handlers
 import pathlib
-
-import colorama
-import discord
+from typing import Any
 
 VERSION = "v0.1.1"
 """The current version of the bot as a string.
@@ -32,22 +33,51 @@ manual intervention by the USER are not considered compability-breaking.
 """
 PROG_DIR = pathlib.Path(__file__).parent.parent.parent.absolute()
 """The absolute path to the root directory of the bot."""
-INTENTS = discord.Intents.default()
-"""The discord gateway intents that the bot uses."""
 logpath = PROG_DIR / "log" / "bot.log"
 """The active logfile path"""
-logpath.parent.mkdir(parents=True, exist_ok=True)
-HANDLER = logging.handlers.RotatingFileHandler(
-    filename=logpath,
-    encoding="utf-8",
-    mode="w",
-    backupCount=10,
-    maxBytes=100000,
-)
-"""The default logging handler for the bot."""
-OK = colorama.Fore.GREEN + "OK" + colorama.Fore.RESET
-"""The string to print when something is OK."""
-FAILED = colorama.Fore.RED + colorama.Style.BRIGHT + "FAILED" + colorama.Style.RESET_ALL
-"""The string to print when something fails."""
-ALL_OK = colorama.Fore.GREEN + colorama.Style.BRIGHT + "ALL OK" + colorama.Style.RESET_ALL
-"""The string to print when everything is OK."""
+HANDLER: logging.Handler | None = None
+"""The default logging handler for the bot. None until `setup_handler` is called."""
+
+
+def setup_handler() -> logging.Handler:
+    """Set up the default logging handler, creating the log directory. Only the first call does anything.
+
+    Returns:
+        The handler, also available as HANDLER.
+    """
+    global HANDLER
+    if HANDLER is None:
+        logpath.parent.mkdir(parents=True, exist_ok=True)
+        HANDLER = logging.handlers.RotatingFileHandler(
+            filename=logpath,
+            encoding="utf-8",
+            mode="w",
+            backupCount=10,
+            maxBytes=100000,
+        )
+    return HANDLER
+
+
+def __getattr__(name: str) -> Any:
+    """Makes the constants needing discord.py or colorama on first access.
+
+    INTENTS: The discord gateway intents that the bot uses.
+    OK: The string to print when something is OK.
+    FAILED: The string to print when something fails.
+    ALL_OK: The string to print when everything is OK.
+    """
+    # pylint: disable=import-outside-toplevel
+    if name == "INTENTS":
+        import discord
+        value = discord.Intents.default()
+    elif name in ("OK", "FAILED", "ALL_OK"):
+        import colorama
+        value = {
+            "OK": colorama.Fore.GREEN + "OK" + colorama.Fore.RESET,
+            "FAILED": colorama.Fore.RED + colorama.Style.BRIGHT + "FAILED" + colorama.Style.RESET_ALL,
+            "ALL_OK": colorama.Fore.GREEN + colorama.Style.BRIGHT + "ALL OK" + colorama.Style.RESET_ALL,
+        }[name]
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
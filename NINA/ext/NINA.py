@@ -17,10 +17,11 @@ Typical usage example:
 # SPDX-License-Identifier: EPL-2.0
 # Copyright (c) 2023-present Tech. TTGames
 
+from __future__ import annotations
+
 import asyncio
 import colorsys
 import hashlib
-import io
 import itertools
 import logging
 import os
@@ -29,17 +30,27 @@ import random
 import string
 import tomllib
 import time
-from typing import Any, Literal, Optional, Union
-
-import aiohttp
-import discord
-import owo
-from PIL import Image
-from PIL import ImageDraw
-from PIL import ImageFont
+from typing import Any, BinaryIO, Literal, Optional, Union
 
 from NINA.data import const
-from NINA.ext import imgops
+from NINA.ext import lazy
+from NINA.ext import logs
+from NINA.ext import metrics
+from NINA.ext import names
+from NINA.ext import spans
+from NINA.ext import store
+from NINA.ext import tilecache
+
+# Only needed to render and deliver, the engine runs without them.
+discord = lazy.load("discord")
+owo = lazy.load("owo")
+Image = lazy.load("PIL.Image")
+ImageDraw = lazy.load("PIL.ImageDraw")
+ImageFont = lazy.load("PIL.ImageFont")
+derive = lazy.load("NINA.ext.derive")
+imgops = lazy.load("NINA.ext.imgops")
+outbound = lazy.load("NINA.ext.outbound")
+prefetch = lazy.load("NINA.ext.prefetch")
 
 logger = logging.getLogger("NINA.simulation")
 
@@ -53,6 +64,37 @@ DRAW_ARGS = {
     "align": "center",
 }
 DATA_DIR = const.PROG_DIR / "data"
+ARCHIVE_RENDERS = False
+"""Whether rendered images should also be persisted under the data directory of their simulation, for archiving."""
+TILE_CACHE = tilecache.TileCache()
+"""The cache of decoded tribute tiles, shared by all renders."""
+BOARD_CACHE = tilecache.TileCache(budget=128 * 1024 * 1024)
+"""The decoded district boards and tribute cards retained between status renders, of every loaded game.
+Unlike tiles, they're modified in place, but only ever by the district or tribute they belong to."""
+IMAGE_STORE = store.ImageStore(DATA_DIR / "store")
+"""The store of normalized tribute images, addressed by content and shared by all casts."""
+VARIANT_STORE = store.ImageStore(DATA_DIR / "variants", budget=256 * 1024 * 1024)
+"""The store of session variants of tribute images, like district bordered tiles, kept across readies."""
+VARIANT_MAX_AGE = 30 * 24 * 60 * 60
+"""The amount of seconds after which unused variants are evicted from VARIANT_STORE."""
+RENDER_VERSION = 1
+"""The version of the variant rendering. Bump it whenever variants would render differently."""
+MOSAIC_COLUMNS = 2
+"""The maximum amount of district boards placed side by side in a status mosaic."""
+MOSAIC_ROWS = 4
+"""The maximum amount of rows of district boards in a single status mosaic."""
+MOSAIC_MAX_WIDTH = 4096
+"""The width in pixels a status mosaic should stay under, dropping columns if needed."""
+MAX_EMBEDS = 10
+"""The maximum amount of embeds (and so images) Discord allows in a single message."""
+MAX_EMBED_CHARS = 6000
+"""The maximum amount of characters Discord allows across all embeds of a single message."""
+EVENT_BATCH = 10
+"""The default maximum amount of events delivered in a single message. 1 sends every event on its own."""
+EVENT_PACE = 3
+"""The minimum amount of seconds between event messages."""
+EVENT_READ_PACE = 0.5
+"""The extra amount of seconds between event messages for every extra event in a message, so readers keep up."""
 
 # 0: Female, 1: Male, 2: Neuter, 3: Pair, 4: Non-binary
 SPronouns = ["she", "he", "it", "they", "they"]
@@ -62,7 +104,10 @@ RPronouns = ["herself", "himself", "itself", "themselves", "themself"]
 PAdjectives = ["her", "his", "its", "their", "their"]
 
 
-def getsize(draw: ImageDraw.ImageDraw, text: str, font: ImageFont.FreeTypeFont) -> tuple[float, float]:
+def getsize(draw: ImageDraw.ImageDraw,
+            text: str,
+            font: ImageFont.FreeTypeFont,
+            draw_args: dict = DRAW_ARGS) -> tuple[float, float]:
     """Get the size of the text.
 
     Args:
@@ -70,8 +115,9 @@ def getsize(draw: ImageDraw.ImageDraw, text: str, font: ImageFont.FreeTypeFont)
         Shouldn't change anything.
         text: The text to measure.
         font: The font to use for measurement.
+        draw_args: The text drawing arguments to measure with.
     """
-    bbox = draw.textbbox((0, 0), text, font, stroke_width=DRAW_ARGS["stroke_width"], align=DRAW_ARGS["align"])
+    bbox = draw.textbbox((0, 0), text, font, stroke_width=draw_args["stroke_width"], align=draw_args["align"])
     return bbox[2] - bbox[0], bbox[3] - bbox[1]
 
 
@@ -81,6 +127,7 @@ def draw_max_text(
     max_sizes: tuple[int, int],
     anchor: str,
     location: tuple[int, int],
+    draw_args: dict = DRAW_ARGS,
 ) -> ImageDraw.ImageDraw:
     """Draws a text on top of the image, taking up as much space as possible.
 
@@ -92,6 +139,7 @@ def draw_max_text(
         max_sizes: The maximum size that the text can take up
         anchor: The to use for the drawing.
         location: The location to use for drawing.
+        draw_args: The text drawing arguments to use.
 
     Returns:
         The draw object used.
@@ -102,18 +150,18 @@ def draw_max_text(
     while True:
         proposed_text = text
         font = ImageFont.truetype(FONT, size)
-        current_size = getsize(draw, proposed_text, font)
+        current_size = getsize(draw, proposed_text, font, draw_args)
         if current_size[0] > max_sizes[0]:
             cropped_frags = []
             linebreaks = 0
             while True:
-                current_size = getsize(draw, proposed_text, font)
+                current_size = getsize(draw, proposed_text, font, draw_args)
                 if current_size[0] <= max_sizes[0]:
                     break
                 split_text = proposed_text.split(" ")
                 for word_n in range(len(split_text), 0, -1):
                     sequence = " ".join(split_text[:word_n])
-                    sequence_size = getsize(draw, sequence, font)
+                    sequence_size = getsize(draw, sequence, font, draw_args)
                     if sequence_size[0] < max_sizes[0]:
                         cropped_frags.append(sequence + "\n")
                         proposed_text = " ".join(split_text[word_n:])
@@ -122,7 +170,7 @@ def draw_max_text(
                 if linebreaks > MAX_LINEBREAKS:
                     break
             proposed_text = "".join(cropped_frags) + proposed_text
-            current_size = getsize(draw, proposed_text, font)
+            current_size = getsize(draw, proposed_text, font, draw_args)
         if current_size[1] > max_sizes[1] or current_size[0] > max_sizes[0]:
             break
         last_viable_set = (font, proposed_text)
@@ -135,16 +183,104 @@ def draw_max_text(
                               new_text,
                               font,
                               anchor,
-                              stroke_width=DRAW_ARGS["stroke_width"],
-                              align=DRAW_ARGS["align"])
+                              stroke_width=draw_args["stroke_width"],
+                              align=draw_args["align"])
         if anchor[1] == "a":
             location = (location[0], location[1] + (location[1] - sizey[1]))
         else:
             location = (location[0], location[1] + (location[1] - sizey[3]))
-    draw.text(location, new_text, font=font, anchor=anchor, **DRAW_ARGS)
+    draw.text(location, new_text, font=font, anchor=anchor, **draw_args)
     return draw
 
 
+def variant_source(*parts: Any) -> str:
+    """Build the VARIANT_STORE source of a variant, including the current render settings.
+
+    Args:
+        *parts: Everything the variant depends on, like the content hash of its image and the district color.
+    """
+    return ":".join(str(part) for part in (*parts, imgops.SIZE, FONT, RENDER_VERSION))
+
+
+async def load_stores() -> None:
+    """Load the manifests of the image stores, so their first use doesn't scan the disk on the event loop."""
+    await asyncio.gather(IMAGE_STORE.load(), VARIANT_STORE.load())
+
+
+async def save_stores() -> None:
+    """Persist the manifests of the image stores, if they changed."""
+    await asyncio.gather(IMAGE_STORE.save(), VARIANT_STORE.save())
+
+
+def archive_render(sim: "Simulation", image: imgops.EncodedImage, *parts: str) -> imgops.EncodedImage:
+    """Persist a render under the data directory of a simulation in the background, if archiving is enabled.
+
+    Args:
+        sim: The simulation the render belongs to.
+        image: The render to archive.
+        *parts: The path segments relative to the data directory to archive the render to.
+
+    Returns:
+        The same render, for convenience.
+    """
+    if ARCHIVE_RENDERS:
+        imgops.archive(image, sim.data_dir.joinpath(*parts))
+    return image
+
+
+def _mosaic_columns(boards: list[tuple[Image.Image, list]]) -> int:
+    """The amount of columns a status mosaic of some boards is laid out in."""
+    return max(1, min(MOSAIC_COLUMNS, MOSAIC_MAX_WIDTH // max(board.width for board, _ in boards)))
+
+
+def _mosaic_frames(boards: list[tuple[Image.Image, list]]) -> tuple[int, int]:
+    """The amount of frames of the longest animation of some boards, and how many a mosaic of them is capped at."""
+    longest = max((len(ani.frames) for _, animated in boards for ani, _ in animated), default=1)
+    size = imgops.mosaic_size([board.size for board, _ in boards], _mosaic_columns(boards))
+    return longest, imgops.frame_cap(size, longest)
+
+
+async def generate_status_mosaics(sim: "Simulation") -> list[tuple[list["District"], imgops.EncodedImage]]:
+    """Generate images packing the boards of all districts, in as few pages as fit.
+
+    The boards are gathered concurrently and laid out in up to MOSAIC_COLUMNS columns,
+    fewer if the mosaic would get wider than MOSAIC_MAX_WIDTH, and up to MOSAIC_ROWS rows.
+    The bigger a mosaic, the fewer frames it can have within `imgops.FRAME_PIXEL_BUDGET`.
+    So pages are cut short once their animations wouldn't fit anymore, rather than dropping frames.
+
+    Args:
+        sim: The current simulation status.
+
+    Returns:
+        The districts of every page and their mosaic.
+    """
+    boards = await asyncio.gather(*[district.get_board(sim) for district in sim.districts])
+    pages = [[0]]
+    for i in range(1, len(boards)):
+        candidate = [*pages[-1], i]
+        longest, cap = _mosaic_frames([boards[j] for j in candidate])
+        if len(candidate) > MOSAIC_COLUMNS * MOSAIC_ROWS or cap < longest:
+            pages.append([i])
+        else:
+            pages[-1] = candidate
+    for page in pages:
+        longest, cap = _mosaic_frames([boards[j] for j in page])
+        if cap < longest:
+            logger.info("Status of %s is too big for every frame, rendering %i of %i.",
+                        ", ".join(sim.districts[j].name for j in page), cap, longest)
+
+    async def _render(number: int, page: list[int]) -> imgops.EncodedImage:
+        """Lay out and composite a single page."""
+        page_boards = [boards[j] for j in page]
+        base_image, animation = await asyncio.to_thread(imgops.mosaic, page_boards, _mosaic_columns(page_boards))
+        filename = f"status_{number}.webp"
+        render = await imgops.composite_image(filename, base_image, animation)
+        return archive_render(sim, render, "status", filename)
+
+    renders = await asyncio.gather(*[_render(number, page) for number, page in enumerate(pages)])
+    return [([sim.districts[j] for j in page], render) for page, render in zip(pages, renders)]
+
+
 def truncatelast(text: str, length: int) -> str:
     """Truncate a string to fit the provided length.
 
@@ -160,7 +296,7 @@ async def generate_endcycle(
     involved: list["Tribute"],
     sim: "Simulation",
     request: int,
-) -> pathlib.Path:
+) -> imgops.EncodedImage:
     """Generate a mortem report image for the given deaths.
 
     Args:
@@ -170,12 +306,11 @@ async def generate_endcycle(
         request: 0 for mortem request, 1 for victory screen.
     """
     t = sim.t
-    image_paths = await asyncio.gather(*[tribute.get_image(["alive", "dead"][tribute.status]) for tribute in involved])
-    images = [(Image.open(pth), (dead.name, dead.district.name)) for pth, dead in zip(image_paths, involved)]
-    place = DATA_DIR / "cycles" / f"{cycle_no}"
+    tiles = await asyncio.gather(*[tribute.get_tile(["alive", "dead"][tribute.status]) for tribute in involved])
+    images = [(tile, (dead.name, dead.district.name)) for tile, dead in zip(tiles, involved)]
+    place = f"{cycle_no}"
     if cycle_no == -1:
-        place = DATA_DIR / "cycles" / "special"
-    place.mkdir(parents=True, exist_ok=True)
+        place = "special"
     base_image = Image.new(
         "RGBA",
         (min(4, len(involved)) * 576 + 64, (len(involved) // 4 + 1 - bool(len(involved) % 4 == 0)) * 576 + 128),
@@ -189,7 +324,8 @@ async def generate_endcycle(
             text = "Result: Wipeout."
     else:
         text = t(f"Fallen Tribute{plural} for Day {cycle_no // 2 + 1}")
-    draw = draw_max_text(base_image, text, (base_image.width, 128), "md", (base_image.width // 2, 128))
+    draw = await asyncio.to_thread(draw_max_text, base_image, text, (base_image.width, 128), "md",
+                                   (base_image.width // 2, 128), sim.draw_args)
     # Size is
     # Width: number between 1-4 * 576 + 64
     # Height: 640 for each row of images,
@@ -200,20 +336,18 @@ async def generate_endcycle(
         for col, img in enumerate(batch):
             limg = img[0]
             paste = (offset + col * 576, 128 + row * 576)
-            if getattr(limg, "n_frames", 1) != 1:
+            if isinstance(limg, imgops.Animation):
                 animation.append((limg, paste))
             else:
-                if limg != "RGBA":
-                    limg = limg.convert("RGBA")
                 base_image.paste(limg, paste, limg)
             draw.text((paste[0] + 256, paste[1] + 512),
                       text=t(f"{img[1][0]}\n{img[1][1]}"),
                       font=font,
                       anchor="ma",
-                      **DRAW_ARGS)
-    place = (place / ["mortem", "victors"][request]).with_suffix(".webp")
-    await imgops.save_composite_image(place, base_image, animation)
-    return place
+                      **sim.draw_args)
+    filename = ("mortem.webp", "victors.webp")[request]
+    render = await imgops.composite_image(filename, base_image, animation)
+    return archive_render(sim, render, "cycles", place, filename)
 
 
 class Simulation:
@@ -235,26 +369,42 @@ class Simulation:
         alive: The living tributes of the simulation.
         dead: The dead tributes of the simulation.
         owo_toggwe: The owo toggle.
+        data_dir: The directory renders of the simulation are archived to.
+        draw_args: The text drawing arguments of the simulation's renders.
+        names: The index of the names of the cast. None until the simulation is ready.
     """
     seed: Any
     cycle: int
     alive: list["Tribute"]
     dead: list["Tribute"]
     cycle_deaths: list["Tribute"]
+    data_dir: pathlib.Path
+    draw_args: dict
+    names: names.NameIndex | None
 
     def __init__(
         self,
         cast_file: pathlib.Path,
         events_file: pathlib.Path,
         owo_toggwe: bool | None = False,
+        data_dir: pathlib.Path = DATA_DIR,
+        draw_args: dict | None = None,
     ) -> None:
-        """Initialize the Simulation object."""
+        """Initialize the Simulation object.
+
+        Args:
+            cast_file: The cast file to load.
+            events_file: The events file to load.
+            owo_toggwe: The owo toggle.
+            data_dir: The directory renders of the simulation are archived to.
+            draw_args: The text drawing arguments of the simulation's renders. Defaults to a copy of DRAW_ARGS.
+        """
         with open(cast_file, "rb") as file:
             data = tomllib.load(file)
         self.cycle = -2
         self.name: str = data["name"]
         self.logo: str = data["logo"]
-        self.cast = [Tribute(tribute) for tribute in data["cast"]]
+        self.cast = [Tribute(tribute, data.get("dead_image", "BW")) for tribute in data["cast"]]
         self.districts = [District(district) for district in data["districts"]]
         with open(events_file, "rb") as file:
             data = tomllib.load(file)
@@ -263,6 +413,9 @@ class Simulation:
         if not self.cycles:
             raise ValueError("No cycles found.")
         self.owo_toggwe = owo_toggwe
+        self.data_dir = data_dir
+        self.draw_args = draw_args if draw_args is not None else dict(DRAW_ARGS)
+        self.names = None
 
     def __str__(self):
         """Text representation of the simulation."""
@@ -295,7 +448,9 @@ class Simulation:
         logger.info("Beginning simulation '%s' ready up procedure.", self.name)
         t = self.t
         if interaction:
-            await interaction.followup.send(t(f"Beginning simulation `{self.name}` ready up procedure."))
+            await outbound.followup(interaction,
+                                    outbound.Priority.PROGRESS,
+                                    content=t(f"Beginning simulation `{self.name}` ready up procedure."))
         if not seed:
             seed = os.urandom(16)
             self.seed = int.from_bytes(seed)
@@ -313,12 +468,14 @@ class Simulation:
         if districtrand:
             logger.info("Randomizing district members.")
             if interaction:
-                await interaction.followup.send(t("Randomizing district members."))
+                await outbound.followup(interaction,
+                                        outbound.Priority.PROGRESS,
+                                        content=t("Randomizing district members."))
             random.shuffle(self.cast)
         if recolor:
             logger.info("Recoloring districts.")
             if interaction:
-                await interaction.followup.send(t("Recoloring districts."))
+                await outbound.followup(interaction, outbound.Priority.PROGRESS, content=t("Recoloring districts."))
             max_hue = 360
             increment = max_hue // len(self.districts)
             offset = random.randint(0, increment)
@@ -328,7 +485,7 @@ class Simulation:
                 district.color = color
         logger.info("Assigning districts.")
         if interaction:
-            await interaction.followup.send(t("Assigning districts."))
+            await outbound.followup(interaction, outbound.Priority.PROGRESS, content=t("Assigning districts."))
         tid = 0
         mpd = len(self.cast) // len(self.districts)
         for district in self.districts:
@@ -341,6 +498,7 @@ class Simulation:
         self.alive = self.cast.copy()
         self.dead = []
         self.cycle_deaths = []
+        self.names = names.NameIndex(self.cast)
         logger.info("Simulation '%s' ready.", self.name)
 
     def getcycle(self) -> Optional["Cycle"]:
@@ -370,19 +528,51 @@ class Simulation:
             resolved_cycle = random.choices(randomevents, weights=[abs(cycle.weight) for cycle in randomevents])[0]
         return resolved_cycle
 
-    async def computecycle(self, interaction: discord.Interaction | None = None) -> None:
+    async def deliver_events(
+        self,
+        interaction: discord.Interaction,
+        events: list[tuple[discord.Embed, imgops.EncodedImage, str]],
+        not_before: float,
+    ) -> float:
+        """Send rendered events as a single message, paced after the previous one.
+
+        Args:
+            interaction: The interaction to send the events to.
+            events: The embeds, their images and resolution texts. They must fit in a single message.
+            not_before: The time the message may be sent at.
+
+        Returns:
+            The time the next message may be sent at. The more events were sent, the longer readers get.
+        """
+        if not_before > time.time():
+            with spans.span("pace"):
+                await asyncio.sleep(not_before - time.time())
+        files = [discord.File(image.fp(), filename=image.filename, description=text) for _, image, text in events]
+        await outbound.followup(interaction,
+                                outbound.Priority.LIVE,
+                                embeds=[embed for embed, _, _ in events],
+                                files=files)
+        return time.time() + EVENT_PACE + EVENT_READ_PACE * (len(events) - 1)
+
+    async def computecycle(self, interaction: discord.Interaction | None = None, batch: int | None = None) -> None:
         """Compute the next cycle.
 
         This is the method that computes the next cycle.
         So the whole day/night/special event cycle.
+        Consecutive events are delivered together, as long as they fit in a single message.
+        With `spans.ENABLED`, the time spent in each phase is summarized in the log once the cycle ends.
 
         Args:
             interaction: The interaction to send some log-like messages to.
+            batch: The maximum amount of events delivered in a single message. Defaults to EVENT_BATCH.
         """
         if self.cycle in [-2, -1]:
             logger.warning("Simulation '%s' is not ready.", self.name)
             return
         t = self.t
+        started = time.perf_counter()
+        collector = spans.start()
+        number = self.cycle
         cycle = self.getcycle()
         if interaction:
             embed = discord.Embed(color=discord.Color.from_rgb(255, 255, 255),
@@ -390,9 +580,10 @@ class Simulation:
                                   description=t(f"Cycle type: {cycle.name}\n") +
                                   t(f"Remaining tribute count: {len(self.alive)}"))
             embed.set_author(name=t(self.name), icon_url=self.logo)
-            attach = discord.File(await cycle.render_start(self))
-            embed.set_image(url="attachment://start.webp")
-            await interaction.followup.send(embed=embed, file=attach)
+            image = await cycle.render_start(self)
+            attach = discord.File(image.fp(), filename=image.filename)
+            embed.set_image(url=f"attachment://{attach.filename}")
+            await outbound.followup(interaction, outbound.Priority.LIVE, embed=embed, file=attach)
         logger.info("Beginning cycle %s.", cycle.name)
         if cycle.text:
             logger.info("Displaying cycle text.")
@@ -404,60 +595,83 @@ class Simulation:
         for item in self.items:
             if cycle in item.cycles:
                 cycle_events.append(item.base_event)
+        batch = min(batch or EVENT_BATCH, MAX_EMBEDS)
+        pending = []
         magictimer = time.time()
+        # Checked once, picks are logged as a single record and only if enabled.
+        debug = logger.isEnabledFor(logging.DEBUG)
         while active_tributes:
-            possible_events = []
-            wg = [tribute.effectivepower() for tribute in active_tributes]
-            tribute: "Tribute" = random.choices(active_tributes, weights=wg)[0]
-            itemwise = []
-            for item in tribute.items.keys():
-                for ievent in item.events:
-                    if cycle not in ievent.cycle:
-                        logger.debug("Discarded event %s for tribute %s (cycle mismatch)", ievent.text.template, tribute.name)
-                        continue
-                    itemwise.append(ievent)
-            for cevent in itertools.chain(cycle_events, itemwise):
-                if cevent.check_requirements(tribute, 0):
-                    logger.debug("Adding event '%s' to pool for tribute %s", cevent.text.template, tribute.name)
-                    possible_events.append(cevent)
-                    continue
-                logger.debug("Discarded event %s for tribute %s (failed reqs)", cevent.text.template, tribute.name)
+            with spans.span("select"):
+                possible_events = []
+                wg = [tribute.effectivepower() for tribute in active_tributes]
+                tribute: "Tribute" = random.choices(active_tributes, weights=wg)[0]
+                itemwise = []
+                mismatched = 0
+                for item in tribute.items.keys():
+                    for ievent in item.events:
+                        if cycle not in ievent.cycle:
+                            mismatched += 1
+                            continue
+                        itemwise.append(ievent)
+                for cevent in itertools.chain(cycle_events, itemwise):
+                    if cevent.check_requirements(tribute, 0):
+                        possible_events.append(cevent)
             if not possible_events:
                 logger.warning("Could not find event for tribute '%s'.", tribute.name)
                 continue
             event = random.choices(possible_events, weights=[event.weight for event in possible_events])[0]
-            logger.debug("Resolving event '%s'.", event.text.template)
-            tributes_involved = await event.affiliationresolution(tribute, active_tributes, self)
+            spans.event(event.text.template)
+            if debug:
+                logger.debug(
+                    logs.Record("pick",
+                                cycle=self.cycle,
+                                tribute=tribute.name,
+                                event=event.text.template,
+                                pool=len(possible_events),
+                                failed=len(cycle_events) + len(itemwise) - len(possible_events),
+                                mismatched=mismatched))
+            with spans.span("affiliation"):
+                tributes_involved = await event.affiliationresolution(tribute, active_tributes, self)
             if not tributes_involved:
+                spans.event(None)
                 continue  # Already logged in affiliationresolution
             event_no += 1
             if interaction:
-                if magictimer > time.time():
-                    await asyncio.sleep(magictimer - time.time())
-                magictimer = time.time() + 3
                 resolution_text, image = await event.rendered_resolve(tributes_involved, self, event_no)
-                attach = discord.File(image, description=f"{resolution_text}")
+                # Deliveries carry several events, they only count toward the cycle.
+                spans.event(None)
                 embed = discord.Embed(color=discord.Color.from_rgb(255, 255, 255),
                                       title=t(f"Event {event_no} for Cycle {self.cycle}"),
                                       description=t(f"Active tributes remaining: {len(active_tributes)}\n") +
                                       t("Event result:") + f"\n{truncatelast(resolution_text, 4096)}")
                 embed.set_author(name=t(self.name), icon_url=self.logo)
-                embed.set_image(url=f"attachment://{attach.filename}")
-                await interaction.followup.send(embed=embed, file=attach)
+                embed.set_image(url=f"attachment://{image.filename}")
+                if pending and (len(pending) == batch or
+                                sum(len(image) for _, image, _ in pending) + len(image) > imgops.MAX_DISCORD_SIZE or
+                                sum(len(embed) for embed, _, _ in pending) + len(embed) > MAX_EMBED_CHARS):
+                    magictimer = await self.deliver_events(interaction, pending, magictimer)
+                    pending = []
+                pending.append((embed, image, resolution_text))
             else:
-                resolution_text = await event.resolve(tributes_involved, self)
+                with spans.span("resolve"):
+                    resolution_text = await event.resolve(tributes_involved, self)
+                spans.event(None)
             for tribute in tributes_involved:
                 if tribute in active_tributes:
                     active_tributes.remove(tribute)
-            logger.info("Resolution text: %s", resolution_text)
+            logger.info(logs.Record("event", cycle=self.cycle, no=event_no, text=resolution_text))
+        if pending:
+            await self.deliver_events(interaction, pending, magictimer)
         logger.info("Cycle %s-%i complete.", cycle.name, self.cycle)
+        logger.debug("Tile cache: %s", TILE_CACHE)
+        await save_stores()
         if self.cycle_deaths and self.cycle % 2 == 1 and self.cycle != 0:
             logger.info("You hear %i cannon shot%s in the distance.", len(self.cycle_deaths),
                         "s" if len(self.cycle_deaths) > 1 else "")
             logger.info("The fallen tributes are: %s", ", ".join([tribute.name for tribute in self.cycle_deaths]))
             if interaction:
                 image = await generate_endcycle(self.cycle, self.cycle_deaths, self, 0)
-                attach = discord.File(image)
+                attach = discord.File(image.fp(), filename=image.filename)
                 plural = "s" if len(self.cycle_deaths) > 1 else ""
                 line = t(f"You hear {len(self.cycle_deaths)} cannon shot{plural}"
                          " in the distance.\nThe fallen tributes are:\n")
@@ -470,7 +684,7 @@ class Simulation:
                 )
                 embed.set_author(name=t(self.name), icon_url=self.logo)
                 embed.set_image(url=f"attachment://{attach.filename}")
-                await interaction.followup.send(embed=embed, file=attach)
+                await outbound.followup(interaction, outbound.Priority.RESULT, embed=embed, file=attach)
             self.cycle_deaths = []
         self.cycle += 1
         if cycle.max_use > 0:
@@ -501,16 +715,20 @@ class Simulation:
                     sp = "Winners:\n" + "\n".join([tribute.name for tribute in self.alive])
                 else:
                     sp = "Results: Wipeout."
-                attach = discord.File(image)
+                attach = discord.File(image.fp(), filename=image.filename)
                 embed = discord.Embed(color=discord.Color.gold(), title=t("Simulation Complete"), description=t(sp))
                 embed.set_author(name=t(self.name), icon_url=self.logo)
                 embed.set_image(url=f"attachment://{attach.filename}")
-                await interaction.followup.send(embed=embed, file=attach)
+                await outbound.followup(interaction, outbound.Priority.RESULT, embed=embed, file=attach)
             if len(districts) == 1:
                 logger.info("Winner: %s", districts[0].name)
                 logger.info("Alive tributes: %s", ", ".join([tribute.name for tribute in self.alive]))
             else:
                 logger.info("The simulation ended in a wipeout. There are no winners.")
+        metrics.CYCLES.observe(time.perf_counter() - started, "true" if interaction else "false")
+        if collector is not None:
+            spans.finish(collector)
+            logger.info(logs.Record("spans", cycle=number, **collector.summary()))
 
 
 class District:
@@ -520,11 +738,14 @@ class District:
         name: The name of the district.
         color: The color of the district.
         members: The members of the district.
+        render: The last board render and the member statuses it was made for.
     """
     name: str
     color: str
     members: list["Tribute"]
-    render: tuple[pathlib.Path, list[list[int]]] | None
+    render: tuple[imgops.EncodedImage, list[list[int]]] | None
+    _slots: list[list[int] | None]
+    _animated: dict[int, list[tuple[imgops.Animation, tuple[int, int]]]]
 
     def __init__(self, data: dict):
         """Initialize the District object.
@@ -537,6 +758,8 @@ class District:
         self.color = data["color"]
         self.members = []
         self.render = None
+        self._slots = []
+        self._animated = {}
 
     def __str__(self):
         """Text representation of the district."""
@@ -548,54 +771,84 @@ class District:
             member.allies.update(set(self.members))
             member.allies.remove(member)  # Remove self from allies
 
-    async def get_render(self, sim: Simulation) -> pathlib.Path:
+    async def get_render(self, sim: Simulation) -> imgops.EncodedImage:
         """Get an image representing the district
 
         Merges the status images of the tributes and places a name above them.
+        If no member changed, the last render is returned as is.
 
         Args:
             sim: The simulation that the district is part of
 
         """
-        t = sim.t
-        status = [[tribute.status, tribute.kills, tribute.effectivepower()] for tribute in self.members]
+        status = [tribute.status_key() for tribute in self.members]
         if self.render and self.render[1] == status:
             return self.render[0]
 
-        landing = DATA_DIR / "status"
-        landing.mkdir(parents=True, exist_ok=True)
-        tribute_status_gets = [tribute.get_status_render(sim) for tribute in self.members]
-        tribute_status = await asyncio.gather(*tribute_status_gets)
-        tribute_status = [Image.open(stat_img) for stat_img in tribute_status]
-        member_c = len(self.members)
+        board, animation = await self.get_board(sim)
+        filename = f"{sim.districts.index(self)}.webp"
+        render = await imgops.composite_image(filename, board, animation)
+        self.render = (render, status)
+        return archive_render(sim, render, "status", filename)
+
+    async def get_board(self, sim: Simulation) -> tuple[Image.Image, list[tuple[imgops.Animation, tuple[int, int]]]]:
+        """Get the decoded, unencoded board of the district.
+
+        The board is retained in BOARD_CACHE between calls, so only the slots of members whose status changed
+        are redrawn. Callers get a copy, as the retained board is redrawn while they may still be encoding it.
+
+        Args:
+            sim: The simulation that the district is part of
 
+        Returns:
+            The static board and the animated elements to composite on top of it.
+        """
+        status = [tribute.status_key() for tribute in self.members]
+        header = BOARD_CACHE.get((self, "header"))
+        board = BOARD_CACHE.get((self, "board"))
+        if header is None or board is None or len(self._slots) != len(self.members):
+            header = self._render_header(sim)
+            board = header.copy()
+            BOARD_CACHE.put((self, "header"), header)
+            BOARD_CACHE.put((self, "board"), board)
+            self._slots = [None] * len(self.members)
+            self._animated = {}
+        changed = [i for i, member_status in enumerate(status) if self._slots[i] != member_status]
+        cards = await asyncio.gather(*[self.members[i].get_status_card(sim) for i in changed])
+        for i, (card, animated) in zip(changed, cards):
+            location = (64 + i * 576, 128)
+            # Restore the slot from the header first, as the name may reach into it.
+            box = (location[0], location[1], location[0] + card.width, location[1] + card.height)
+            board.paste(header.crop(box), location)
+            board.paste(card, location, card)
+            self._animated[i] = [(ani, (location[0] + x, location[1] + y)) for ani, (x, y) in animated]
+            self._slots[i] = status[i]
+        if changed:
+            logger.debug("Redrew %i of %i slots for district %s.", len(changed), len(self.members), self.name)
+        return board.copy(), [element for i in sorted(self._animated) for element in self._animated[i]]
+
+    def _render_header(self, sim: Simulation) -> Image.Image:
+        """Render an empty board with just the name of the district on it.
+
+        Args:
+            sim: The simulation that the district is part of
+        """
+        member_c = len(self.members)
         base_image = Image.new("RGBA", (512 * member_c + 64 * (member_c + 1), 768), (0, 0, 0, 0))
         # The width is 512 for each member + 64 for each offset + 128 for sides
         draw = ImageDraw.Draw(base_image)
         font = ImageFont.truetype(FONT, size=128)
         draw.text(
             (base_image.width // 2, 0),
-            t(self.name),
+            sim.t(self.name),
             font=font,
             anchor="ma",
             fill=self.color,
-            stroke_fill=DRAW_ARGS["stroke_fill"],
-            stroke_width=DRAW_ARGS["stroke_width"],
-            align=DRAW_ARGS["align"],
+            stroke_fill=sim.draw_args["stroke_fill"],
+            stroke_width=sim.draw_args["stroke_width"],
+            align=sim.draw_args["align"],
         )
-        animation = []
-        for i, tribute_status_image in enumerate(tribute_status):
-            paste_location = (64 + i * 576, 128)
-            if getattr(tribute_status_image, "n_frames", 1) != 1:
-                animation.append((tribute_status_image, paste_location))
-                continue
-            if tribute_status_image.mode != "RGBA":
-                tribute_status_image = tribute_status_image.convert("RGBA")
-            base_image.paste(tribute_status_image, paste_location, tribute_status_image)
-        landing = landing / f"{sim.districts.index(self)}.webp"
-        await imgops.save_composite_image(landing, base_image, animation)
-        self.render = (landing, status)
-        return landing
+        return base_image
 
 
 class Tribute:
@@ -617,6 +870,9 @@ class Tribute:
         items: Items held by the tribute
         kills: Kill count of the tribute.
         log: Log of all events this tribute has been a part of.
+        render: The last status render and the status it was made for.
+        card: The animated elements of the last status card and the status it was made for.
+            The static card is retained in BOARD_CACHE.
     """
     name: str
     nickname: str
@@ -631,9 +887,10 @@ class Tribute:
     items: dict["Item", int]
     kills: int
     log: list[str]
-    render: tuple[pathlib.Path, list[int]] | None
+    render: tuple[imgops.EncodedImage, list[int]] | None
+    card: tuple[list[tuple[imgops.Animation, tuple[int, int]]], list[int]] | None
 
-    def __init__(self, data: dict):
+    def __init__(self, data: dict, dead_image: str = "BW"):
         """Initialize the Tribute object.
 
         Args:
@@ -646,12 +903,21 @@ class Tribute:
                 image = "https://i.imgur.com/X3BM59z.png"
                 dead_image = "https://cdn.discordapp.com/attachments/718338933880258601/1187782049633935433/image.png"
                 ```
+                The dead_image can also be derived from the alive image, like `dead_image = "derive:redtint"`.
+                See `NINA.ext.derive` for the available derivations.
+            dead_image: The dead image to use if the tribute doesn't specify one.
+
+        Raises:
+            ValueError: The tribute asks for an unknown derivation.
         """
         self.name = data["name"]
         self.nickname = data["nickname"]
         self.gender = data["gender"]
-        self.images = {"alive": data["image"], "dead": data["dead_image"]}
-        self.hash_ident = hashlib.md5((self.name + data["image"] + data["dead_image"]).encode("utf-8")).hexdigest()
+        dead_image = data.get("dead_image", dead_image)
+        self.images = {"alive": data["image"], "dead": dead_image}
+        for source in self.images.values():
+            derive.derivation_of(source)
+        self.hash_ident = hashlib.md5((self.name + data["image"] + dead_image).encode("utf-8")).hexdigest()
         self.status = 0
         self.power = BASE_POWER
         self.district = None
@@ -661,6 +927,7 @@ class Tribute:
         self.kills = 0
         self.log = []
         self.render = None
+        self.card = None
 
     def __str__(self):
         """Text representation of the tribute."""
@@ -759,93 +1026,152 @@ class Tribute:
     async def fetch_image(
         self,
         itype: Literal["alive", "dead"] | str,
-        session: aiohttp.ClientSession,
+        prefetcher: prefetch.Prefetcher,
     ) -> pathlib.Path:
-        """Fetch the raw image of the tribute from the source.
+        """Fetch the raw image of the tribute from the source into IMAGE_STORE.
+
+        Derived images are derived from the already fetched alive image, without downloading anything.
 
         Args:
             itype: The type of image to fetch.
                 Valid values: alive, dead
-            session: The aiohttp session to use for the request.
+            prefetcher: The prefetcher to fetch linked images with.
+
+        Returns:
+            The path of the stored image.
         """
-        place = DATA_DIR / "cast" / self.hash_ident
-        place.mkdir(parents=True, exist_ok=True)
-        placepth = place / f"{itype}.webp"
-        image = self.images[itype]
+        derivation = self.derivation(itype)
+        if derivation:
+            alive = await self.fetch_image("alive", prefetcher)
+            source = self.source(itype)
+            if placepth := IMAGE_STORE.get(source):
+                return placepth
 
-        if placepth.exists():
-            return placepth
+            def _derive():
+                """Derives the image from the stored alive image."""
+                return imgops.encode_sync(derive.apply(derivation, tilecache.decode_tile(alive)))
 
-        if image == "BW" and itype == "dead":
-            img_b = await self.fetch_image("alive", session)
-        else:
-            async with session.get(image) as response:
-                if not response.ok:
-                    raise ValueError(f"Could not fetch image for tribute {self.name}.")
-                img_b = await response.read()
-
-        def _imageops_and_save():
-            """Some slow download and conversion operations."""
-            if image == "BW":
-                img = Image.open(img_b)
-                img = img.convert("LA")
-            else:
-                img = Image.open(io.BytesIO(img_b))
+            return await IMAGE_STORE.put(source, await asyncio.to_thread(_derive))
+
+        def _normalize(raw: BinaryIO) -> bytes:
+            """Some slow conversion operations."""
+            return imgops.encode_sync(imgops.resize(Image.open(raw)))
+
+        try:
+            return await prefetcher.fetch(self.source(itype), _normalize)
+        except ValueError as err:
+            raise ValueError(f"Could not fetch image for tribute {self.name}.") from err
 
-            img = imgops.resize(img)
-            imgops.magicsave_sync(img, placepth)
+    async def fetch_images(self, prefetcher: prefetch.Prefetcher) -> list[pathlib.Path]:
+        """Fetch all raw images of the tribute.
 
-        await asyncio.to_thread(_imageops_and_save)
-        return placepth
+        The prefetcher shares the alive image between everything waiting on it, so they're all fetched at once.
+
+        Args:
+            prefetcher: The prefetcher to fetch linked images with.
+
+        Returns:
+            The paths of the stored images.
+        """
+        return await asyncio.gather(*[self.fetch_image(itype, prefetcher) for itype in self.images])
+
+    def derivation(self, itype: Literal["alive", "dead"] | str) -> str | None:
+        """The derivation an image of the tribute is made with, if any.
+
+        Args:
+            itype: The type of image.
+                Valid values: alive, dead
+        """
+        if itype == "alive":
+            return None
+        return derive.derivation_of(self.images[itype])
+
+    def source(self, itype: Literal["alive", "dead"] | str) -> str:
+        """The IMAGE_STORE source of an image of the tribute.
+
+        Sources of derived images include the content of the alive image, so they must be fetched after it.
+
+        Args:
+            itype: The type of image.
+                Valid values: alive, dead
+        """
+        derivation = self.derivation(itype)
+        if derivation is None:
+            return self.images[itype]
+        return f"{derive.PREFIX}{derivation}@{IMAGE_STORE.key(self.images['alive'])}"
 
     async def get_image(self, itype: Literal["alive", "dead"] | str) -> pathlib.Path:
         """Get the current session image of the tribute.
 
         Uses local cache as source of truth, and will not cause an attempt to fetch.
+        Session images are kept in VARIANT_STORE, so they survive readies with the same cast and colors.
 
         Args:
             itype: The type of image to fetch.
                 Valid values: alive, dead
         """
-        place = DATA_DIR / "session_cast" / self.hash_ident
-        place.mkdir(parents=True, exist_ok=True)
-        fname = f"{itype}.webp"
-        placepth = place / fname
-        if placepth.exists():
-            return placepth
-
-        raw_path = DATA_DIR / "cast" / self.hash_ident / fname
+        raw_path = IMAGE_STORE.get(self.source(itype))
 
-        if not raw_path.exists():
+        if raw_path is None:
             raise FileNotFoundError(f"Could not get image for tribute {self.name}.")
 
+        source = variant_source("session", raw_path.stem, self.district.color)
+        if placepth := VARIANT_STORE.get(source):
+            return placepth
+
         def _process():
             """Applies session-specific postprocessing."""
             img = Image.open(raw_path)
             img = imgops.resize(img, border_c=self.district.color)
-            imgops.magicsave_sync(img, placepth)
+            return imgops.encode_sync(img)
 
-        await asyncio.to_thread(_process)
-        return placepth
+        return await VARIANT_STORE.put(source, await asyncio.to_thread(_process))
 
-    async def get_status_render(self, sim: Simulation) -> pathlib.Path:
-        """Get an assembled image representing the tribute.
+    async def get_tile(self, itype: Literal["alive", "dead"] | str) -> tilecache.Tile:
+        """Get the current session image of the tribute, decoded.
+
+        Served from TILE_CACHE, which is keyed by the content of the image and the district color.
+        Revalidated links can resolve to new content, which must not be served from the old tiles.
+
+        Args:
+            itype: The type of image to fetch.
+                Valid values: alive, dead
+        """
+        key = (IMAGE_STORE.key(self.source(itype)), self.district.color)
+        tile = TILE_CACHE.get(key)
+        if tile is None:
+            tile = await asyncio.to_thread(tilecache.decode_tile, await self.get_image(itype))
+            TILE_CACHE.put(key, tile)
+        return tile
+
+    def status_key(self) -> list:
+        """What the status card of the tribute shows.
+
+        The status, kills and effective power, and the content of the image currently shown,
+        so a revalidated image that changed is drawn again.
+        """
+        itype = ("alive", "dead")[self.status]
+        return [self.status, self.kills, self.effectivepower(), IMAGE_STORE.key(self.source(itype))]
+
+    async def get_status_card(
+            self, sim: Simulation) -> tuple[Image.Image, list[tuple[imgops.Animation, tuple[int, int]]]]:
+        """Get a decoded, unencoded image representing the tribute.
 
         With the status, kills and effective power.
 
         Args:
             sim: The simulation being rendered for.
+
+        Returns:
+            The static card and the animated elements to composite on top of it.
+            The card is shared, so it must not be modified in place.
         """
         t = sim.t
-        status = [self.status, self.kills, self.effectivepower()]
-        if self.render and self.render[1] == status:
-            return self.render[0]
-        place = DATA_DIR / "session_cast" / self.hash_ident
-        place.mkdir(parents=True, exist_ok=True)
-        if self.status:
-            user_image = Image.open(await self.get_image("dead"))
-        else:
-            user_image = Image.open(await self.get_image("alive"))
+        itype = ("alive", "dead")[self.status]
+        status = self.status_key()
+        if self.card and self.card[1] == status and (card := BOARD_CACHE.get((self, "card"))) is not None:
+            return card, self.card[0]
+        user_image = await self.get_tile(itype)
 
         base_image = Image.new("RGBA", (512, 640), (0, 0, 0, 0))
         font = ImageFont.truetype(FONT, size=28)
@@ -859,18 +1185,37 @@ class Tribute:
         if self.status:
             draw.rectangle((0, 512, 512, 640), fill=(255, 0, 0, 180))
 
-        draw.text((256, 675), t(text), font=font, anchor="md", **DRAW_ARGS)
-        landing = place / "status.webp"
+        draw.text((256, 675), t(text), font=font, anchor="md", **sim.draw_args)
         animated = []
-        if getattr(user_image, "n_frames", 1) == 1:
-            if user_image.mode != "RGBA":
-                user_image = user_image.convert("RGBA")
+        if isinstance(user_image, imgops.Animation):
+            animated.append((user_image, (0, 0)))
+        else:
             base_image.paste(user_image, (0, 0), user_image)
+        BOARD_CACHE.put((self, "card"), base_image)
+        self.card = (animated, status)
+        return base_image, animated
+
+    async def get_status_render(self, sim: Simulation) -> imgops.EncodedImage:
+        """Get an assembled image representing the tribute.
+
+        With the status, kills and effective power.
+
+        Args:
+            sim: The simulation being rendered for.
+        """
+        status = self.status_key()
+        if self.render and self.render[1] == status:
+            return self.render[0]
+        source = variant_source("status", status[3], self.district.color, self.name, *status[:3], sim.owo_toggwe,
+                                sim.draw_args)
+        if placepth := VARIANT_STORE.get(source):
+            render = imgops.EncodedImage(await asyncio.to_thread(placepth.read_bytes), "status.webp")
         else:
-            animated.append((user_image, (0, 0)))
-        await imgops.save_composite_image(landing, base_image, animated)
-        self.render = (landing, status)
-        return landing
+            base_image, animated = await self.get_status_card(sim)
+            render = await imgops.composite_image("status.webp", base_image, animated)
+            await VARIANT_STORE.put(source, render.data)
+        self.render = (render, status)
+        return archive_render(sim, render, "session_cast", self.hash_ident, "status.webp")
 
 
 class Cycle:
@@ -924,10 +1269,8 @@ class Cycle:
         """Text representation of the cycle."""
         return f"Project: NINA Cycle: {self.name}"
 
-    async def render_start(self, simstate: Simulation) -> pathlib.Path:
+    async def render_start(self, simstate: Simulation) -> imgops.EncodedImage:
         """Get an image representing the start of the cycle."""
-        place = DATA_DIR / "cycles" / f"{simstate.cycle}" / "start.webp"
-        place.parent.mkdir(parents=True, exist_ok=True)
         image = Image.new("RGBA", (512, 64), (0, 0, 0, 0))
         draw = ImageDraw.Draw(image)
         font = ImageFont.truetype(FONT, size=64)
@@ -937,14 +1280,15 @@ class Cycle:
             y_print = 0
             anchor = "ma"
             font = ImageFont.truetype(FONT, size=16)
-            draw_max_text(image, simstate.t(self.text), (512, 32), "md", (256, 64))
+            await asyncio.to_thread(draw_max_text, image, simstate.t(self.text), (512, 32), "md", (256, 64),
+                                    simstate.draw_args)
         draw.text((256, y_print),
                   simstate.t(f"Cycle {simstate.cycle}: {self.name}"),
                   anchor=anchor,
                   font=font,
-                  **DRAW_ARGS)
-        await imgops.magicsave(image, place)
-        return place
+                  **simstate.draw_args)
+        render = await imgops.render(image, "start.webp")
+        return archive_render(simstate, render, "cycles", f"{simstate.cycle}", "start.webp")
 
 
 class Event:
@@ -1439,7 +1783,7 @@ class Event:
         return "\n".join(resolutuion_strings)
 
     async def rendered_resolve(self, tributes: list[Tribute], simstate: Simulation,
-                               event_no: int) -> tuple[str, pathlib.Path]:
+                               event_no: int) -> tuple[str, imgops.EncodedImage]:
         """Resolve the event with a rendered image.
 
         Resolves the tribute changes and returns the resolution text and the rendered image.
@@ -1451,25 +1795,25 @@ class Event:
         """
         tribute_c = len(tributes)
         base_image = Image.new("RGBA", (512 * tribute_c + 64 * (tribute_c + 1), 640), (0, 0, 0, 0))
-        tribute_images = await asyncio.gather(
-            *[tribute.get_image(["alive", "dead"][tribute.status]) for tribute in tributes])
-        tribute_images = [Image.open(im) for im in tribute_images]
-        text = await self.resolve(tributes, simstate)
-        draw_max_text(base_image, text, (base_image.width, 128), "md", (base_image.width // 2, 640))
+        with spans.span("tiles"):
+            tribute_images = await asyncio.gather(
+                *[tribute.get_tile(["alive", "dead"][tribute.status]) for tribute in tributes])
+        with spans.span("resolve"):
+            text = await self.resolve(tributes, simstate)
+        # Fitting the text measures it over and over, so it's kept off the event loop.
+        with spans.span("text"):
+            await asyncio.to_thread(draw_max_text, base_image, text, (base_image.width, 128), "md",
+                                    (base_image.width // 2, 640), simstate.draw_args)
         animation = []
         for i, tribute_image in enumerate(tribute_images):
             pos = (64 + i * 576, 0)
-            if getattr(tribute_image, "n_frames", 1) != 1:
+            if isinstance(tribute_image, imgops.Animation):
                 animation.append((tribute_image, pos))
                 continue
-            if tribute_image.mode != "RGBA":
-                tribute_image = tribute_image.convert("RGBA")
             base_image.paste(tribute_image, pos, tribute_image)
-        landing = DATA_DIR / "cycles" / f"{simstate.cycle}"
-        landing.mkdir(parents=True, exist_ok=True)
-        landing = landing / f"{event_no}.webp"
-        await imgops.save_composite_image(landing, base_image, animation)
-        return text, landing
+        filename = f"{event_no}.webp"
+        render = await imgops.composite_image(filename, base_image, animation)
+        return text, archive_render(simstate, render, "cycles", f"{simstate.cycle}", filename)
 
 
 class Item:
@@ -90,9 +90,8 @@ def sim_setup_check():
         Returns:
             `bool`: Whether the data is loaded into the simulation
         """
-        direct = interaction.client.basp
-        castdir, eventsdir = direct.joinpath("cast.toml"), direct.joinpath("events.toml")
-        if not castdir.exists() or not eventsdir.exists():
+        game = await interaction.client.games.get(interaction)
+        if not await game.is_setup():
             setup_id = 0
             for command in interaction.client.full_tree:
                 if command.name == "setup":
@@ -127,7 +126,8 @@ def sim_ready_check():
             `bool`: Whether the data is loaded into the simulation
         """
         bt = interaction.client
-        if not bt.sim or bt.sim.cycle == -2:
+        sim = (await bt.games.get(interaction)).sim
+        if not sim or sim.cycle == -2:
             ready_id = 0
             for command in bt.full_tree:
                 if command.name == "ready":
@@ -0,0 +1,137 @@
+"""Local derivation of tribute image variants.
+
+Rather than downloading a second image for every tribute, the dead image can be derived from the alive one.
+Derivations are simple per-frame filters, registered by name, which casts can select per tribute or globally.
+
+In a cast file, a derivation is selected with `dead_image = "derive:<name>"`. The legacy `dead_image = "BW"`
+is an alias for `derive:grayscale`. A `dead_image` at the top of the cast file applies to every tribute
+without one.
+
+Typical usage example:
+    ```py
+    from NINA.ext import derive
+
+    @derive.register("sepia")
+    def sepia(frame: Image.Image) -> Image.Image:
+        ...
+
+    image = derive.apply("sepia", image)
+    ```
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2023-present Tech. TTGames
+
+from __future__ import annotations
+
+import functools
+from typing import Callable
+
+from NINA.ext import lazy
+
+Image = lazy.load("PIL.Image")
+ImageDraw = lazy.load("PIL.ImageDraw")
+ImageEnhance = lazy.load("PIL.ImageEnhance")
+ImageOps = lazy.load("PIL.ImageOps")
+imgops = lazy.load("NINA.ext.imgops")
+
+PREFIX = "derive:"
+"""The prefix marking an image source as a derivation, rather than a link."""
+ALIASES = {"BW": "grayscale"}
+"""Legacy image source values and the derivations they stand for."""
+DERIVATIONS: dict[str, Callable[[Image.Image], Image.Image]] = {}
+"""The registered derivations, by name. Each takes and returns a single RGBA frame."""
+
+
+def register(name: str) -> Callable[[Callable[[Image.Image], Image.Image]], Callable[[Image.Image], Image.Image]]:
+    """Registers a derivation under the given name.
+
+    Args:
+        name: The name casts select the derivation with.
+
+    Returns:
+        A decorator registering the derivation. The derivation itself is returned unchanged.
+    """
+
+    def decorator(func: Callable[[Image.Image], Image.Image]) -> Callable[[Image.Image], Image.Image]:
+        DERIVATIONS[name] = func
+        return func
+
+    return decorator
+
+
+def derivation_of(source: str) -> str | None:
+    """Resolves the derivation an image source asks for.
+
+    Args:
+        source: The image source, as written in the cast file.
+
+    Returns:
+        The name of the derivation, or None if the source is a link.
+
+    Raises:
+        ValueError: The source asks for a derivation that isn't registered.
+    """
+    if source in ALIASES:
+        return ALIASES[source]
+    if not source.startswith(PREFIX):
+        return None
+    name = source.removeprefix(PREFIX)
+    if name not in DERIVATIONS:
+        raise ValueError(f"Unknown image derivation '{name}'.")
+    return name
+
+
+def apply(name: str, image: Image.Image | imgops.Animation) -> Image.Image | tuple[list[Image.Image], dict]:
+    """Applies a derivation to every frame of an image.
+
+    Args:
+        name: The name of the derivation.
+        image: The decoded RGBA image or animation to derive from.
+
+    Returns:
+        The derived image, or animated image tuple as taken by `imgops.encode_sync`.
+    """
+    func = DERIVATIONS[name]
+    if isinstance(image, imgops.Animation):
+        return [func(frame) for frame in image.frames], {"duration": image.durations, "loop": 0}
+    return func(image)
+
+
+@functools.lru_cache(maxsize=8)
+def cross_overlay(size: tuple[int, int]) -> Image.Image:
+    """Renders a transparent overlay with a red cross, to be pasted over images. Do not modify the result.
+
+    Args:
+        size: The size of the overlay.
+    """
+    overlay = Image.new("RGBA", size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+    width = max(size) // 16
+    inset = max(size) // 8
+    draw.line((inset, inset, size[0] - inset, size[1] - inset), fill=(220, 20, 20, 230), width=width)
+    draw.line((inset, size[1] - inset, size[0] - inset, inset), fill=(220, 20, 20, 230), width=width)
+    return overlay
+
+
+@register("grayscale")
+def grayscale(frame: Image.Image) -> Image.Image:
+    """Drops all color from the frame."""
+    return frame.convert("LA").convert("RGBA")
+
+
+@register("redtint")
+def redtint(frame: Image.Image) -> Image.Image:
+    """Maps the frame onto a black to red gradient."""
+    tinted = ImageOps.colorize(frame.convert("L"), (0, 0, 0), (255, 48, 48)).convert("RGBA")
+    tinted.putalpha(frame.getchannel("A"))
+    return tinted
+
+
+@register("crossed")
+def crossed(frame: Image.Image) -> Image.Image:
+    """Mostly desaturates the frame and crosses it out."""
+    faded = ImageEnhance.Color(frame).enhance(0.2)
+    overlay = cross_overlay(frame.size)
+    faded.paste(overlay, (0, 0), overlay)
+    return faded
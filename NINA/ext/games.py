@@ -0,0 +1,170 @@
+"""The registry of hosted games.
+
+Every channel hosts its own game, with its own simulation, lock, data directory and settings.
+Games share the image caches and stores of `NINA.ext.NINA`, which are keyed by content, but no mutable state.
+
+Typical usage example:
+    ```py
+    from NINA.ext import games
+    registry = games.GameRegistry(pathlib.Path("data/games"))
+    game = await registry.get(interaction)
+    async with game.lock:
+        game.sim = await game.new_simulation()
+        await game.sim.ready()
+    ```
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2023-present Tech. TTGames
+
+import asyncio
+import logging
+import pathlib
+from typing import Iterator
+
+import discord
+import owo
+
+from NINA.ext import NINA
+from NINA.ext import storage
+
+logger = logging.getLogger("NINA.games")
+
+GameKey = tuple[int, int]
+"""The guild and channel IDs a game is hosted in."""
+
+
+class Game:
+    """A game hosted in a channel, and everything scoped to it.
+
+    Attributes:
+        key: The guild and channel IDs the game is hosted in.
+        data_dir: The directory holding the cast and events files of the game, and its archived renders.
+        lock: Held by commands changing the game.
+        sim: The simulation of the game. None if it isn't set up.
+        owo_toggwe: The owo toggle.
+        event_batch: The maximum amount of events delivered in a single message.
+        draw_args: The text drawing arguments of the game's renders.
+    """
+    key: GameKey
+    data_dir: pathlib.Path
+    lock: asyncio.Lock
+    sim: NINA.Simulation | None
+    owo_toggwe: bool
+    event_batch: int
+    draw_args: dict
+
+    def __init__(self, key: GameKey, data_dir: pathlib.Path) -> None:
+        """Initialize the Game object.
+
+        Settings start from the bot-wide defaults of `NINA.ext.NINA`.
+
+        Args:
+            key: The guild and channel IDs the game is hosted in.
+            data_dir: The directory of the game's data.
+        """
+        self.key = key
+        self.data_dir = data_dir
+        self.lock = asyncio.Lock()
+        self.sim = None
+        self.owo_toggwe = False
+        self.event_batch = NINA.EVENT_BATCH
+        self.draw_args = dict(NINA.DRAW_ARGS)
+
+    def __repr__(self) -> str:
+        return f"<Game(key={self.key}, sim={self.sim.name if self.sim else None}, locked={self.lock.locked()})>"
+
+    @property
+    def cast_file(self) -> pathlib.Path:
+        """The cast file of the game."""
+        return self.data_dir / "cast.toml"
+
+    @property
+    def events_file(self) -> pathlib.Path:
+        """The events file of the game."""
+        return self.data_dir / "events.toml"
+
+    async def is_setup(self) -> bool:
+        """Whether the cast and events files of the game exist."""
+        return await storage.exists(self.cast_file, self.events_file)
+
+    def t(self, text: str) -> str:
+        """Adjusts text according to the current owo_toggwe mode."""
+        if self.owo_toggwe:
+            return owo.owo(text)
+        return text
+
+    async def new_simulation(self) -> NINA.Simulation:
+        """Create a fresh simulation from the game's files and settings.
+
+        The files are read and parsed in a thread.
+
+        Raises:
+            ValueError: The files are invalid.
+            KeyError: The files are missing required values.
+        """
+        return await asyncio.to_thread(NINA.Simulation, self.cast_file, self.events_file, self.owo_toggwe,
+                                       self.data_dir, self.draw_args)
+
+    async def load(self) -> None:
+        """Load the last simulation of the game, if it was set up. Invalid files are purged."""
+        if not await self.is_setup():
+            return
+        try:
+            self.sim = await self.new_simulation()
+            logger.info("Loaded last simulation data of game %s.", self.key)
+        except (ValueError, KeyError):
+            self.sim = None
+            await storage.remove(self.cast_file, self.events_file)
+            logger.info("Local files of game %s invalid/corrupt. Purged from system.", self.key)
+
+
+class GameRegistry:
+    """The games hosted by the bot, by guild and channel.
+
+    Attributes:
+        root: The directory holding the data directories of all games.
+    """
+    root: pathlib.Path
+
+    def __init__(self, root: pathlib.Path) -> None:
+        """Initialize the GameRegistry object.
+
+        Args:
+            root: The directory holding the data directories of all games.
+        """
+        self.root = root
+        self._games: dict[GameKey, Game] = {}
+        self._loading: dict[GameKey, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        """The amount of games loaded."""
+        return len(self._games)
+
+    def __iter__(self) -> Iterator[Game]:
+        """Iterates over the games loaded."""
+        return iter(list(self._games.values()))
+
+    @staticmethod
+    def key(interaction: discord.Interaction) -> GameKey:
+        """The key of the game an interaction belongs to."""
+        return interaction.guild_id or 0, interaction.channel_id or 0
+
+    async def get(self, interaction: discord.Interaction) -> Game:
+        """The game an interaction belongs to, loading its last simulation on first use.
+
+        Interactions arriving while the game loads wait for it.
+
+        Args:
+            interaction: The interaction.
+        """
+        key = self.key(interaction)
+        game = self._games.get(key)
+        if game is None:
+            game = self._games[key] = Game(key, self.root / f"{key[0]}-{key[1]}")
+            task = self._loading[key] = asyncio.create_task(game.load())
+            # Only done loading once the task is, even if every interaction waiting for it was cancelled.
+            task.add_done_callback(lambda _: self._loading.pop(key, None))
+        if key in self._loading:
+            await asyncio.shield(self._loading[key])
+        return game
@@ -1,6 +1,17 @@
 """Various aiohttp stuffs.
 
-In practice mostly factory functions for middleware.
+In practice mostly middleware, and the factory functions for it.
+`ResilientMiddleware` retries transient failures with backoff, rate limits every host with a token bucket that
+learns from the host's rate limit headers, and stops calling hosts that are down.
+
+Typical usage example:
+    ```py
+    from NINA.ext import http
+    middleware = http.ResilientMiddleware(attempts=3)
+    session = aiohttp.ClientSession(middlewares=(middleware,))
+    ...
+    print(middleware.metrics.stats())
+    ```
 """
 # License: EPL-2.0
 # SPDX-License-Identifier: EPL-2.0
@@ -10,12 +21,74 @@ from datetime import datetime
 from datetime import timezone
 from email.utils import parsedate_to_datetime
 import logging
-from typing import Awaitable, Callable
+import random
+import time
+from typing import Awaitable, Callable, Mapping
 
 import aiohttp
 
 logger = logging.getLogger(__name__)
 AIOHTTPMiddleware = Callable[[aiohttp.ClientRequest, Callable[..., Awaitable]], Awaitable]
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+"""The response statuses worth retrying."""
+RATE_LIMIT_STATUSES = frozenset({429, 503})
+"""The response statuses that mean the host wants us to slow down."""
+TRANSIENT_ERRORS = (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError)
+"""The exceptions worth retrying."""
+
+
+class CircuitOpenError(aiohttp.ClientConnectionError):
+    """A request was refused without being sent, as its host is considered down."""
+
+
+def retry_after(headers: Mapping[str, str]) -> float | None:
+    """Parses the Retry-After header.
+
+    Args:
+        headers: The response headers.
+
+    Returns:
+        The amount of seconds to wait, or None if there is no valid header.
+    """
+    value = headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+    except (TypeError, ValueError):
+        return None
+
+
+def rate_limit_reset(headers: Mapping[str, str]) -> float | None:
+    """Parses the common rate limit headers.
+
+    Understands the IETF RateLimit-* and the X-RateLimit-* headers, with resets in seconds or as epoch times.
+
+    Args:
+        headers: The response headers.
+
+    Returns:
+        The amount of seconds until the rate limit resets if it's exhausted, otherwise None.
+    """
+    remaining = headers.get("RateLimit-Remaining", headers.get("X-RateLimit-Remaining"))
+    if remaining is None:
+        return None
+    try:
+        if float(remaining) > 0:
+            return None
+        reset = float(
+            headers.get("RateLimit-Reset", headers.get("X-RateLimit-Reset-After", headers.get("X-RateLimit-Reset",
+                                                                                                "1"))))
+    except ValueError:
+        return None
+    if reset > 1_000_000_000:
+        # An epoch time rather than an amount of seconds.
+        reset -= time.time()
+    return max(0.0, reset)
 
 
 def create_retry_middleware(attempts: int = 2, timecap: int = 30) -> AIOHTTPMiddleware:
@@ -56,3 +129,347 @@ def create_retry_middleware(attempts: int = 2, timecap: int = 30) -> AIOHTTPMidd
         return response
 
     return retry_middleware
+
+
+class TokenBucket:
+    """A token bucket rate limiter that adapts to the host it limits.
+
+    The rate is halved every time the host rate limits us, and slowly recovers with every successful request.
+    The bucket can also be paused, for hosts that told us exactly how long to wait.
+
+    Attributes:
+        rate: The current amount of tokens refilled per second.
+        max_rate: The rate the bucket recovers to.
+        capacity: The maximum amount of tokens, the burst size.
+    """
+    rate: float
+    max_rate: float
+    capacity: float
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        """Initialize the TokenBucket object.
+
+        Args:
+            rate: The amount of tokens refilled per second.
+            capacity: The maximum amount of tokens, the burst size.
+        """
+        self.rate = rate
+        self.max_rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def _refill(self) -> float:
+        """Refills the bucket, returning the current time."""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return now
+
+    async def acquire(self) -> float:
+        """Waits for a token.
+
+        Returns:
+            The amount of seconds waited.
+        """
+        waited = 0.0
+        while True:
+            now = self._refill()
+            if now < self._paused_until:
+                delay = self._paused_until - now
+            elif self._tokens >= 1:
+                self._tokens -= 1
+                return waited
+            else:
+                delay = (1 - self._tokens) / self.rate
+            await asyncio.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float) -> None:
+        """Holds off every request for a while.
+
+        Args:
+            seconds: The amount of seconds to hold off for.
+        """
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def slow_down(self) -> None:
+        """Halves the rate, the host is rate limiting us."""
+        self.rate = max(self.max_rate / 64, self.rate / 2)
+
+    def recover(self) -> None:
+        """Recovers the rate a little, the host accepted a request."""
+        self.rate = min(self.max_rate, self.rate + self.max_rate / 16)
+
+
+class CircuitBreaker:
+    """Stops requests to a host after consecutive failures, letting a single trial request through after a cooldown.
+
+    Attributes:
+        threshold: The amount of consecutive failures that open the circuit.
+        cooldown: The amount of seconds the circuit stays open before a trial request.
+        failures: The current amount of consecutive failures.
+    """
+    threshold: int
+    cooldown: float
+    failures: int
+
+    def __init__(self, threshold: int, cooldown: float) -> None:
+        """Initialize the CircuitBreaker object.
+
+        Args:
+            threshold: The amount of consecutive failures that open the circuit.
+            cooldown: The amount of seconds the circuit stays open before a trial request.
+        """
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self._opened = 0.0
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        """The state of the circuit. Either "closed", "open" or "half-open"."""
+        if self.failures < self.threshold:
+            return "closed"
+        if time.monotonic() - self._opened < self.cooldown:
+            return "open"
+        return "half-open"
+
+    def allow(self) -> bool:
+        """Whether a request may be sent. In the half-open state only a single trial request is allowed."""
+        match self.state:
+            case "closed":
+                return True
+            case "open":
+                return False
+            case _:
+                if self._trial:
+                    return False
+                self._trial = True
+                return True
+
+    def success(self) -> None:
+        """Records a successful request, closing the circuit."""
+        self.failures = 0
+        self._trial = False
+
+    def failure(self) -> bool:
+        """Records a failed request.
+
+        Returns:
+            Whether the failure opened the circuit.
+        """
+        was_closed = self.failures < self.threshold
+        self.failures += 1
+        self._trial = False
+        if self.failures >= self.threshold:
+            self._opened = time.monotonic()
+            return was_closed or self.failures > self.threshold
+        return False
+
+    def release(self) -> None:
+        """Gives up the trial request without an outcome, letting another one through."""
+        self._trial = False
+
+
+class HTTPMetrics:
+    """Counters of what the resilient middleware did.
+
+    Attributes:
+        requests: The amount of requests made through the middleware.
+        attempts: The amount of attempts sent to hosts, including retries.
+        retries: The amount of retried attempts.
+        failures: The amount of requests that failed after all their attempts.
+        rate_limited: The amount of responses that were rate limits.
+        rejected: The amount of requests refused by an open circuit.
+        trips: The amount of times a circuit opened.
+        waited: The total amount of seconds spent waiting on rate limits and backoff.
+    """
+    requests: int
+    attempts: int
+    retries: int
+    failures: int
+    rate_limited: int
+    rejected: int
+    trips: int
+    waited: float
+
+    def __init__(self) -> None:
+        """Initialize the HTTPMetrics object."""
+        self.requests = 0
+        self.attempts = 0
+        self.retries = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.rejected = 0
+        self.trips = 0
+        self.waited = 0.0
+
+    def __repr__(self) -> str:
+        return f"<HTTPMetrics({', '.join(f'{key}={value}' for key, value in self.stats().items())})>"
+
+    def stats(self) -> dict[str, int | float]:
+        """Returns the current metrics."""
+        return {
+            "requests": self.requests,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "failures": self.failures,
+            "rate_limited": self.rate_limited,
+            "rejected": self.rejected,
+            "trips": self.trips,
+            "waited": round(self.waited, 3),
+        }
+
+
+class ResilientMiddleware:
+    """A middleware that retries transient failures, rate limits per host and stops calling hosts that are down.
+
+    Connection errors, timeouts and retryable statuses are retried with exponential backoff and full jitter.
+    A Retry-After header is honored instead of the backoff, and pauses every request to the host.
+    Every host gets its own `TokenBucket` and `CircuitBreaker`.
+
+    Attributes:
+        attempts: The amount of retries after the initial attempt.
+        timecap: The maximum amount of seconds to wait before a retry. Longer waits give up right away.
+        base_delay: The backoff before the first retry, in seconds. Doubles with every retry.
+        max_delay: The maximum backoff in seconds.
+        rate: The amount of requests per second each host is allowed at most.
+        burst: The amount of requests each host is allowed in a burst.
+        failure_threshold: The amount of consecutive failures after which a host is considered down.
+        cooldown: The amount of seconds a host is considered down for.
+        metrics: The counters of what the middleware did.
+    """
+    attempts: int
+    timecap: float
+    base_delay: float
+    max_delay: float
+    rate: float
+    burst: float
+    failure_threshold: int
+    cooldown: float
+    metrics: HTTPMetrics
+
+    def __init__(self,
+                 attempts: int = 3,
+                 timecap: float = 30,
+                 base_delay: float = 0.5,
+                 max_delay: float = 10,
+                 rate: float = 10,
+                 burst: float = 10,
+                 failure_threshold: int = 5,
+                 cooldown: float = 30) -> None:
+        """Initialize the ResilientMiddleware object.
+
+        Args:
+            attempts: The amount of retries after the initial attempt.
+            timecap: The maximum amount of seconds to wait before a retry. Longer waits give up right away.
+            base_delay: The backoff before the first retry, in seconds. Doubles with every retry.
+            max_delay: The maximum backoff in seconds.
+            rate: The amount of requests per second each host is allowed at most.
+            burst: The amount of requests each host is allowed in a burst.
+            failure_threshold: The amount of consecutive failures after which a host is considered down.
+            cooldown: The amount of seconds a host is considered down for.
+        """
+        self.attempts = attempts
+        self.timecap = timecap
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate = rate
+        self.burst = burst
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.metrics = HTTPMetrics()
+        self._buckets: dict[str, TokenBucket] = {}
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def bucket(self, host: str) -> TokenBucket:
+        """The token bucket of a host."""
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.rate, self.burst)
+        return self._buckets[host]
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        """The circuit breaker of a host."""
+        if host not in self._breakers:
+            self._breakers[host] = CircuitBreaker(self.failure_threshold, self.cooldown)
+        return self._breakers[host]
+
+    def backoff(self, attempt: int) -> float:
+        """The jittered backoff before a retry.
+
+        Args:
+            attempt: The amount of attempts already made.
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**(attempt - 1)))
+
+    async def __call__(self, request: aiohttp.ClientRequest,
+                       handler: Callable[..., Awaitable]) -> aiohttp.ClientResponse:
+        host = f"{request.url.host}:{request.url.port}"
+        bucket = self.bucket(host)
+        breaker = self.breaker(host)
+        self.metrics.requests += 1
+        for attempt in range(1, self.attempts + 2):
+            trial = breaker.state == "half-open"
+            if not breaker.allow():
+                self.metrics.rejected += 1
+                self.metrics.failures += 1
+                raise CircuitOpenError(f"{host} is considered down, not sending the request to {request.url}.")
+            last = attempt > self.attempts
+            try:
+                self.metrics.waited += await bucket.acquire()
+                self.metrics.attempts += 1
+                response = await handler(request)
+            except TRANSIENT_ERRORS as err:
+                self._failed(host, breaker)
+                if last or breaker.state == "open":
+                    self.metrics.failures += 1
+                    raise
+                delay = self.backoff(attempt)
+                logger.warning("Request to %s failed with %r. Retrying in %.2f seconds.", request.url, err, delay)
+            except BaseException:
+                # Cancelled, or failed in a way that says nothing about the host. The trial has to be freed,
+                # or no other request would ever be let through.
+                if trial:
+                    breaker.release()
+                raise
+            else:
+                if reset := rate_limit_reset(response.headers):
+                    bucket.pause(reset)
+                if response.status not in RETRY_STATUSES:
+                    breaker.success()
+                    bucket.recover()
+                    return response
+                delay = self.backoff(attempt)
+                wait = retry_after(response.headers)
+                if response.status in RATE_LIMIT_STATUSES and (response.status == 429 or wait is not None):
+                    # The host is up, just asking us to slow down.
+                    breaker.success()
+                    bucket.slow_down()
+                    self.metrics.rate_limited += 1
+                    if wait is not None:
+                        if wait >= self.timecap:
+                            return response
+                        delay = max(0.0, wait)
+                        bucket.pause(delay)
+                else:
+                    self._failed(host, breaker)
+                if last or breaker.state == "open":
+                    logger.error("Request to %s failed after %d attempts.", request.url, attempt)
+                    self.metrics.failures += 1
+                    return response
+                logger.warning("Request to %s failed with status %d. Retrying in %.2f seconds.", request.url,
+                               response.status, delay)
+                await response.release()
+            self.metrics.retries += 1
+            self.metrics.waited += delay
+            await asyncio.sleep(delay)
+
+    def _failed(self, host: str, breaker: CircuitBreaker) -> None:
+        """Records a failed attempt, logging if it took the host down."""
+        if breaker.failure():
+            self.metrics.trips += 1
+            logger.error("%s failed %d times in a row. Considering it down for %.0f seconds.", host,
+                         breaker.failures, breaker.cooldown)
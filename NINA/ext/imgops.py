@@ -12,20 +12,84 @@ Typical usage example:
 # SPDX-License-Identifier: EPL-2.0
 # Copyright (c) 2023-present Tech. TTGames
 import asyncio
+import bisect
+import functools
+import io
 import itertools
 import pathlib
 import logging
+import time
+from typing import Iterator
 
 from PIL import Image
 from PIL import ImageDraw
-from PIL import ImageOps
 from PIL import ImageSequence
 
+from NINA.ext import metrics
+from NINA.ext import spans
+from NINA.ext import workers
+
 logger = logging.getLogger("NINA.imgops")
 
 SIZE = (512, 512)
 WEBP_COMPRESSION = (4, 80)
 MAX_DISCORD_SIZE = 9.5 * 1024 * 1024
+REDUCING_GAP = 1.0
+"""How close to the target size oversized sources are reduced (box-sampled or JPEG-drafted) before resampling."""
+MAX_FRAMES = 240
+"""The maximum amount of frames a composited animation may have."""
+FRAME_PIXEL_BUDGET = 160_000_000
+"""The maximum amount of pixels (frames * width * height) a composited animation may encode."""
+_ARCHIVE_TASKS: set[asyncio.Task] = set()
+"""References to running archive writes, so they aren't garbage collected mid-flight."""
+
+
+def fit_geometry(source: tuple[int, int], size: tuple[int, int] = SIZE) -> tuple[tuple[int, int], tuple[int, int]]:
+    """Computes where an image lands when fitted into a box, keeping its aspect ratio.
+
+    Args:
+        source: The size of the image to fit.
+        size: The size of the box to fit the image into.
+
+    Returns:
+        The size to resize the image to, and the offset to paste it at to center it.
+    """
+    ratio = min(size[0] / source[0], size[1] / source[1])
+    fitted = (max(1, round(source[0] * ratio)), max(1, round(source[1] * ratio)))
+    return fitted, ((size[0] - fitted[0]) // 2, (size[1] - fitted[1]) // 2)
+
+
+def _fit_frame(
+    im: Image.Image,
+    geometry: tuple[tuple[int, int], tuple[int, int]],
+    size: tuple[int, int],
+    overlay: Image.Image | None,
+) -> Image.Image:
+    """Fits a single frame into the box, with precomputed geometry.
+
+    Args:
+        im: The frame to fit.
+        geometry: The fitted size and offset, as returned by `fit_geometry`.
+        size: The size of the box.
+        overlay: An optional overlay to paste on top, such as a border.
+    """
+    fitted, offset = geometry
+    if im.mode not in ("RGB", "RGBA", "L", "LA"):
+        # Palette and bilevel images would only be resized with nearest neighbour.
+        im = im.convert("RGBA")
+    if im.size != fitted:
+        im = im.resize(fitted, Image.Resampling.BICUBIC, reducing_gap=REDUCING_GAP)
+    # Converting after the resize touches far fewer pixels.
+    im = im.convert("RGBA") if im.mode != "RGBA" else im
+    if fitted == size:
+        new_image = im.copy() if overlay else im
+    else:
+        # Fitted images are resized to keep an aspect ratio, so paste them onto a transparent image
+        new_image = Image.new("RGBA", size, (255, 0, 0, 0))
+        new_image.paste(im, offset, im)
+    if overlay:
+        new_image.paste(overlay, (0, 0), overlay)
+    return new_image
 
 
 def thumbpaste(
@@ -40,22 +104,10 @@ def thumbpaste(
         size: The size to resize the image to.
         border_c: An optional string of the color for the border to use for the image
     """
-    if im.mode != "RGBA":
-        im = im.convert("RGBA")
-
-    if im.size[0] > size[0] or im.size[1] > size[1]:
-        im.thumbnail(size)
-    if im.size[0] < size[0] or im.size[1] < size[1]:
-        # Upscale the image to the correct size, while trying to keep the aspect ratio
-        im = ImageOps.contain(im, size)
-    # Thumbnails are resized to keep an aspect ratio, so paste the thumbnail onto a transparent image
-    new_image = Image.new("RGBA", size, (255, 0, 0, 0))
-    padding_x = (size[0] - im.size[0]) // 2
-    padding_y = (size[1] - im.size[1]) // 2
-    new_image.paste(im, (padding_x, padding_y), im)
-    if border_c:
-        border(new_image, border_c)
-    return new_image
+    geometry = fit_geometry(im.size, size)
+    # Let decoders that support it (JPEG) decode straight at a reduced scale.
+    im.draft(None, (int(geometry[0][0] * REDUCING_GAP), int(geometry[0][1] * REDUCING_GAP)))
+    return _fit_frame(im, geometry, size, border_overlay(size, border_c) if border_c else None)
 
 
 def resize(
@@ -68,6 +120,7 @@ def resize(
     This function resizes an image to the correct size for the simulation.
     This is done by resizing the image to the given size, and then pasting
     the resized image onto a blank image of the correct size.
+    For animations, the geometry and border are only computed once and applied to every frame.
 
     Args:
         im: The image to resize.
@@ -81,54 +134,119 @@ def resize(
         # Not an animated image
         return thumbpaste(im, size, border_c=border_c)
     # Now do the same but for each frame in the animated image
-    frames = []
-    for frame in ImageSequence.Iterator(im):
-        frames.append(thumbpaste(frame, size, border_c=border_c))
+    geometry = fit_geometry(im.size, size)
+    overlay = border_overlay(size, border_c) if border_c else None
+    frames = [_fit_frame(frame, geometry, size, overlay) for frame in ImageSequence.Iterator(im)]
     return frames, im.info
 
 
-def average_animation_duration(durations: list[list[int] | int], frames: int) -> list[int]:
-    """Calculates the average duration for each frame of the animation in milliseconds.
+@functools.lru_cache(maxsize=64)
+def border_overlay(size: tuple[int, int], color: str) -> Image.Image:
+    """Renders a transparent overlay with just a border, to be pasted over images.
+
+    Cached, so a border is only ever drawn once per size and color. Do not modify the result.
 
     Args:
-        durations: The durations of the animation in milliseconds, for every animation.
-            Either a list of specific durations or a global one.
-        frames: Maximum number of frames for the animation.
+        size: The size of the overlay.
+        color: The color of the border.
     """
-    for list_d in range(len(durations)):
-        if isinstance(durations[list_d], int):
-            durations[list_d] = [durations[list_d] for _ in range(frames)]
-        elif len(durations[list_d]) < frames:
-            dur_cycle = itertools.cycle(iter(durations[list_d].copy()))
-            for _ in range(frames - len(durations[list_d])):
-                durations[list_d].append(next(dur_cycle))
-    return [sum(packaged_dur) // len(packaged_dur) for packaged_dur in zip(*durations)]
+    overlay = Image.new("RGBA", size, (0, 0, 0, 0))
+    ImageDraw.Draw(overlay).rectangle((0, 0, size[0] - 1, size[1] - 1), outline=color, width=5)
+    return overlay
 
 
 def border(im: Image.Image, color: str):
-    """Adds a border around the image of 1 px width.
+    """Adds a border around the image of 5 px width.
 
     Args:
         im: The image to add the border to
         color: The color of the border to add
     """
-    draw = ImageDraw.Draw(im)
-    draw.rectangle((0, 0, im.width - 1, im.height - 1), outline=color, width=5)
+    overlay = border_overlay(im.size, color)
+    im.paste(overlay, (0, 0), overlay)
 
 
-def magicsave_sync(image: Image.Image | tuple[list[Image.Image], dict],
-              path: pathlib.Path,
-              durs: list[int] | int | None = None) -> None:
-    """Saves the image to the given path with format-specific optimizations.
+class EncodedImage:
+    """An encoded image held in memory.
+
+    Renders are kept as bytes, so they can be handed to `discord.File` without ever touching the disk.
+
+    Attributes:
+        data: The encoded image.
+        filename: The filename the image should be presented under.
+        frames: The amount of frames encoded.
+        estimated_peak_bytes: An estimate of the decoded pixel data held at once while rendering, 0 if not estimated.
+        timings: The seconds spent in each phase of rendering, like "composite" and "encode".
+            Measured wherever the render ran, so they survive being handed back by a render worker.
+    """
+    __slots__ = ("data", "filename", "frames", "estimated_peak_bytes", "timings")
+    data: bytes
+    filename: str
+    frames: int
+    estimated_peak_bytes: int
+    timings: dict[str, float]
+
+    def __init__(self,
+                 data: bytes,
+                 filename: str,
+                 frames: int = 1,
+                 estimated_peak_bytes: int = 0,
+                 timings: dict[str, float] | None = None) -> None:
+        """Initialize the EncodedImage object.
+
+        Args:
+            data: The encoded image.
+            filename: The filename the image should be presented under.
+            frames: The amount of frames encoded.
+            estimated_peak_bytes: An estimate of the decoded pixel data held at once while rendering.
+            timings: The seconds spent in each phase of rendering.
+        """
+        self.data = data
+        self.filename = filename
+        self.frames = frames
+        self.estimated_peak_bytes = estimated_peak_bytes
+        self.timings = timings or {}
+
+    def __len__(self) -> int:
+        """The size of the encoded image in bytes."""
+        return len(self.data)
+
+    def __repr__(self) -> str:
+        return f"<EncodedImage(filename={self.filename!r}, size={len(self.data)})>"
+
+    def fp(self) -> io.BytesIO:
+        """Returns a fresh file-like object over the encoded image."""
+        return io.BytesIO(self.data)
+
+    def open(self) -> Image.Image:
+        """Decodes the encoded image."""
+        return Image.open(self.fp())
+
+
+def encode_sync(image: Image.Image | tuple[list[Image.Image], dict],
+                fmt: str = ".webp",
+                durs: list[int] | int | None = None) -> bytes:
+    """Encodes the image with format-specific optimizations.
 
     Supports PNG, GIF, and both static and animated lossless WebP.
+    WebP output is kept under `MAX_DISCORD_SIZE` by falling back to lossier strategies.
 
     Args:
-        image: The image or animated image tuple to save.
-        path: The path to save the image to. Its extension determines the format.
+        image: The image or animated image tuple to encode.
+        fmt: The file extension of the format to encode to.
         durs: The duration(s) for animation frames in milliseconds.
+
+    Returns:
+        The encoded image.
     """
-    if path.suffix.lower() == ".webp":
+    buffer = io.BytesIO()
+    if isinstance(image, tuple):
+        frames, info = image
+        first, rest = frames[0], frames[1:]
+    else:
+        first, rest, info = image, [], image.info
+    animated = bool(rest) or getattr(first, "n_frames", 1) > 1
+    if fmt.lower() == ".webp":
         strategies = [
             {"lossless": True, "quality": WEBP_COMPRESSION[1]},
             {"lossless": False, "quality": 90},
@@ -136,18 +254,19 @@ def magicsave_sync(image: Image.Image | tuple[list[Image.Image], dict],
             {"lossless": False, "quality": 50},
         ]
 
-        for i, settings in enumerate(strategies):
-            if isinstance(image, tuple):
-                frames, info = image
+        for settings in strategies:
+            buffer.seek(0)
+            buffer.truncate()
+            if animated:
                 background = info.get("background", (0, 0, 0, 0))
                 if not isinstance(background, tuple):
                     background = (0, 0, 0, 0)
                 loop = info.get("loop", 0)
-                frames[0].save(
-                    path,
+                first.save(
+                    buffer,
                     "WEBP",
                     save_all=True,
-                    append_images=frames[1:],
+                    append_images=rest,
                     duration=durs or info.get("duration", 100),
                     loop=loop,
                     background=background,
@@ -156,40 +275,52 @@ def magicsave_sync(image: Image.Image | tuple[list[Image.Image], dict],
                     quality=settings["quality"],
                 )
             else:
-                image.save(
-                    path,
+                first.save(
+                    buffer,
                     "WEBP",
                     lossless=settings["lossless"],
                     method=WEBP_COMPRESSION[0],
                     quality=settings["quality"]
                 )
 
-            if path.stat().st_size < MAX_DISCORD_SIZE:
-                return
+            if buffer.tell() < MAX_DISCORD_SIZE:
+                return buffer.getvalue()
 
         logger.warning("Out of strategies. Discarding any animation and reducing quality to absolute minimum.")
-        if isinstance(image, tuple):
-            image = image[0][0]
-        image.save(
-            path,
+        if animated:
+            first.seek(0)
+        buffer.seek(0)
+        buffer.truncate()
+        first.save(
+            buffer,
             "WEBP",
             lossless=False,
             method=WEBP_COMPRESSION[0],
             quality=25
         )
+        return buffer.getvalue()
+    fmt = Image.registered_extensions()[fmt.lower()]
+    if animated:
+        params = {**info, "loop": 0, "duration": durs or info.get("duration", 100), "optimize": True, "disposal": 2}
+        first.save(buffer, fmt, save_all=True, append_images=rest, **params)
     else:
-        if isinstance(image, tuple):
-            frames, info = image
-            frames[0].save(path,
-                           save_all=True,
-                           append_images=frames[1:],
-                           **info,
-                           loop=0,
-                           duration=durs or info.get("duration", 100),
-                           optimize=True,
-                           disposal=2)
-        else:
-            image.save(path, optimize=True)
+        first.save(buffer, fmt, optimize=True)
+    return buffer.getvalue()
+
+
+def magicsave_sync(image: Image.Image | tuple[list[Image.Image], dict],
+              path: pathlib.Path,
+              durs: list[int] | int | None = None) -> None:
+    """Saves the image to the given path with format-specific optimizations.
+
+    See `encode_sync` for the supported formats.
+
+    Args:
+        image: The image or animated image tuple to save.
+        path: The path to save the image to. Its extension determines the format.
+        durs: The duration(s) for animation frames in milliseconds.
+    """
+    path.write_bytes(encode_sync(image, path.suffix, durs))
 
 
 async def magicsave(image: Image.Image | tuple[list[Image.Image], dict],
@@ -199,48 +330,331 @@ async def magicsave(image: Image.Image | tuple[list[Image.Image], dict],
     await asyncio.to_thread(magicsave_sync, image, path, durs)
 
 
-def save_composite_image_sync(path: pathlib.Path, base_image: Image.Image,
-                         animated_elements: list[tuple[Image.Image, tuple[int, int]]]) -> None:
+def render_sync(image: Image.Image | tuple[list[Image.Image], dict],
+                filename: str,
+                durs: list[int] | int | None = None) -> EncodedImage:
+    """Encodes the image into memory. The extension of the filename determines the format.
+
+    Args:
+        image: The image or animated image tuple to encode.
+        filename: The filename to present the encoded image under.
+        durs: The duration(s) for animation frames in milliseconds.
+    """
+    started = time.perf_counter()
+    data = encode_sync(image, pathlib.PurePath(filename).suffix, durs)
+    return EncodedImage(data, filename, timings={"encode": time.perf_counter() - started})
+
+
+async def render(image: Image.Image | tuple[list[Image.Image], dict],
+                 filename: str,
+                 durs: list[int] | int | None = None) -> EncodedImage:
+    """Wraps render_sync to allow for async operations, in a render worker. Args are the same as render_sync."""
+    started = time.perf_counter()
+    encoded = await workers.POOL.run(render_sync, image, filename, durs)
+    elapsed = time.perf_counter() - started
+    spans.record(encoded.timings, elapsed)
+    metrics.record_render(encoded.timings, elapsed)
+    return encoded
+
+
+class Animation:
+    """Decoded RGBA frames of an animation.
+
+    Identical consecutive frames are merged while decoding, with their durations summed.
+
+    Attributes:
+        frames: The decoded frames.
+        durations: The duration of every frame in milliseconds.
+        info: The info dictionary of the source image.
     """
-    Saves a composite image. If animated elements are present, it creates
-    an optimized animation; otherwise, it saves the static base image.
+    __slots__ = ("frames", "durations", "info", "_starts")
+    frames: list[Image.Image]
+    durations: list[int]
+    info: dict
+
+    def __init__(self, frames: list[Image.Image], durations: list[int], info: dict) -> None:
+        """Initialize the Animation object.
+
+        Args:
+            frames: The decoded RGBA frames.
+            durations: The duration of every frame in milliseconds.
+            info: The info dictionary of the source image.
+        """
+        self.frames = frames
+        self.durations = durations
+        self.info = info
+        self._starts = list(itertools.accumulate(durations, initial=0))[:-1]
+
+    @classmethod
+    def from_image(cls, im: Image.Image) -> "Animation":
+        """Decodes every frame of an image, merging frames that do not change.
+
+        Args:
+            im: The (possibly animated) image to decode.
+        """
+        frames = []
+        durations = []
+        last = None
+        default = im.info.get("duration", 100)
+        for frame in ImageSequence.Iterator(im):
+            duration = frame.info.get("duration", default)
+            # Match browsers, which bump near-zero frame durations up to 100ms.
+            duration = duration if duration > 10 else 100
+            frame = frame.convert("RGBA") if frame.mode != "RGBA" else frame.copy()
+            raw = frame.tobytes()
+            if raw == last:
+                durations[-1] += duration
+                continue
+            frames.append(frame)
+            durations.append(duration)
+            last = raw
+        return cls(frames, durations, dict(im.info))
+
+    @property
+    def duration(self) -> int:
+        """The duration of a single loop of the animation in milliseconds."""
+        return sum(self.durations)
+
+    @property
+    def starts(self) -> list[int]:
+        """The start time of every frame in milliseconds."""
+        return self._starts
+
+    @property
+    def size(self) -> tuple[int, int]:
+        """The size of the animation."""
+        return self.frames[0].size
+
+    @property
+    def nbytes(self) -> int:
+        """The amount of decoded pixel data held by the animation."""
+        return sum(frame.width * frame.height * len(frame.getbands()) for frame in self.frames)
+
+    def index_at(self, timestamp: int) -> int:
+        """Returns the index of the frame displayed at the given time, looping the animation.
+
+        Args:
+            timestamp: The time in milliseconds.
+        """
+        return bisect.bisect_right(self._starts, timestamp % self.duration) - 1
+
+
+def frame_cap(size: tuple[int, int], longest: int) -> int:
+    """The amount of frames a composite of some size is capped at, see `composite_image_sync`.
 
     Args:
-        path: The file path to save the image to.
-        base_image: The static background image, potentially with other
-                    non-animated elements already pasted onto it.
-        animated_elements: A list of tuples, where each tuple contains:
-                           (Image.Image object of the Animation, (x, y location to paste)).
+        size: The size of the composite.
+        longest: The amount of frames of the longest source animation.
     """
-    if not animated_elements:
-        magicsave_sync(base_image, path)
-        return
+    return max(1, min(longest, MAX_FRAMES, FRAME_PIXEL_BUDGET // (size[0] * size[1])))
 
-    # --- Animation Compositing Logic ---
-    max_frames = max(getattr(ani, "n_frames", 1) for ani, _ in animated_elements)
 
-    ani_frame_iterators = [itertools.cycle(ImageSequence.Iterator(ani)) for ani, _ in animated_elements]
+def composite_timeline(animations: list[Animation], max_frames: int = MAX_FRAMES) -> list[tuple[tuple[int, ...], int]]:
+    """Plans the frames of a composite of several animations.
 
-    final_frames = []
-    for _ in range(max_frames):
-        frame = base_image.copy()
+    A new frame is only planned when at least one animation changes frame, so stills and holds cost nothing.
+    Should the plan exceed `max_frames`, the animations are instead sampled at evenly spaced points in time.
 
-        for i, (_, location) in enumerate(animated_elements):
-            ani_frame = next(ani_frame_iterators[i])
-            if ani_frame.mode != "RGBA":
-                ani_frame = ani_frame.convert("RGBA")
-            frame.paste(ani_frame, location, ani_frame)
+    Args:
+        animations: The animations to composite.
+        max_frames: The maximum amount of frames to plan.
 
-        final_frames.append(frame)
+    Returns:
+        A list of (frame index of every animation, duration in milliseconds) tuples.
+    """
+    horizon = max(ani.duration for ani in animations)
+    points = set()
+    for ani in animations:
+        for offset in range(0, horizon, ani.duration):
+            points.update(offset + start for start in ani.starts if offset + start < horizon)
+    points = sorted(points)
+    if len(points) > max_frames:
+        step = horizon / max_frames
+        points = sorted({round(k * step) for k in range(max_frames)})
+    timeline = []
+    for i, point in enumerate(points):
+        state = tuple(ani.index_at(point) for ani in animations)
+        end = points[i + 1] if i + 1 < len(points) else horizon
+        if timeline and timeline[-1][0] == state:
+            timeline[-1] = (state, timeline[-1][1] + end - point)
+            continue
+        timeline.append((state, end - point))
+    return timeline
+
+
+def composite_frames(base_image: Image.Image, elements: list[tuple[Animation, tuple[int, int]]],
+                     timeline: list[tuple[tuple[int, ...], int]]) -> Iterator[Image.Image]:
+    """Composites the frames of an animation, one at a time.
+
+    Frames are rendered onto a single retained canvas, and only the rectangles of elements
+    whose frame changed are repainted. Every frame yielded is a copy of the canvas.
 
-    info = animated_elements[0][0].info
-    durations = [ani.info.get("duration", 50) for ani, _ in animated_elements]
-    info["duration"] = average_animation_duration(durations, max_frames)
+    Args:
+        base_image: The static background image.
+        elements: A list of (Animation, (x, y location to paste)) tuples.
+        timeline: The frame plan, as returned by `composite_timeline`.
+    """
+    canvas = base_image.copy()
+    boxes = [(x, y, x + ani.size[0], y + ani.size[1]) for ani, (x, y) in elements]
+    previous = None
+    for state, _ in timeline:
+        changed = [i for i in range(len(elements)) if previous is None or previous[i] != state[i]]
+        dirty = [boxes[i] for i in changed]
+        for box in dirty:
+            canvas.paste(base_image.crop(box), box[:2])
+        for i, (ani, location) in enumerate(elements):
+            # Overlapping neighbours lose their pixels to the restore above, so they're repainted too.
+            if i in changed or any(_overlaps(boxes[i], box) for box in dirty):
+                ani_frame = ani.frames[state[i]]
+                canvas.paste(ani_frame, location, ani_frame)
+        previous = state
+        yield canvas.copy()
+
+
+def _overlaps(a: tuple[int, int, int, int], b: tuple[int, int, int, int]) -> bool:
+    """Whether two boxes overlap."""
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def composite_image_sync(filename: str, base_image: Image.Image,
+                         animated_elements: list[tuple[Image.Image | Animation, tuple[int, int]]]) -> EncodedImage:
+    """
+    Renders a composite image into memory. If animated elements are present, it creates
+    an optimized animation; otherwise, it encodes the static base image.
 
-    magicsave_sync((final_frames, info), path)
+    Frames where nothing changes are skipped, and the total amount of frames is capped by the longest
+    source animation, `MAX_FRAMES` and `FRAME_PIXEL_BUDGET`. Every frame is held until it's encoded,
+    as the WebP encoder takes them all at once.
+
+    Args:
+        filename: The filename to present the encoded image under. Its extension determines the format.
+        base_image: The static background image, potentially with other
+                    non-animated elements already pasted onto it.
+        animated_elements: A list of tuples, where each tuple contains:
+                           (Image.Image object or decoded Animation, (x, y location to paste)).
+    """
+    if not animated_elements:
+        return render_sync(base_image, filename)
+
+    started = time.perf_counter()
+    elements = [(ani if isinstance(ani, Animation) else Animation.from_image(ani), location)
+                for ani, location in animated_elements]
+    # Never plan more frames than the longest source has, sampling in time instead.
+    longest = max(len(ani.frames) for ani, _ in elements)
+    timeline = composite_timeline([ani for ani, _ in elements], frame_cap(base_image.size, longest))
+    frames = list(composite_frames(base_image, elements, timeline))
+    info = {"duration": [duration for _, duration in timeline], "loop": 0}
+    composite = time.perf_counter() - started
+
+    # The frames, the retained canvas and the decoded source animations.
+    canvas_bytes = base_image.width * base_image.height * 4
+    estimated_peak_bytes = (len(frames) + 1) * canvas_bytes + sum(ani.nbytes for ani, _ in elements)
+    render = render_sync((frames, info), filename)
+    render.frames = len(frames)
+    render.estimated_peak_bytes = estimated_peak_bytes
+    render.timings = {"composite": composite, **render.timings}
+    logger.debug("Composited %s: %i frames (longest source has %i), about %.1f MiB held at peak.", filename,
+                 len(frames), longest, estimated_peak_bytes / 1024 / 1024)
+    return render
+
+
+async def composite_image(filename: str, base_image: Image.Image,
+                          animated_elements: list[tuple[Image.Image | Animation, tuple[int, int]]]) -> EncodedImage:
+    """Wraps composite_image_sync to allow for async operations, in a render worker.
+
+    Args are the same as composite_image_sync.
+    """
+    started = time.perf_counter()
+    render = await workers.POOL.run(composite_image_sync, filename, base_image, animated_elements)
+    elapsed = time.perf_counter() - started
+    spans.record(render.timings, elapsed)
+    metrics.record_render(render.timings, elapsed)
+    return render
+
+
+def save_composite_image_sync(path: pathlib.Path, base_image: Image.Image,
+                         animated_elements: list[tuple[Image.Image, tuple[int, int]]]) -> None:
+    """Saves a composite image to the given path. Args are the same as composite_image_sync."""
+    path.write_bytes(composite_image_sync(path.name, base_image, animated_elements).data)
 
 
 async def save_composite_image(path: pathlib.Path, base_image: Image.Image,
                          animated_elements: list[tuple[Image.Image, tuple[int, int]]]) -> None:
     """Wraps save_composite_image_sync to allow for async operations. Args are the same as save_composite_image_sync."""
     await asyncio.to_thread(save_composite_image_sync, path, base_image, animated_elements)
+
+
+def mosaic_size(sizes: list[tuple[int, int]], columns: int, gap: int = 64) -> tuple[int, int]:
+    """The size of a mosaic of tiles, see `mosaic`.
+
+    Args:
+        sizes: The sizes of the tiles.
+        columns: The amount of columns in the grid.
+        gap: The gap between the cells in pixels.
+    """
+    cell_w = max(width for width, _ in sizes)
+    cell_h = max(height for _, height in sizes)
+    rows = (len(sizes) + columns - 1) // columns
+    columns = min(columns, len(sizes))
+    return columns * cell_w + (columns - 1) * gap, rows * cell_h + (rows - 1) * gap
+
+
+def mosaic(
+    tiles: list[tuple[Image.Image, list[tuple[Image.Image | Animation, tuple[int, int]]]]],
+    columns: int,
+    gap: int = 64,
+) -> tuple[Image.Image, list[tuple[Image.Image | Animation, tuple[int, int]]]]:
+    """Lays out several (possibly animated) images in a grid.
+
+    Every cell is as big as the biggest tile, with the tiles centered horizontally in their cell.
+
+    Args:
+        tiles: A list of (static image, animated elements) tuples, as taken by `composite_image_sync`.
+        columns: The amount of columns in the grid.
+        gap: The gap between the cells in pixels.
+
+    Returns:
+        The static mosaic and the animated elements, moved to their place in the mosaic.
+    """
+    cell_w = max(tile.width for tile, _ in tiles)
+    cell_h = max(tile.height for tile, _ in tiles)
+    base_image = Image.new("RGBA", mosaic_size([tile.size for tile, _ in tiles], columns, gap), (0, 0, 0, 0))
+    animation = []
+    for i, (tile, elements) in enumerate(tiles):
+        row, col = divmod(i, columns)
+        x = col * (cell_w + gap) + (cell_w - tile.width) // 2
+        y = row * (cell_h + gap)
+        base_image.paste(tile, (x, y), tile)
+        animation.extend((ani, (x + ex, y + ey)) for ani, (ex, ey) in elements)
+    return base_image, animation
+
+
+def _archive_done(task: asyncio.Task) -> None:
+    """Drops the finished archive task and reports any failure."""
+    _ARCHIVE_TASKS.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Failed to archive render.", exc_info=task.exception())
+
+
+def archive(image: EncodedImage, path: pathlib.Path) -> asyncio.Task:
+    """Persists an encoded image to disk in the background.
+
+    The write happens in a worker thread and is not awaited, so delivery never waits on the disk.
+
+    Args:
+        image: The encoded image to persist.
+        path: The path to write the image to.
+
+    Returns:
+        The background task performing the write.
+    """
+
+    def _write():
+        """Does the actual blocking write."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(image.data)
+
+    task = asyncio.create_task(asyncio.to_thread(_write))
+    _ARCHIVE_TASKS.add(task)
+    task.add_done_callback(_archive_done)
+    return task
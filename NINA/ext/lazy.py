@@ -0,0 +1,77 @@
+"""Lazily imported modules.
+
+The engine only needs discord.py, Pillow and friends to render and deliver, not to load or run a simulation.
+Modules imported through here are only executed on first attribute access, so tools that never render
+never pay for, or even need, them. Modules that aren't installed import as placeholders raising on use.
+
+Lazy modules are executed by whichever thread touches them first. The bot preloads them at startup,
+before renders start running in threads.
+
+Typical usage example:
+    ```py
+    from NINA.ext import lazy
+    Image = lazy.load("PIL.Image")
+    ...
+    lazy.preload()
+    ```
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2023-present Tech. TTGames
+
+import importlib.util
+import sys
+import types
+
+_LOADED: dict[str, types.ModuleType] = {}
+"""The modules handed out lazily, by name."""
+
+
+class MissingModule(types.ModuleType):
+    """Stands in for a module that isn't installed, raising as soon as it's used."""
+
+    def __getattr__(self, attr: str):
+        raise ModuleNotFoundError(f"No module named '{self.__name__}', it's needed to use '{attr}'.",
+                                  name=self.__name__)
+
+
+def load(name: str) -> types.ModuleType:
+    """Import a module, deferring its execution until an attribute is accessed.
+
+    Args:
+        name: The absolute name of the module.
+
+    Returns:
+        The module. If it's already imported, the module itself. If it isn't installed, a `MissingModule`.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    try:
+        spec = importlib.util.find_spec(name)
+    except ModuleNotFoundError:
+        # A parent package is missing.
+        spec = None
+    if spec is None:
+        return MissingModule(name)
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    _LOADED[name] = module
+    return module
+
+
+def preload() -> list[str]:
+    """Execute every lazy module handed out so far.
+
+    Returns:
+        The names of the modules executed.
+
+    Raises:
+        ModuleNotFoundError: A module needed by one of them isn't installed.
+    """
+    names = sorted(_LOADED)
+    for name in names:
+        # Any attribute access executes the module.
+        getattr(_LOADED.pop(name), "__doc__")
+    return names
@@ -0,0 +1,110 @@
+"""Queued logging and structured simulation records.
+
+Log handlers writing to files block whoever logs for as long as the disk takes, and simulations log a lot.
+Loggers hand their records to a queue instead, and a listener thread formats and writes them.
+Simulation events are logged as compact structured records, snapshotted when logged
+and only serialized by the listener thread, if the level they're logged at is enabled at all.
+
+Typical usage example:
+    ```py
+    from NINA.ext import logs
+    handler = logs.start(file_handler)
+    logging.getLogger("NINA").addHandler(handler)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(logs.Record("pick", tribute=tribute.name, pool=len(pool)))
+    logs.stop()
+    ```
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2023-present Tech. TTGames
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+from typing import Any
+
+_FORMATTER = logging.Formatter()
+"""Formats the tracebacks of records before they're queued."""
+_LISTENER: logging.handlers.QueueListener | None = None
+"""The running listener, if any."""
+
+
+class Record:
+    """A structured log message, serialized as its kind followed by its fields as compact JSON.
+
+    The fields are serialized in the listener thread, so they must not change after logging.
+    Use strings, numbers and tuples of them.
+
+    Attributes:
+        kind: What the record is about, like "event" or "pick".
+        fields: The data of the record.
+    """
+    __slots__ = ("kind", "fields")
+    kind: str
+    fields: dict[str, Any]
+
+    def __init__(self, kind: str, **fields: Any) -> None:
+        """Initialize the Record object.
+
+        Args:
+            kind: What the record is about.
+            **fields: The data of the record.
+        """
+        self.kind = kind
+        self.fields = fields
+
+    def __repr__(self) -> str:
+        return f"<Record(kind={self.kind}, fields={len(self.fields)})>"
+
+    def __str__(self) -> str:
+        return f"{self.kind} {json.dumps(self.fields, ensure_ascii=False, separators=(',', ':'))}"
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """Queues records without formatting them, leaving that to the handlers of the listener.
+
+    Plain messages are still merged with their arguments, which may change after logging. Records aren't.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        if not isinstance(record.msg, Record):
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            # Tracebacks hold on to every frame they pass through, formatting them lets go of those.
+            record.exc_text = _FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def start(*handlers: logging.Handler) -> QueueHandler:
+    """Start a listener thread passing queued records to handlers.
+
+    Stops the listener started before, if any. The listener is also stopped at exit, so no records are lost.
+
+    Args:
+        *handlers: The handlers doing the actual work. Their levels are respected.
+
+    Returns:
+        The handler to add to loggers, queueing their records.
+    """
+    global _LISTENER
+    stop()
+    records = queue.SimpleQueue()
+    _LISTENER = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    _LISTENER.start()
+    atexit.register(stop)
+    return QueueHandler(records)
+
+
+def stop() -> None:
+    """Stop the listener thread, once it handled every record queued so far."""
+    global _LISTENER
+    listener, _LISTENER = _LISTENER, None
+    if listener is not None:
+        listener.stop()
@@ -0,0 +1,306 @@
+"""Metrics of the bot and the engine, served locally in the Prometheus text format.
+
+The bot runs unattended, and its log only tells so much. Durations are collected into histograms
+as commands, cycles and renders complete, cheap enough to always be on. The counters the caches,
+queues and pools already keep are read as they are whenever the metrics are scraped.
+The server is optional, and only listens locally by default. Anything scraping Prometheus metrics can read it,
+as can `curl http://127.0.0.1:9090/metrics`.
+
+Interactions are acknowledged through discord.py, which doesn't tell when. Its HTTP requests can be traced though,
+and the acknowledgement is the callback request of the interaction.
+
+Typical usage example:
+    ```py
+    from NINA.ext import metrics
+    metrics.CYCLES.observe(time.perf_counter() - started, "true")
+    server = metrics.MetricsServer("127.0.0.1", 9090, {"workers": workers.POOL.stats})
+    await server.start()
+    await server.stop()
+    ```
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2023-present Tech. TTGames
+
+import asyncio
+import bisect
+import logging
+import re
+import time
+from typing import Any, Callable, Mapping
+
+from NINA.ext import lazy
+
+# Only needed to serve the metrics, collecting them doesn't.
+aiohttp = lazy.load("aiohttp")
+
+logger = logging.getLogger("NINA.metrics")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+"""The content type of the Prometheus text format."""
+LAG_INTERVAL = 0.5
+"""The seconds between measurements of the event loop lag."""
+INTERACTION_TTL = 15 * 60
+"""The seconds an interaction can be responded to. Commands still running after that aren't tracked anymore."""
+_CALLBACK = re.compile(r"/interactions/(\d+)/[^/]+/callback$")
+"""The path of the request acknowledging an interaction."""
+
+Source = Callable[[], Mapping[str, int | float | bool]]
+"""A function returning the current counters of a component."""
+
+
+class Histogram:
+    """Durations counted into buckets, per combination of label values.
+
+    Attributes:
+        name: The name of the metric.
+        doc: What the metric measures.
+        labels: The names of the labels.
+        buckets: The upper bounds of the buckets, in seconds, ascending.
+    """
+    name: str
+    doc: str
+    labels: tuple[str, ...]
+    buckets: tuple[float, ...]
+
+    def __init__(self, name: str, doc: str, labels: tuple[str, ...], buckets: tuple[float, ...]) -> None:
+        """Initialize the Histogram object.
+
+        Args:
+            name: The name of the metric.
+            doc: What the metric measures.
+            labels: The names of the labels.
+            buckets: The upper bounds of the buckets, in seconds, ascending.
+        """
+        self.name = name
+        self.doc = doc
+        self.labels = labels
+        self.buckets = buckets
+        self._series: dict[tuple[str, ...], list[Any]] = {}
+
+    def __repr__(self) -> str:
+        return f"<Histogram(name={self.name}, series={len(self._series)})>"
+
+    def observe(self, seconds: float, *values: str) -> None:
+        """Count a duration.
+
+        Args:
+            seconds: The duration.
+            *values: The values of the labels, in order.
+        """
+        series = self._series.get(values)
+        if series is None:
+            # Per bucket counts, then the sum and count of all durations.
+            series = self._series[values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, seconds)] += 1
+        series[1] += seconds
+        series[2] += 1
+
+    def lines(self) -> list[str]:
+        """The histogram in the Prometheus text format."""
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        bounds = [*(f"{bucket:g}" for bucket in self.buckets), "+Inf"]
+        for values, (counts, total, count) in sorted(self._series.items()):
+            labels = [f'{name}="{_escape(value)}"' for name, value in zip(self.labels, values)]
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                bucket = ",".join([*labels, f'le="{bound}"'])
+                lines.append(f"{self.name}_bucket{{{bucket}}} {cumulative}")
+            suffix = f"{{{','.join(labels)}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return lines
+
+
+class _Pending:
+    """A command still running."""
+    __slots__ = ("command", "started", "acknowledged")
+
+    def __init__(self, command: str) -> None:
+        self.command = command
+        self.started = time.perf_counter()
+        self.acknowledged = False
+
+
+COMMANDS = Histogram("nina_command_seconds", "Seconds from receiving a command to completing it.",
+                     ("command", "outcome"), (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300))
+"""The latencies of commands, by whether they completed or failed."""
+ACKS = Histogram("nina_ack_seconds", "Seconds from receiving a command to its acknowledgement.", ("command",),
+                 (0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5))
+"""The acknowledgement times of commands. Discord gives up on them after 3 seconds."""
+CYCLES = Histogram("nina_cycle_seconds", "Seconds computing a cycle, delivery included.", ("rendered",),
+                   (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 120, 300))
+"""The durations of cycles, by whether they were rendered and delivered."""
+RENDERS = Histogram("nina_render_seconds", "Seconds spent on a render, by phase.", ("phase",),
+                    (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+"""The durations of renders, in total and by the phases measured by the workers."""
+LOOP_LAG = Histogram("nina_loop_lag_seconds", "Seconds the event loop was late to wake up.", (),
+                     (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5))
+"""The event loop lag, measured while the server runs."""
+HISTOGRAMS = (COMMANDS, ACKS, CYCLES, RENDERS, LOOP_LAG)
+"""Every histogram served."""
+_PENDING: dict[int, _Pending] = {}
+"""The commands still running, by the ID of their interaction."""
+
+
+def _escape(value: str) -> str:
+    """Escape a label value."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def started(interaction_id: int, command: str) -> None:
+    """Start timing a command.
+
+    Args:
+        interaction_id: The ID of the interaction invoking it.
+        command: The qualified name of the command.
+    """
+    now = time.perf_counter()
+    for stale in [key for key, pending in _PENDING.items() if now - pending.started > INTERACTION_TTL]:
+        del _PENDING[stale]
+    _PENDING[interaction_id] = _Pending(command)
+
+
+def acknowledged(interaction_id: int) -> None:
+    """Count the acknowledgement time of a command, the first time it's acknowledged.
+
+    Args:
+        interaction_id: The ID of the interaction invoking it.
+    """
+    pending = _PENDING.get(interaction_id)
+    if pending is not None and not pending.acknowledged:
+        pending.acknowledged = True
+        ACKS.observe(time.perf_counter() - pending.started, pending.command)
+
+
+def completed(interaction_id: int, outcome: str) -> None:
+    """Count the latency of a command and stop timing it.
+
+    Args:
+        interaction_id: The ID of the interaction invoking it.
+        outcome: How the command completed, "ok" or "error".
+    """
+    pending = _PENDING.pop(interaction_id, None)
+    if pending is not None:
+        COMMANDS.observe(time.perf_counter() - pending.started, pending.command, outcome)
+
+
+def record_render(timings: dict[str, float], elapsed: float) -> None:
+    """Count the duration of a render, and of the phases its worker measured.
+
+    Args:
+        timings: The seconds the worker spent in each phase.
+        elapsed: The seconds waited for the worker, in total.
+    """
+    RENDERS.observe(elapsed, "total")
+    for phase, seconds in timings.items():
+        RENDERS.observe(seconds, phase)
+
+
+def trace_config() -> "aiohttp.TraceConfig":
+    """A trace of HTTP requests, counting the acknowledgement times of the interactions they respond to."""
+
+    async def _on_request_end(_session, _context, params) -> None:
+        match = _CALLBACK.search(params.url.path)
+        if match is not None:
+            acknowledged(int(match.group(1)))
+
+    trace = aiohttp.TraceConfig()
+    trace.on_request_end.append(_on_request_end)
+    return trace
+
+
+def exposition(sources: Mapping[str, Source]) -> str:
+    """Every metric in the Prometheus text format.
+
+    Args:
+        sources: Functions returning the current counters of a component, by the name of the component.
+            They're served as gauges named after the component and counter.
+    """
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.lines())
+    for source, stats in sources.items():
+        for key, value in stats().items():
+            name = f"nina_{source}_{key}"
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {float(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Serves the metrics over HTTP at /metrics, and measures the event loop lag while running.
+
+    Attributes:
+        host: The address to listen on.
+        port: The port to listen on. 0 picks a free one, see `address` once started.
+        sources: The counters of components served, see `exposition`.
+    """
+    host: str
+    port: int
+    sources: Mapping[str, Source]
+
+    def __init__(self, host: str, port: int, sources: Mapping[str, Source]) -> None:
+        """Initialize the MetricsServer object.
+
+        Args:
+            host: The address to listen on.
+            port: The port to listen on.
+            sources: The counters of components served.
+        """
+        self.host = host
+        self.port = port
+        self.sources = sources
+        self._runner: "aiohttp.web.AppRunner | None" = None
+        self._watcher: asyncio.Task | None = None
+
+    def __repr__(self) -> str:
+        return f"<MetricsServer(host={self.host}, port={self.port}, running={self._runner is not None})>"
+
+    @property
+    def address(self) -> tuple[str, int] | None:
+        """The address the server listens on, if it's running."""
+        if self._runner is None or not self._runner.addresses:
+            return None
+        return self._runner.addresses[0][:2]
+
+    async def start(self) -> None:
+        """Start serving, and measuring the event loop lag."""
+        # Importing the submodule imports aiohttp too, which the engine shouldn't pay for.
+        # pylint: disable=import-outside-toplevel
+        from aiohttp import web
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, self.host, self.port).start()
+        except OSError:
+            await runner.cleanup()
+            raise
+        self._runner = runner
+        self._watcher = asyncio.create_task(self._watch())
+        logger.info("Serving metrics at http://%s:%s/metrics.", *self.address)
+
+    async def stop(self) -> None:
+        """Stop serving."""
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, _request: "aiohttp.web.Request") -> "aiohttp.web.Response":
+        """Serve the metrics."""
+        body = exposition(self.sources).encode("utf-8")
+        return aiohttp.web.Response(body=body, headers={"Content-Type": CONTENT_TYPE})
+
+    async def _watch(self) -> None:
+        """Measure how late the event loop wakes up from sleeping, for as long as the server runs."""
+        loop = asyncio.get_running_loop()
+        while True:
+            asleep = loop.time()
+            await asyncio.sleep(LAG_INTERVAL)
+            LOOP_LAG.observe(max(0.0, loop.time() - asleep - LAG_INTERVAL))
@@ -0,0 +1,205 @@
+"""An index of tribute names, for autocompletion and lookups.
+
+Scanning the whole cast on every keystroke adds up with big casts and many users typing at once.
+The index is built once per simulation instead. Names and nicknames are folded, then indexed in a prefix trie,
+by every word, and in an n-gram index for matches in the middle of a word. Exact names and nicknames
+are kept in dictionaries, to turn a chosen name back into its tribute.
+Results are ranked, best match first, and cached per query.
+
+Typical usage example:
+    ```py
+    from NINA.ext import names
+    index = names.NameIndex(sim.cast)
+    tributes = index.search("ali", limit=25)
+    tribute = index.lookup("Alice")
+    ```
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2023-present Tech. TTGames
+
+import collections
+import enum
+import heapq
+from typing import Any, Iterable
+import unicodedata
+
+NGRAM = 3
+"""The maximum length of the n-grams indexed for substring matches. Shorter queries are looked up directly."""
+CACHE_SIZE = 1024
+"""The amount of queries whose results are cached."""
+
+
+class Match(enum.IntEnum):
+    """How well a name matches a query. Lower values rank first."""
+    NAME = 0
+    """The query is the name."""
+    NICKNAME = 1
+    """The query is the nickname."""
+    NAME_PREFIX = 2
+    """The name starts with the query."""
+    NICKNAME_PREFIX = 3
+    """The nickname starts with the query."""
+    WORD_PREFIX = 4
+    """A later word of the name or nickname starts with the query."""
+    SUBSTRING = 5
+    """The query is somewhere in the name or nickname."""
+
+
+def fold(text: str) -> str:
+    """Normalize text for matching, ignoring case and compatibility forms.
+
+    Args:
+        text: The text to normalize.
+    """
+    return unicodedata.normalize("NFKC", text).casefold().strip()
+
+
+class _TrieNode:
+    """A node of the prefix trie, holding the entries of every key passing through it."""
+    __slots__ = ("children", "entries")
+
+    def __init__(self) -> None:
+        self.children: dict[str, "_TrieNode"] = {}
+        self.entries: set[int] = set()
+
+
+class NameIndex:
+    """A ranked, cached index of the names and nicknames of a cast.
+
+    The index doesn't follow later changes to the names. Build a new one instead.
+
+    Attributes:
+        hits: The amount of searches served from the cache.
+        misses: The amount of searches computed.
+    """
+    hits: int
+    misses: int
+
+    def __init__(self, entries: Iterable[Any]) -> None:
+        """Build the NameIndex object.
+
+        Args:
+            entries: The entries to index, usually tributes. They need a `name` and a `nickname` attribute.
+        """
+        self._entries = list(entries)
+        self._names = [fold(entry.name) for entry in self._entries]
+        self._nicknames = [fold(entry.nickname or "") for entry in self._entries]
+        self._words: list[list[str]] = []
+        self._exact: dict[str, int] = {}
+        self._exact_nicknames: dict[str, list[int]] = collections.defaultdict(list)
+        self._trie = _TrieNode()
+        self._ngrams: dict[str, set[int]] = collections.defaultdict(set)
+        self._cache: collections.OrderedDict[str, tuple[int, list[int]]] = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        for i, (name, nickname) in enumerate(zip(self._names, self._nicknames)):
+            # The first of several tributes with the same name wins, like a scan of the cast would.
+            self._exact.setdefault(name, i)
+            if nickname:
+                self._exact_nicknames[nickname].append(i)
+            words = []
+            for key in {name, nickname} - {""}:
+                for word_start in self._word_starts(key):
+                    words.append(key[word_start:])
+                    self._insert(key[word_start:], i)
+                for size in range(1, NGRAM + 1):
+                    for start in range(len(key) - size + 1):
+                        self._ngrams[key[start:start + size]].add(i)
+            self._words.append(words)
+
+    def __len__(self) -> int:
+        """The amount of indexed entries."""
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        return f"<NameIndex(entries={len(self._entries)}, cached={len(self._cache)})>"
+
+    @staticmethod
+    def _word_starts(key: str) -> list[int]:
+        """The offsets of the words of a folded key."""
+        return [i for i, char in enumerate(key) if not char.isspace() and (i == 0 or key[i - 1].isspace())]
+
+    def _insert(self, key: str, entry: int) -> None:
+        """Add an entry under every prefix of a key."""
+        node = self._trie
+        for char in key:
+            node = node.children.setdefault(char, _TrieNode())
+            node.entries.add(entry)
+
+    def _prefixed(self, query: str) -> set[int]:
+        """The entries with a word starting with the folded query."""
+        node = self._trie
+        for char in query:
+            node = node.children.get(char)
+            if node is None:
+                return set()
+        return node.entries
+
+    def _containing(self, query: str) -> set[int]:
+        """The entries whose name or nickname contains the folded query."""
+        if len(query) <= NGRAM:
+            return self._ngrams.get(query, set())
+        postings = sorted((self._ngrams.get(query[i:i + NGRAM], set()) for i in range(len(query) - NGRAM + 1)),
+                          key=len)
+        # The n-grams may be spread over the name and the nickname, or out of order, so verify.
+        return {i for i in set.intersection(*postings) if query in self._names[i] or query in self._nicknames[i]}
+
+    def _rank(self, entry: int, query: str) -> tuple:
+        """The sort key of an entry matching the folded query."""
+        name, nickname = self._names[entry], self._nicknames[entry]
+        if name == query:
+            match = Match.NAME
+        elif nickname == query:
+            match = Match.NICKNAME
+        elif name.startswith(query):
+            match = Match.NAME_PREFIX
+        elif nickname and nickname.startswith(query):
+            match = Match.NICKNAME_PREFIX
+        elif any(word.startswith(query) for word in self._words[entry]):
+            match = Match.WORD_PREFIX
+        else:
+            match = Match.SUBSTRING
+        position = name.find(query)
+        return match, position if position >= 0 else len(name), len(name), name, entry
+
+    def search(self, query: str, limit: int = 25) -> list[Any]:
+        """Find the entries matching a query, best match first.
+
+        Args:
+            query: What was typed so far. Empty matches every entry, in cast order.
+            limit: The maximum amount of entries to return.
+        """
+        query = fold(query)
+        cached = self._cache.get(query)
+        if cached is not None and cached[0] >= limit:
+            self.hits += 1
+            self._cache.move_to_end(query)
+            ranked = cached[1]
+        else:
+            self.misses += 1
+            if not query:
+                ranked = list(range(min(limit, len(self._entries))))
+            else:
+                matches = self._prefixed(query) | self._containing(query)
+                # Only the best few are ever shown, so they're picked without sorting every match.
+                ranked = heapq.nsmallest(limit, matches, key=lambda entry: self._rank(entry, query))
+            self._cache[query] = (limit, ranked)
+            self._cache.move_to_end(query)
+            if len(self._cache) > CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return [self._entries[i] for i in ranked[:limit]]
+
+    def lookup(self, name: str) -> Any | None:
+        """The entry with a name, or else the only entry with that nickname.
+
+        Args:
+            name: The name or nickname to look up.
+        """
+        key = fold(name)
+        if key in self._exact:
+            return self._entries[self._exact[key]]
+        nicknamed = self._exact_nicknames.get(key, [])
+        if len(nicknamed) == 1:
+            return self._entries[nicknamed[0]]
+        return None
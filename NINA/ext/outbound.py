@@ -0,0 +1,310 @@
+"""A shared scheduler for outbound Discord messages.
+
+Everything the bot sends to a channel competes for the same rate limits.
+Rather than every command pacing itself, sends are queued per channel and delivered by priority,
+so live events go out before progress chatter. Each channel is paced by its own token bucket,
+which slows down whenever Discord makes us wait. Pending sends can be coalesced, so only the latest
+of several progress updates is actually sent.
+
+discord.py already waits out Discord's rate limits internally, and doesn't expose their headers.
+The buckets learn from what it does surface instead: `discord.RateLimited` errors and sends that stalled.
+
+Typical usage example:
+    ```py
+    from NINA.ext import outbound
+    await outbound.followup(interaction, outbound.Priority.LIVE, embed=embed, file=file)
+    outbound.submit(interaction, outbound.Priority.PROGRESS, lambda: message.edit(embed=embed), coalesce="progress")
+    print(outbound.SCHEDULER.stats())
+    ```
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2023-present Tech. TTGames
+
+import asyncio
+import enum
+import heapq
+import itertools
+import logging
+import time
+from typing import Any, Awaitable, Callable, Hashable
+
+import discord
+
+from NINA.ext import http
+from NINA.ext import spans
+
+logger = logging.getLogger("NINA.outbound")
+
+RATE = 2.5
+"""The amount of sends per second a channel is allowed at most."""
+BURST = 5
+"""The amount of sends a channel is allowed in a burst."""
+STALLED_SEND = 5
+"""The amount of seconds after which a send is assumed to have waited out a rate limit."""
+
+Send = Callable[[], Awaitable[Any]]
+"""A send to schedule. Called once, when it's its turn."""
+
+
+class Priority(enum.IntEnum):
+    """The priorities of outbound messages. Lower values are sent first."""
+    LIVE = 0
+    """Live simulation output, like events."""
+    RESULT = 1
+    """Results and replies, like the end of a cycle or a command completing."""
+    STATUS = 2
+    """On demand status pages."""
+    PROGRESS = 3
+    """Progress chatter, usually coalesced."""
+
+
+class _Entry:
+    """A queued send."""
+    __slots__ = ("priority", "seq", "send", "future", "queued", "coalesce")
+
+    def __init__(self, priority: Priority, seq: int, send: Send, coalesce: Hashable | None) -> None:
+        self.priority = priority
+        self.seq = seq
+        self.send = send
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.queued = time.monotonic()
+        self.coalesce = coalesce
+
+    def __lt__(self, other: "_Entry") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class ChannelQueue:
+    """The priority queue of sends to a single channel, delivered by a worker task while it's not empty.
+
+    Attributes:
+        bucket: The token bucket pacing the sends.
+        sent: The amount of sends delivered.
+        failed: The amount of sends that raised.
+        coalesced: The amount of sends replaced by a later one before being delivered.
+        rate_limited: The amount of times Discord made us wait.
+        waited: The total amount of seconds sends spent queued.
+        max_wait: The longest amount of seconds a send spent queued.
+    """
+    bucket: http.TokenBucket
+    sent: int
+    failed: int
+    coalesced: int
+    rate_limited: int
+    waited: float
+    max_wait: float
+
+    def __init__(self, rate: float, burst: float) -> None:
+        """Initialize the ChannelQueue object.
+
+        Args:
+            rate: The amount of sends per second allowed at most.
+            burst: The amount of sends allowed in a burst.
+        """
+        self.bucket = http.TokenBucket(rate, burst)
+        self._heap: list[_Entry] = []
+        self._pending: dict[Hashable, _Entry] = {}
+        self._seq = itertools.count()
+        self._worker: asyncio.Task | None = None
+        self.sent = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.waited = 0.0
+        self.max_wait = 0.0
+
+    def __len__(self) -> int:
+        """The amount of queued sends."""
+        return len(self._heap)
+
+    def stats(self) -> dict[str, int | float]:
+        """Returns the current queue metrics."""
+        return {
+            "depth": len(self._heap),
+            "sent": self.sent,
+            "failed": self.failed,
+            "coalesced": self.coalesced,
+            "rate_limited": self.rate_limited,
+            "rate": self.bucket.rate,
+            "avg_wait": self.waited / self.sent if self.sent else 0.0,
+            "max_wait": self.max_wait,
+        }
+
+    def submit(self, send: Send, priority: Priority, coalesce: Hashable | None = None) -> asyncio.Future:
+        """Queue a send.
+
+        Args:
+            send: The send to queue.
+            priority: The priority of the send.
+            coalesce: If a send with the same key is still queued, it's replaced, and resolves along with this one.
+
+        Returns:
+            A future resolving to the result of the send.
+        """
+        previous = self._pending.get(coalesce) if coalesce is not None else None
+        if previous is not None:
+            # Keep the place in line of the original, but send the latest content.
+            previous.send = send
+            previous.priority = min(previous.priority, priority)
+            heapq.heapify(self._heap)
+            self.coalesced += 1
+            return previous.future
+        entry = _Entry(priority, next(self._seq), send, coalesce)
+        heapq.heappush(self._heap, entry)
+        if coalesce is not None:
+            self._pending[coalesce] = entry
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        return entry.future
+
+    async def _run(self) -> None:
+        """Deliver the queued sends until the queue is empty."""
+        while self._heap:
+            await self.bucket.acquire()
+            if not self._heap:
+                break
+            entry = heapq.heappop(self._heap)
+            if entry.coalesce is not None:
+                del self._pending[entry.coalesce]
+            wait = time.monotonic() - entry.queued
+            self.waited += wait
+            self.max_wait = max(self.max_wait, wait)
+            started = time.monotonic()
+            # pylint: disable=broad-except
+            try:
+                result = await entry.send()
+            except discord.RateLimited as err:
+                self._slow_down(err.retry_after)
+                self._fail(entry, err)
+            except discord.HTTPException as err:
+                if err.status == 429:
+                    self._slow_down(1)
+                self._fail(entry, err)
+            except Exception as err:
+                self._fail(entry, err)
+            else:
+                self.sent += 1
+                if time.monotonic() - started > STALLED_SEND:
+                    # discord.py most likely waited out a rate limit for us.
+                    self._slow_down(0)
+                else:
+                    self.bucket.recover()
+                if not entry.future.done():
+                    entry.future.set_result(result)
+
+    def _slow_down(self, pause: float) -> None:
+        """Back off after being rate limited."""
+        self.rate_limited += 1
+        self.bucket.slow_down()
+        self.bucket.pause(pause)
+        logger.warning("Rate limited, slowing down to %.2f sends per second.", self.bucket.rate)
+
+    def _fail(self, entry: _Entry, err: Exception) -> None:
+        """Fail a send."""
+        self.failed += 1
+        if not entry.future.done():
+            entry.future.set_exception(err)
+
+
+class OutboundScheduler:
+    """The per channel queues of outbound messages.
+
+    Attributes:
+        rate: The amount of sends per second each channel is allowed at most.
+        burst: The amount of sends each channel is allowed in a burst.
+    """
+    rate: float
+    burst: float
+
+    def __init__(self, rate: float = RATE, burst: float = BURST) -> None:
+        """Initialize the OutboundScheduler object.
+
+        Args:
+            rate: The amount of sends per second each channel is allowed at most.
+            burst: The amount of sends each channel is allowed in a burst.
+        """
+        self.rate = rate
+        self.burst = burst
+        self._queues: dict[Hashable, ChannelQueue] = {}
+
+    def queue(self, destination: Hashable) -> ChannelQueue:
+        """The queue of a destination, created on first use."""
+        if destination not in self._queues:
+            self._queues[destination] = ChannelQueue(self.rate, self.burst)
+        return self._queues[destination]
+
+    def submit(self,
+               destination: Hashable,
+               send: Send,
+               priority: Priority = Priority.RESULT,
+               coalesce: Hashable | None = None) -> asyncio.Future:
+        """Queue a send without waiting for it. See `ChannelQueue.submit`."""
+        return self.queue(destination).submit(send, priority, coalesce)
+
+    async def send(self,
+                   destination: Hashable,
+                   send: Send,
+                   priority: Priority = Priority.RESULT,
+                   coalesce: Hashable | None = None) -> Any:
+        """Queue a send and wait for it to be delivered. See `ChannelQueue.submit`.
+
+        Returns:
+            The result of the send.
+        """
+        return await self.submit(destination, send, priority, coalesce)
+
+    def stats(self) -> dict[Hashable, dict[str, int | float]]:
+        """Returns the metrics of every queue."""
+        return {destination: queue.stats() for destination, queue in self._queues.items()}
+
+    def totals(self) -> dict[str, int | float]:
+        """Returns the metrics of all queues together."""
+        queues = list(self._queues.values())
+        return {
+            "depth": sum(len(queue) for queue in queues),
+            "sent": sum(queue.sent for queue in queues),
+            "failed": sum(queue.failed for queue in queues),
+            "coalesced": sum(queue.coalesced for queue in queues),
+            "rate_limited": sum(queue.rate_limited for queue in queues),
+            "max_wait": max((queue.max_wait for queue in queues), default=0.0),
+        }
+
+
+SCHEDULER = OutboundScheduler()
+"""The scheduler shared by all cogs."""
+
+
+def destination(interaction: discord.Interaction) -> Hashable:
+    """The queue an interaction sends to. Interactions in the same channel share one."""
+    return interaction.channel_id or interaction.id
+
+
+def submit(interaction: discord.Interaction,
+           priority: Priority,
+           send: Send,
+           coalesce: Hashable | None = None) -> asyncio.Future:
+    """Queue a send to the channel of an interaction on SCHEDULER, without waiting for it.
+
+    Args:
+        interaction: The interaction whose channel is sent to.
+        priority: The priority of the send.
+        send: The send to queue.
+        coalesce: The key to coalesce queued sends with.
+    """
+    return SCHEDULER.submit(destination(interaction), send, priority, coalesce)
+
+
+async def followup(interaction: discord.Interaction, priority: Priority = Priority.RESULT, **kwargs) -> Any:
+    """Send a followup message to an interaction through SCHEDULER.
+
+    Args:
+        interaction: The interaction to follow up on.
+        priority: The priority of the message.
+        **kwargs: The arguments of `discord.Webhook.send`.
+
+    Returns:
+        The sent message, if `wait` was passed.
+    """
+    with spans.span("send"):
+        return await submit(interaction, priority, lambda: interaction.followup.send(**kwargs))
@@ -0,0 +1,239 @@
+"""Concurrency-controlled prefetching of tribute images.
+
+Fetching a whole cast at once would fire a request per image at the same few hosts, and get rate limited.
+The prefetcher queues the requests per host instead, and never requests the same link twice, even while in flight.
+Links already in the image store are revalidated with conditional requests once their validators grow old.
+Downloads are streamed to the disk in chunks, so big animations are never held in memory whole,
+and anything too big or not an image is refused before it's decoded.
+
+Typical usage example:
+    ```py
+    from NINA.ext import prefetch
+    prefetcher = prefetch.Prefetcher(session, image_store, per_host=4)
+    paths = await asyncio.gather(*[prefetcher.fetch(url, normalize) for url in urls])
+    print(prefetcher.progress())
+    ```
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2023-present Tech. TTGames
+
+import asyncio
+import logging
+import pathlib
+import time
+from typing import BinaryIO, Callable
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from NINA.ext import lazy
+from NINA.ext import store
+
+Image = lazy.load("PIL.Image")
+
+logger = logging.getLogger("NINA.prefetch")
+
+PER_HOST = 4
+"""The default amount of concurrent requests per host."""
+REVALIDATE_AFTER = 24 * 60 * 60
+"""The default amount of seconds after which stored links are revalidated."""
+MAX_SIZE = 32 * 1024 * 1024
+"""The default maximum size of a download in bytes."""
+CHUNK_SIZE = 256 * 1024
+"""The amount of bytes streamed to the disk at once."""
+CONTENT_TYPES = ("image/", "application/octet-stream")
+"""The content types, or their prefixes, accepted as images. Decoding still has the final say."""
+
+
+class Prefetcher:
+    """Fetches links into an image store, limiting the amount of concurrent requests per host.
+
+    Requests queue up per host, in the order they were made. Each link is only fetched once per prefetcher.
+    Stored links are served without a request, unless they were last checked more than `revalidate_after`
+    seconds ago. Those are revalidated with If-None-Match and If-Modified-Since, and only downloaded if changed.
+
+    Attributes:
+        session: The aiohttp session to use for the requests.
+        image_store: The store to fetch the images into.
+        per_host: The maximum amount of concurrent requests per host.
+        revalidate_after: The amount of seconds after which stored links are revalidated.
+        max_size: The maximum size of a download in bytes.
+        requested: The amount of distinct links requested.
+        done: The amount of requested links that are done, successfully or not.
+        downloaded: The amount of links downloaded in full.
+        revalidated: The amount of stored links confirmed unchanged by their host.
+        cached: The amount of links served from the store without a request.
+        failed: The amount of links that couldn't be fetched.
+        nbytes: The amount of bytes downloaded.
+    """
+    session: aiohttp.ClientSession
+    image_store: store.ImageStore
+    per_host: int
+    revalidate_after: float
+    max_size: int
+    requested: int
+    done: int
+    downloaded: int
+    revalidated: int
+    cached: int
+    failed: int
+    nbytes: int
+
+    def __init__(self,
+                 session: aiohttp.ClientSession,
+                 image_store: store.ImageStore,
+                 per_host: int = PER_HOST,
+                 revalidate_after: float = REVALIDATE_AFTER,
+                 max_size: int = MAX_SIZE) -> None:
+        """Initialize the Prefetcher object.
+
+        Args:
+            session: The aiohttp session to use for the requests.
+            image_store: The store to fetch the images into.
+            per_host: The maximum amount of concurrent requests per host.
+            revalidate_after: The amount of seconds after which stored links are revalidated.
+            max_size: The maximum size of a download in bytes.
+        """
+        self.session = session
+        self.image_store = image_store
+        self.per_host = per_host
+        self.revalidate_after = revalidate_after
+        self.max_size = max_size
+        self._hosts: dict[str, asyncio.Semaphore] = {}
+        self._fetches: dict[str, asyncio.Task[pathlib.Path]] = {}
+        self._started = time.perf_counter()
+        self.requested = 0
+        self.done = 0
+        self.downloaded = 0
+        self.revalidated = 0
+        self.cached = 0
+        self.failed = 0
+        self.nbytes = 0
+
+    def __repr__(self) -> str:
+        return (f"<Prefetcher(done={self.done}/{self.requested}, downloaded={self.downloaded}, "
+                f"revalidated={self.revalidated}, cached={self.cached}, failed={self.failed})>")
+
+    def progress(self) -> dict[str, int | float]:
+        """Returns the current progress, including the throughput in links and bytes per second."""
+        elapsed = time.perf_counter() - self._started
+        return {
+            "requested": self.requested,
+            "done": self.done,
+            "downloaded": self.downloaded,
+            "revalidated": self.revalidated,
+            "cached": self.cached,
+            "failed": self.failed,
+            "bytes": self.nbytes,
+            "elapsed": elapsed,
+            "rate": self.done / elapsed if elapsed else 0.0,
+            "byte_rate": self.nbytes / elapsed if elapsed else 0.0,
+        }
+
+    async def fetch(self, url: str, process: Callable[[BinaryIO], bytes] | None = None) -> pathlib.Path:
+        """Fetch a link into the image store, joining the fetch in flight if there is one.
+
+        Args:
+            url: The link to fetch.
+            process: Turns the downloaded file into the bytes to store. Runs in a thread.
+
+        Returns:
+            The path of the stored image.
+
+        Raises:
+            ValueError: The link couldn't be fetched or decoded, and isn't stored.
+        """
+        task = self._fetches.get(url)
+        if task is None:
+            self.requested += 1
+            task = asyncio.create_task(self._fetch(url, process))
+            task.add_done_callback(self._finished)
+            self._fetches[url] = task
+        # Shielded, so one caller giving up doesn't cancel the fetch for the others.
+        return await asyncio.shield(task)
+
+    def _finished(self, task: asyncio.Task) -> None:
+        """Counts a finished fetch."""
+        self.done += 1
+        if task.cancelled() or task.exception() is not None:
+            self.failed += 1
+
+    def _host(self, url: str) -> asyncio.Semaphore:
+        """The semaphore limiting the requests to the host of a link."""
+        host = urlsplit(url).netloc
+        if host not in self._hosts:
+            self._hosts[host] = asyncio.Semaphore(self.per_host)
+        return self._hosts[host]
+
+    async def _fetch(self, url: str, process: Callable[[BinaryIO], bytes] | None) -> pathlib.Path:
+        """Fetch a link, revalidating it if it's stored."""
+        path = self.image_store.get(url)
+        validators = self.image_store.validators(url)
+        if path is not None and time.time() - validators.get("checked", 0) < self.revalidate_after:
+            self.cached += 1
+            return path
+
+        headers = {}
+        if path is not None and "etag" in validators:
+            headers["If-None-Match"] = validators["etag"]
+        if path is not None and "last_modified" in validators:
+            headers["If-Modified-Since"] = validators["last_modified"]
+        try:
+            async with self._host(url), self.session.get(url, headers=headers) as response:
+                if response.status == 304 and path is not None:
+                    self.revalidated += 1
+                    self.image_store.validate(url, response.headers.get("ETag", validators.get("etag")),
+                                              response.headers.get("Last-Modified", validators.get("last_modified")))
+                    return path
+                if not response.ok:
+                    raise ValueError(f"Could not fetch {url}, status {response.status}.")
+                partial = await self._stream(url, response)
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as err:
+            if path is None:
+                raise ValueError(f"Could not fetch {url}.") from err
+            logger.warning("Could not revalidate %s, using the stored image: %s", url, err)
+            return path
+
+        self.downloaded += 1
+        # Processed outside the host limit, so slow conversions don't hold up the requests.
+        try:
+            stored = await self.image_store.put_file(url, partial, process)
+        except (OSError, Image.DecompressionBombError) as err:
+            # Whatever was downloaded isn't an image that can be decoded.
+            if path is None:
+                raise ValueError(f"Could not decode {url}.") from err
+            logger.warning("Could not decode the new image of %s, using the stored image: %s", url, err)
+            return path
+        self.image_store.validate(url, etag, last_modified)
+        return stored
+
+    async def _stream(self, url: str, response: aiohttp.ClientResponse) -> pathlib.Path:
+        """Stream a response to a scratch file of the image store, checking its type and size on the way.
+
+        Raises:
+            ValueError: The response isn't an image, or is bigger than max_size.
+        """
+        if not response.content_type.startswith(CONTENT_TYPES):
+            raise ValueError(f"{url} is not an image, but {response.content_type}.")
+        if response.content_length is not None and response.content_length > self.max_size:
+            raise ValueError(f"{url} is {response.content_length} bytes, over the limit of {self.max_size}.")
+        partial = self.image_store.scratch()
+        size = 0
+        try:
+            f = await asyncio.to_thread(open, partial, "wb")
+            try:
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    size += len(chunk)
+                    self.nbytes += len(chunk)
+                    if size > self.max_size:
+                        raise ValueError(f"{url} is over the limit of {self.max_size} bytes.")
+                    await asyncio.to_thread(f.write, chunk)
+            finally:
+                await asyncio.to_thread(f.close)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+        return partial
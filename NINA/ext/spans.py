@@ -0,0 +1,176 @@
+"""Lightweight timing spans over the phases of a cycle.
+
+A slow cycle can spend its time picking events, resolving who they affect, fitting text, compositing,
+encoding, reading tiles or waiting on Discord. Spans time those phases while a cycle is collected,
+adding up per cycle and per event template, to be summarized in the log once the cycle ends.
+Collection is off unless enabled. Spans outside a collected cycle cost a context variable lookup.
+
+Render workers can't report to the collector of the bot process. They measure their own phases instead,
+which are recorded once the render is handed back.
+
+Typical usage example:
+    ```py
+    from NINA.ext import spans
+    spans.ENABLED = True
+    collector = spans.start()
+    with spans.span("select"):
+        event = pick()
+    spans.event(event.text.template)
+    with spans.span("resolve"):
+        text = await event.resolve(tributes, sim)
+    spans.finish(collector)
+    logger.info(logs.Record("spans", cycle=sim.cycle, **collector.summary()))
+    ```
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2023-present Tech. TTGames
+
+import contextlib
+import contextvars
+import time
+from typing import Any
+
+ENABLED = False
+"""Whether cycles are collected."""
+TOP_TEMPLATES = 5
+"""The amount of the slowest event templates summarized."""
+_NOOP = contextlib.nullcontext()
+"""The span used while nothing is collected."""
+_COLLECTOR: contextvars.ContextVar["Collector | None"] = contextvars.ContextVar("spans", default=None)
+"""The collector of the cycle being computed, if it's collected. Tasks and threads started by the cycle inherit it."""
+
+
+class Collector:
+    """The time spent in each phase of a cycle, in total and per event template.
+
+    Attributes:
+        seconds: The seconds spent in each phase.
+        counts: The amount of times each phase ran.
+        templates: The seconds spent in each phase, by the template of the event they ran for.
+        template: The template of the event being computed, if any.
+    """
+    seconds: dict[str, float]
+    counts: dict[str, int]
+    templates: dict[str, dict[str, float]]
+    template: str | None
+
+    def __init__(self) -> None:
+        """Initialize the Collector object."""
+        self.seconds = {}
+        self.counts = {}
+        self.templates = {}
+        self.template = None
+
+    def __repr__(self) -> str:
+        return f"<Collector(phases={len(self.seconds)}, templates={len(self.templates)})>"
+
+    def add(self, name: str, seconds: float) -> None:
+        """Record time spent in a phase, for the current event template too.
+
+        Args:
+            name: The name of the phase.
+            seconds: The seconds spent.
+        """
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+        if self.template is not None:
+            phases = self.templates.setdefault(self.template, {})
+            phases[name] = phases.get(name, 0.0) + seconds
+
+    def summary(self, top: int = TOP_TEMPLATES) -> dict[str, Any]:
+        """The phases in milliseconds, and the slowest event templates with their phases.
+
+        Args:
+            top: The amount of templates to include.
+        """
+        templates = sorted(self.templates.items(), key=lambda item: sum(item[1].values()), reverse=True)[:top]
+        return {
+            "phases": {
+                name: {
+                    "ms": round(seconds * 1000, 1),
+                    "n": self.counts[name]
+                } for name, seconds in sorted(self.seconds.items(), key=lambda item: item[1], reverse=True)
+            },
+            "templates": {
+                template: {name: round(seconds * 1000, 1) for name, seconds in phases.items()}
+                for template, phases in templates
+            },
+        }
+
+
+class _Span:
+    """Times its context into a collector."""
+    __slots__ = ("collector", "name", "started")
+
+    def __init__(self, collector: Collector, name: str) -> None:
+        self.collector = collector
+        self.name = name
+        self.started = 0.0
+
+    def __enter__(self) -> None:
+        self.started = time.perf_counter()
+
+    def __exit__(self, *_: Any) -> None:
+        self.collector.add(self.name, time.perf_counter() - self.started)
+
+
+def start() -> Collector | None:
+    """Start collecting the cycle computed by the current task, if collection is enabled.
+
+    Returns:
+        The collector of the cycle, to finish it with. None if nothing is collected.
+    """
+    if not ENABLED:
+        return None
+    collector = Collector()
+    _COLLECTOR.set(collector)
+    return collector
+
+
+def finish(collector: Collector | None) -> None:
+    """Stop collecting the cycle computed by the current task.
+
+    Args:
+        collector: The collector returned by `start`.
+    """
+    if collector is not None and _COLLECTOR.get() is collector:
+        _COLLECTOR.set(None)
+
+
+def event(template: str | None) -> None:
+    """Attribute the following spans to an event template, or to none.
+
+    Args:
+        template: The template of the event being computed. None once it's done.
+    """
+    collector = _COLLECTOR.get()
+    if collector is not None:
+        collector.template = template
+
+
+def span(name: str) -> contextlib.AbstractContextManager:
+    """Time a phase of the collected cycle, if any.
+
+    Args:
+        name: The name of the phase.
+    """
+    collector = _COLLECTOR.get()
+    if collector is None:
+        return _NOOP
+    return _Span(collector, name)
+
+
+def record(timings: dict[str, float], elapsed: float) -> None:
+    """Record the phases a render worker measured, and the time lost handing the work over and back.
+
+    Args:
+        timings: The seconds the worker spent in each phase.
+        elapsed: The seconds waited for the worker, in total.
+    """
+    collector = _COLLECTOR.get()
+    if collector is None:
+        return
+    for name, seconds in timings.items():
+        collector.add(name, seconds)
+    collector.add("handoff", max(0.0, elapsed - sum(timings.values())))
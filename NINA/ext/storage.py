@@ -0,0 +1,154 @@
+"""Asynchronous file operations for the cogs.
+
+Disk work done on the event loop stalls every command, and the gateway with them, for as long as the disk takes.
+The helpers here run it in threads instead. Attachments are streamed to the disk in chunks,
+and big directory trees are purged in the background: they're moved out of the way at once, then deleted at leisure.
+
+Typical usage example:
+    ```py
+    from NINA.ext import storage
+    await storage.save_attachment(session, attachment, game.cast_file)
+    if await storage.exists(game.cast_file):
+        game.sim = await game.new_simulation()
+    await storage.purge([game.data_dir / "cycles"])
+    await storage.remove(game.cast_file, game.events_file)
+    ```
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2023-present Tech. TTGames
+
+import asyncio
+import logging
+import os
+import pathlib
+import shutil
+from typing import Iterable
+import uuid
+
+import aiohttp
+import discord
+
+logger = logging.getLogger("NINA.storage")
+
+CHUNK_SIZE = 64 * 1024
+"""The amount of bytes of an attachment written to the disk at once."""
+MAX_ATTACHMENT = 8 * 1024 * 1024
+"""The default maximum size of a saved attachment in bytes."""
+TRASH = ".trash-"
+"""The marker of directories moved out of the way, waiting to be deleted."""
+_PURGE_TASKS: set[asyncio.Task] = set()
+"""References to running purges, so they aren't garbage collected mid-flight."""
+
+
+async def save_attachment(session: aiohttp.ClientSession,
+                          attachment: discord.Attachment,
+                          path: pathlib.Path,
+                          max_size: int = MAX_ATTACHMENT) -> int:
+    """Stream an attachment to a file in chunks, replacing the file once it's complete.
+
+    Args:
+        session: The aiohttp session to download the attachment with.
+        attachment: The attachment to save.
+        path: The file to save it to.
+        max_size: The maximum size of the attachment in bytes.
+
+    Returns:
+        The size of the saved attachment in bytes.
+
+    Raises:
+        ValueError: The attachment is too big, or couldn't be downloaded.
+    """
+    if attachment.size > max_size:
+        raise ValueError(f"{attachment.filename} is {attachment.size} bytes, over the limit of {max_size}.")
+    await asyncio.to_thread(path.parent.mkdir, parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    size = 0
+    try:
+        async with session.get(attachment.url) as response:
+            if not response.ok:
+                raise ValueError(f"Could not download {attachment.filename}, status {response.status}.")
+            f = await asyncio.to_thread(open, tmp, "wb")
+            try:
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > max_size:
+                        raise ValueError(f"{attachment.filename} is over the limit of {max_size} bytes.")
+                    await asyncio.to_thread(f.write, chunk)
+            finally:
+                await asyncio.to_thread(f.close)
+        # Only replaced once complete, so a failed download leaves the previous file intact.
+        await asyncio.to_thread(os.replace, tmp, path)
+    except BaseException as err:
+        await asyncio.to_thread(tmp.unlink, missing_ok=True)
+        if isinstance(err, aiohttp.ClientError):
+            raise ValueError(f"Could not download {attachment.filename}.") from err
+        raise
+    return size
+
+
+async def exists(*paths: pathlib.Path) -> bool:
+    """Whether every one of the paths exists.
+
+    Args:
+        *paths: The paths to check.
+    """
+    return await asyncio.to_thread(lambda: all(path.exists() for path in paths))
+
+
+async def remove(*paths: pathlib.Path) -> None:
+    """Delete files, ignoring the ones that don't exist.
+
+    Args:
+        *paths: The files to delete.
+    """
+    await asyncio.to_thread(lambda: [path.unlink(missing_ok=True) for path in paths])
+
+
+def _purge_done(task: asyncio.Task) -> None:
+    """Drops the finished purge task and reports any failure."""
+    _PURGE_TASKS.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Failed to purge directories.", exc_info=task.exception())
+
+
+async def purge(paths: Iterable[pathlib.Path]) -> asyncio.Task | None:
+    """Delete directory trees in the background.
+
+    The directories are renamed out of the way before this returns, so their paths are free to be used again at once.
+    Leftovers of purges that were interrupted, next to them, are deleted along with them.
+
+    Args:
+        paths: The directories to delete. The ones that don't exist are ignored.
+
+    Returns:
+        The background task deleting the directories, or None if there was nothing to delete.
+    """
+    paths = list(paths)
+
+    def _move() -> list[pathlib.Path]:
+        """Renames the directories, collecting them and any leftovers."""
+        trash = []
+        for parent in {path.parent for path in paths}:
+            if parent.exists():
+                trash.extend(entry for entry in parent.iterdir() if TRASH in entry.name)
+        for path in paths:
+            if path.exists():
+                moved = path.with_name(f"{path.name}{TRASH}{uuid.uuid4().hex}")
+                path.rename(moved)
+                trash.append(moved)
+        return trash
+
+    def _delete(trash: list[pathlib.Path]) -> None:
+        """Does the actual blocking deletion."""
+        for path in trash:
+            shutil.rmtree(path, ignore_errors=True)
+        logger.info("Purged %i directories.", len(trash))
+
+    trash = await asyncio.to_thread(_move)
+    if not trash:
+        return None
+    task = asyncio.create_task(asyncio.to_thread(_delete, trash))
+    _PURGE_TASKS.add(task)
+    task.add_done_callback(_purge_done)
+    return task
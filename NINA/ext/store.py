@@ -0,0 +1,385 @@
+"""A content-addressed store of normalized tribute images.
+
+Images are stored once per distinct content, under the SHA-256 of the bytes they were made from.
+A manifest maps every source, be it a link or a derivation, to the content it resolved to,
+so lookups are a dictionary access rather than a stat call, and two sources with identical bytes share a file.
+HTTP validators can be kept per source, so stored links can be revalidated with conditional requests.
+The store is bounded in size, and optionally in age. Least recently used images are evicted when trimmed,
+except the pinned ones.
+
+Typical usage example:
+    ```py
+    from NINA.ext import store
+    image_store = store.ImageStore(pathlib.Path("data/store"), budget=1024 * 1024 * 1024)
+    await image_store.load()
+    path = image_store.get(url)
+    if path is None:
+        path = await image_store.put(url, await response.read(), normalize)
+    await image_store.trim(keep={path})
+    await image_store.save()
+    print(image_store.stats())
+    ```
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2023-present Tech. TTGames
+
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import os
+import pathlib
+import time
+from typing import Any, BinaryIO, Callable, Iterable
+import uuid
+
+logger = logging.getLogger("NINA.store")
+
+DEFAULT_BUDGET = 1024 * 1024 * 1024
+"""The default size budget of an image store in bytes."""
+MANIFEST = "manifest.json"
+"""The name of the manifest file within the store directory."""
+SUFFIX = ".webp"
+"""The suffix of the stored images."""
+PARTIAL = ".part"
+"""The suffix of the files downloads are streamed to before they're stored."""
+CHUNK_SIZE = 1024 * 1024
+"""The amount of bytes hashed at once when storing files."""
+
+
+def digest(data: bytes) -> str:
+    """The content address of some bytes.
+
+    Args:
+        data: The bytes to address.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+class ImageStore:
+    """A size-bounded, content-addressed store of images on the disk.
+
+    The store is only meant to be touched from the event loop. The disk work of `load`, `put`, `trim` and `save`
+    runs in threads, which never touch the state of the store.
+
+    Attributes:
+        root: The directory holding the images and the manifest.
+        hits: The amount of lookups served from the store.
+        misses: The amount of lookups that weren't in the store.
+        dedupes: The amount of new sources that resolved to already stored content.
+        evictions: The amount of images evicted to stay within the budget.
+    """
+    root: pathlib.Path
+    hits: int
+    misses: int
+    dedupes: int
+    evictions: int
+
+    def __init__(self, root: pathlib.Path, budget: int = DEFAULT_BUDGET) -> None:
+        """Initialize the ImageStore object.
+
+        The manifest is loaded by `load`, or in place on first use if it wasn't.
+
+        Args:
+            root: The directory holding the images and the manifest.
+            budget: The size budget of the store in bytes.
+        """
+        self.root = root
+        self.budget = budget
+        self._sources: dict[str, str] | None = None
+        self._blobs: dict[str, dict[str, int | float]] = {}
+        self._validators: dict[str, dict[str, str | float]] = {}
+        self._nbytes = 0
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.dedupes = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        """The amount of stored images."""
+        self._load()
+        return len(self._blobs)
+
+    def __repr__(self) -> str:
+        return (f"<ImageStore(root={self.root}, images={len(self._blobs)}, "
+                f"size={self._nbytes / 1024 / 1024:.1f}MiB, budget={self.budget / 1024 / 1024:.1f}MiB)>")
+
+    @property
+    def nbytes(self) -> int:
+        """The size of the stored images on the disk."""
+        self._load()
+        return self._nbytes
+
+    def stats(self) -> dict[str, int]:
+        """Returns the current store metrics."""
+        self._load()
+        return {
+            "images": len(self._blobs),
+            "sources": len(self._sources),
+            "bytes": self._nbytes,
+            "budget": self.budget,
+            "hits": self.hits,
+            "misses": self.misses,
+            "dedupes": self.dedupes,
+            "evictions": self.evictions,
+        }
+
+    def path(self, key: str) -> pathlib.Path:
+        """The path an image is stored at.
+
+        Args:
+            key: The content address of the image.
+        """
+        return self.root / f"{key}{SUFFIX}"
+
+    def key(self, source: str) -> str | None:
+        """The content address a source resolved to, without marking it as used.
+
+        Args:
+            source: The source of the image.
+        """
+        self._load()
+        return self._sources.get(source)
+
+    def get(self, source: str) -> pathlib.Path | None:
+        """Look up the stored image of a source, marking it as recently used.
+
+        Args:
+            source: The source of the image.
+
+        Returns:
+            The path of the image, or None if the source isn't stored.
+        """
+        key = self.key(source)
+        if key is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touch(key)
+        return self.path(key)
+
+    def validators(self, source: str) -> dict[str, str | float]:
+        """The HTTP validators last seen for a source.
+
+        Args:
+            source: The source of the image.
+
+        Returns:
+            The "etag" and "last_modified" values, if any, and when they were "checked".
+            Empty if the source was never validated.
+        """
+        self._load()
+        return self._validators.get(source, {})
+
+    def validate(self, source: str, etag: str | None = None, last_modified: str | None = None) -> None:
+        """Record the HTTP validators of a stored source, marking it as checked just now.
+
+        Args:
+            source: The source of the image.
+            etag: The ETag header of the response.
+            last_modified: The Last-Modified header of the response.
+        """
+        self._load()
+        validators = {"etag": etag, "last_modified": last_modified, "checked": time.time()}
+        self._validators[source] = {name: value for name, value in validators.items() if value is not None}
+        self._dirty = True
+
+    async def put(self,
+                  source: str,
+                  data: bytes,
+                  process: Callable[[BinaryIO], bytes] | None = None) -> pathlib.Path:
+        """Store the image of a source.
+
+        If identical bytes are already stored, the source is linked to them and nothing is processed or written.
+
+        Args:
+            source: The source of the image.
+            data: The raw bytes of the image.
+            process: Turns a file of the raw bytes into the bytes to store. Runs in a thread.
+                Defaults to storing them as is.
+
+        Returns:
+            The path of the stored image.
+        """
+        await self.load()
+        key = digest(data)
+        if key not in self._blobs:
+            await asyncio.to_thread(self._write, key, io.BytesIO(data), process)
+        return self._link(source, key)
+
+    def scratch(self) -> pathlib.Path:
+        """A fresh path to stream a download to, before storing it with `put_file`."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        return self.root / f"{uuid.uuid4().hex}{PARTIAL}"
+
+    async def put_file(self,
+                       source: str,
+                       path: pathlib.Path,
+                       process: Callable[[BinaryIO], bytes] | None = None) -> pathlib.Path:
+        """Store the image of a source from a file, without reading it into memory at once. The file is consumed.
+
+        Args:
+            source: The source of the image.
+            path: The file holding the raw bytes of the image, usually a `scratch` path.
+            process: Turns the file into the bytes to store. Runs in a thread. Defaults to storing it as is.
+
+        Returns:
+            The path of the stored image.
+        """
+        await self.load()
+
+        def _hash_file() -> str:
+            """Hashes the file."""
+            hasher = hashlib.sha256()
+            with open(path, "rb") as f:
+                while chunk := f.read(CHUNK_SIZE):
+                    hasher.update(chunk)
+            return hasher.hexdigest()
+
+        def _store_file(key: str) -> None:
+            """Stores the file."""
+            with open(path, "rb") as f:
+                self._write(key, f, process)
+
+        try:
+            key = await asyncio.to_thread(_hash_file)
+            if key not in self._blobs:
+                await asyncio.to_thread(_store_file, key)
+        finally:
+            await asyncio.to_thread(path.unlink, missing_ok=True)
+        return self._link(source, key)
+
+    def _link(self, source: str, key: str) -> pathlib.Path:
+        """Points a source at stored content, registering the content if it was just written."""
+        if key in self._blobs:
+            self.dedupes += 1
+        else:
+            stored = self.path(key).stat().st_size
+            self._blobs[key] = {"size": stored, "used": time.time()}
+            self._nbytes += stored
+        self._sources[source] = key
+        self._touch(key)
+        return self.path(key)
+
+    async def trim(self, keep: Iterable[pathlib.Path] = (), max_age: float | None = None) -> int:
+        """Evict the least recently used images until the store is within budget.
+
+        Args:
+            keep: The paths of images that must not be evicted, like the ones of the current cast.
+            max_age: The amount of seconds after which unused images are evicted regardless of the budget.
+
+        Returns:
+            The amount of evicted images.
+        """
+        await self.load()
+        cutoff = time.time() - max_age if max_age is not None else 0
+        if self._nbytes <= self.budget and all(blob["used"] >= cutoff for blob in self._blobs.values()):
+            return 0
+        pinned = {path.stem for path in keep}
+        evicted = set()
+        for key in sorted(self._blobs, key=lambda k: self._blobs[k]["used"]):
+            if self._nbytes <= self.budget and self._blobs[key]["used"] >= cutoff:
+                break
+            if key in pinned:
+                continue
+            self._nbytes -= self._blobs.pop(key)["size"]
+            evicted.add(key)
+        self._sources = {source: key for source, key in self._sources.items() if key not in evicted}
+        self._validators = {source: val for source, val in self._validators.items() if source in self._sources}
+        self.evictions += len(evicted)
+        self._dirty = True
+        await asyncio.to_thread(self._remove, evicted)
+        logger.info("Evicted %i images from the store.", len(evicted))
+        return len(evicted)
+
+    async def load(self) -> None:
+        """Load the manifest, if it isn't yet, scanning the disk in a thread."""
+        if self._sources is not None:
+            return
+        state = await asyncio.to_thread(self._scan)
+        # Another use may have loaded it in place meanwhile.
+        if self._sources is None:
+            self._apply(*state)
+
+    async def save(self) -> None:
+        """Persist the manifest, if it changed."""
+        if not self._dirty:
+            return
+        manifest = json.dumps({"sources": self._sources, "blobs": self._blobs, "validators": self._validators})
+        self._dirty = False
+        await asyncio.to_thread(self._write_manifest, manifest)
+
+    def _touch(self, key: str) -> None:
+        """Mark an image as recently used."""
+        self._blobs[key]["used"] = time.time()
+        self._dirty = True
+
+    def _write(self, key: str, raw: BinaryIO, process: Callable[[BinaryIO], bytes] | None) -> None:
+        """Process and write an image."""
+        data = process(raw) if process is not None else raw.read()
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.path(key).with_suffix(".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, self.path(key))
+
+    def _remove(self, keys: Iterable[str]) -> None:
+        """Delete images from the disk."""
+        for key in keys:
+            self.path(key).unlink(missing_ok=True)
+
+    def _write_manifest(self, manifest: str) -> None:
+        """Atomically replace the manifest on the disk."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.root / f"{MANIFEST}.tmp"
+        tmp.write_text(manifest, encoding="utf-8")
+        os.replace(tmp, self.root / MANIFEST)
+
+    def _load(self) -> None:
+        """Load the manifest in place, if `load` didn't yet."""
+        if self._sources is None:
+            self._apply(*self._scan())
+
+    def _scan(self) -> tuple[dict[str, Any], dict[str, int]]:
+        """Read the manifest and reconcile it with the images actually on the disk in a single scan.
+
+        Leftover scratch files and images unknown to the manifest are deleted.
+
+        Returns:
+            The manifest, and the sizes of the images it knows of, by their content address.
+        """
+        try:
+            with open(self.root / MANIFEST, "rb") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            manifest = {"sources": {}, "blobs": {}}
+        except (OSError, ValueError):
+            logger.warning("The image store manifest is unreadable. Starting over.")
+            manifest = {"sources": {}, "blobs": {}}
+        on_disk = {}
+        if self.root.exists():
+            with os.scandir(self.root) as entries:
+                for entry in entries:
+                    if entry.name.endswith(SUFFIX):
+                        on_disk[entry.name.removesuffix(SUFFIX)] = entry.stat().st_size
+                    elif entry.name.endswith((PARTIAL, ".tmp")):
+                        # Left over by an interrupted download or write.
+                        os.remove(entry.path)
+        for key in on_disk.keys() - manifest["blobs"].keys():
+            # Unknown to the manifest, so nothing resolves to it.
+            os.remove(self.path(key))
+            del on_disk[key]
+        return manifest, on_disk
+
+    def _apply(self, manifest: dict[str, Any], on_disk: dict[str, int]) -> None:
+        """Take over a scanned manifest."""
+        self._blobs = {key: {"size": size, "used": manifest["blobs"][key]["used"]} for key, size in on_disk.items()}
+        self._sources = {source: key for source, key in manifest["sources"].items() if key in self._blobs}
+        self._validators = {
+            source: val for source, val in manifest.get("validators", {}).items() if source in self._sources
+        }
+        self._nbytes = sum(blob["size"] for blob in self._blobs.values())
+        self._dirty = len(self._blobs) != len(manifest["blobs"]) or len(self._sources) != len(manifest["sources"])
+        logger.debug("Loaded %r.", self)
@@ -0,0 +1,190 @@
+"""An in-process cache of decoded tribute tiles.
+
+Renders paste the same few tribute tiles over and over. This module keeps them decoded, already in RGBA,
+so a tile is read from the disk and decoded once instead of on every render.
+Animated tiles are kept as `NINA.ext.imgops.Animation` frame lists.
+
+Typical usage example:
+    ```py
+    from NINA.ext import tilecache
+    cache = tilecache.TileCache(budget=64 * 1024 * 1024)
+    tile = cache.get((content_key, "#ff0000"))
+    if tile is None:
+        tile = tilecache.decode_tile(path)
+        cache.put((content_key, "#ff0000"), tile)
+    print(cache.stats())
+    ```
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2023-present Tech. TTGames
+
+from __future__ import annotations
+
+import collections
+import logging
+import pathlib
+from typing import Hashable, TypeAlias
+
+from NINA.ext import lazy
+
+Image = lazy.load("PIL.Image")
+imgops = lazy.load("NINA.ext.imgops")
+
+logger = logging.getLogger("NINA.tilecache")
+
+DEFAULT_BUDGET = 256 * 1024 * 1024
+"""The default memory budget of a tile cache in bytes."""
+
+Tile: TypeAlias = "Image.Image | imgops.Animation"
+"""A decoded tile. Either a static RGBA image or a decoded animation."""
+
+
+def tile_size(tile: Tile) -> int:
+    """The amount of decoded pixel data held by a tile, in bytes.
+
+    Args:
+        tile: The tile to measure.
+    """
+    if isinstance(tile, imgops.Animation):
+        return tile.nbytes
+    return tile.width * tile.height * len(tile.getbands())
+
+
+def decode_tile(path: pathlib.Path) -> Tile:
+    """Decodes an image from the disk into a tile.
+
+    Args:
+        path: The path of the image to decode.
+    """
+    with Image.open(path) as im:
+        if getattr(im, "n_frames", 1) != 1:
+            return imgops.Animation.from_image(im)
+        return im.convert("RGBA") if im.mode != "RGBA" else im.copy()
+
+
+class TileCache:
+    """A least recently used cache of decoded tiles, bounded by a memory budget.
+
+    The cache is only meant to be touched from the event loop. Decode tiles with `decode_tile` in a worker thread.
+    Cached tiles are shared, so they must never be modified in place.
+
+    Attributes:
+        hits: The amount of lookups served from the cache.
+        misses: The amount of lookups that required a decode.
+        evictions: The amount of tiles evicted to stay within the budget.
+    """
+    hits: int
+    misses: int
+    evictions: int
+
+    def __init__(self, budget: int = DEFAULT_BUDGET) -> None:
+        """Initialize the TileCache object.
+
+        Args:
+            budget: The memory budget of the cache in bytes.
+        """
+        self._tiles: collections.OrderedDict[Hashable, tuple[Tile, int]] = collections.OrderedDict()
+        self._budget = budget
+        self._nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        """The amount of cached tiles."""
+        return len(self._tiles)
+
+    def __repr__(self) -> str:
+        return (f"<TileCache(tiles={len(self._tiles)}, size={self._nbytes / 1024 / 1024:.1f}MiB, "
+                f"budget={self._budget / 1024 / 1024:.1f}MiB, hit_rate={self.hit_rate:.1%})>")
+
+    @property
+    def budget(self) -> int:
+        """The memory budget of the cache in bytes. Lowering it evicts tiles right away."""
+        return self._budget
+
+    @budget.setter
+    def budget(self, value: int) -> None:
+        self._budget = value
+        self._evict()
+
+    @property
+    def nbytes(self) -> int:
+        """The amount of decoded pixel data held by the cache."""
+        return self._nbytes
+
+    @property
+    def hit_rate(self) -> float:
+        """The share of lookups served from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict[str, int | float]:
+        """Returns the current cache metrics."""
+        return {
+            "tiles": len(self._tiles),
+            "bytes": self._nbytes,
+            "budget": self._budget,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+        }
+
+    def get(self, key: Hashable) -> Tile | None:
+        """Fetch a tile from the cache, marking it as recently used.
+
+        Args:
+            key: The key of the tile.
+
+        Returns:
+            The tile, or None if it isn't cached.
+        """
+        entry = self._tiles.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._tiles.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: Hashable, tile: Tile) -> None:
+        """Insert a tile into the cache, evicting the least recently used tiles if over budget.
+
+        Tiles bigger than the whole budget are not cached.
+
+        Args:
+            key: The key of the tile.
+            tile: The tile to cache.
+        """
+        size = tile_size(tile)
+        if size > self._budget:
+            logger.debug("Tile %s of %i bytes exceeds the budget. Not caching.", key, size)
+            return
+        self.discard(key)
+        self._tiles[key] = (tile, size)
+        self._nbytes += size
+        self._evict()
+
+    def discard(self, key: Hashable) -> None:
+        """Remove a tile from the cache, if present.
+
+        Args:
+            key: The key of the tile.
+        """
+        entry = self._tiles.pop(key, None)
+        if entry is not None:
+            self._nbytes -= entry[1]
+
+    def clear(self) -> None:
+        """Remove every tile from the cache. The metrics are kept."""
+        self._tiles.clear()
+        self._nbytes = 0
+
+    def _evict(self) -> None:
+        """Evict the least recently used tiles until the cache is within budget."""
+        while self._nbytes > self._budget and self._tiles:
+            _, (_, size) = self._tiles.popitem(last=False)
+            self._nbytes -= size
+            self.evictions += 1
@@ -0,0 +1,181 @@
+"""A restartable pool of worker processes for CPU heavy renders.
+
+Compositing and encoding renders holds the GIL for seconds at a time. Run in a thread of the bot process,
+that's time the gateway heartbeat and interaction acknowledgements wait for.
+The pool runs such work in separate processes instead, handing the arguments and results over by pickling.
+Only renders go through it. Computing cycles stays on the event loop of the bot process,
+as the simulations are live objects shared with every command, and pickling a whole cast per cycle costs more.
+Workers are started lazily, recycled after a number of tasks, and can be restarted at any time
+without touching the gateway session. A dead worker restarts the pool, and the work it held is retried once.
+With no workers configured, the work runs in a thread of the bot process, as a local stand-in.
+
+Typical usage example:
+    ```py
+    from NINA.ext import workers
+    workers.POOL.workers = 2
+    render = await workers.POOL.run(imgops.composite_image_sync, filename, base_image, animated)
+    workers.POOL.restart()
+    print(workers.POOL.stats())
+    ```
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2023-present Tech. TTGames
+
+import asyncio
+from concurrent import futures
+from concurrent.futures import process
+import logging
+import multiprocessing
+import signal
+import time
+from typing import Any, Callable
+
+logger = logging.getLogger("NINA.workers")
+
+MAX_TASKS = 200
+"""The default amount of tasks after which a worker is replaced, releasing whatever memory it fragmented."""
+
+
+def _init_worker() -> None:
+    """Prepares a worker process. Interrupts are left to the bot, which shuts the workers down."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class WorkerPool:
+    """A pool of worker processes, or a thread when it has no workers.
+
+    Attributes:
+        workers: The amount of worker processes. 0 runs the work in threads of this process instead.
+        max_tasks: The amount of tasks after which a worker is replaced. None keeps workers for good.
+        tasks: The amount of tasks run, successfully or not.
+        failed: The amount of tasks that raised.
+        restarts: The amount of times the worker processes were restarted.
+        busy: The total amount of seconds spent waiting for tasks.
+    """
+    workers: int
+    max_tasks: int | None
+    tasks: int
+    failed: int
+    restarts: int
+    busy: float
+
+    def __init__(self, workers: int = 0, max_tasks: int | None = MAX_TASKS) -> None:
+        """Initialize the WorkerPool object. The worker processes are started on first use.
+
+        Args:
+            workers: The amount of worker processes. 0 runs the work in threads of this process instead.
+            max_tasks: The amount of tasks after which a worker is replaced. None keeps workers for good.
+        """
+        self.workers = workers
+        self.max_tasks = max_tasks
+        self._executor: futures.ProcessPoolExecutor | None = None
+        self._in_flight = 0
+        self.tasks = 0
+        self.failed = 0
+        self.restarts = 0
+        self.busy = 0.0
+
+    def __repr__(self) -> str:
+        return f"<WorkerPool(workers={self.workers}, running={self.running}, in_flight={self._in_flight})>"
+
+    @property
+    def running(self) -> bool:
+        """Whether the worker processes are started."""
+        return self._executor is not None
+
+    def stats(self) -> dict[str, int | float | bool]:
+        """Returns the current pool metrics."""
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "in_flight": self._in_flight,
+            "tasks": self.tasks,
+            "failed": self.failed,
+            "restarts": self.restarts,
+            "avg_time": self.busy / self.tasks if self.tasks else 0.0,
+        }
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run a function in a worker, or a thread if there are none.
+
+        The function and its arguments must be picklable, so the function has to be defined at module level.
+
+        Args:
+            fn: The function to run.
+            *args: The arguments to call it with.
+
+        Returns:
+            The result of the function.
+
+        Raises:
+            concurrent.futures.process.BrokenProcessPool: The workers died twice in a row running it.
+        """
+        self._in_flight += 1
+        started = time.perf_counter()
+        try:
+            if not self.workers:
+                return await asyncio.to_thread(fn, *args)
+            return await self._submit(fn, *args)
+        except BaseException:
+            self.failed += 1
+            raise
+        finally:
+            self._in_flight -= 1
+            self.tasks += 1
+            self.busy += time.perf_counter() - started
+
+    async def _submit(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run a function in a worker, restarting the workers and retrying once if they died."""
+        loop = asyncio.get_running_loop()
+        retried = False
+        while True:
+            executor = self._start()
+            try:
+                return await loop.run_in_executor(executor, fn, *args)
+            except process.BrokenProcessPool:
+                logger.warning("A worker died running %s. Restarting the workers.", fn.__name__)
+                # Concurrent tasks of the same pool all fail, only the first one replaces it.
+                if self._executor is executor:
+                    self._replace()
+                if retried:
+                    raise
+                retried = True
+
+    def _start(self) -> futures.ProcessPoolExecutor:
+        """The executor of the workers, started if needed."""
+        if self._executor is None:
+            # Spawned rather than forked, as forking a process with a running event loop and threads is unsafe.
+            self._executor = futures.ProcessPoolExecutor(self.workers,
+                                                         mp_context=multiprocessing.get_context("spawn"),
+                                                         initializer=_init_worker,
+                                                         max_tasks_per_child=self.max_tasks)
+            logger.info("Started %i render workers.", self.workers)
+        return self._executor
+
+    def _replace(self) -> None:
+        """Let go of the current workers. Tasks they are running still finish, new ones go to new workers."""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+            self.restarts += 1
+
+    def restart(self) -> None:
+        """Restart the workers, for example after changing their amount.
+
+        Tasks already submitted finish on the old workers.
+        """
+        self._replace()
+        if self.workers:
+            self._start()
+
+    def shutdown(self) -> None:
+        """Stop the workers, once the tasks they are running are done."""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+            logger.info("Render workers shut down.")
+
+
+POOL = WorkerPool()
+"""The pool shared by all renders."""
@@ -0,0 +1,615 @@
+"""Drives a game end to end through its commands, against local stand-ins of Discord and the image hosts.
+
+/setup, /ready, /cycle and /status run like they would in a channel, through the outbound scheduler and its pacing.
+Interactions and their followup webhooks are stand-ins recording every send, its attachments and when it happened.
+Sends take as long as uploading their attachments would. Tribute images are generated and served by a local
+HTTP server, so readying downloads them through the bot's session, retry middleware and prefetcher.
+Nothing connects to Discord.
+
+Reported are the latency of every command, and a timeline of every event of every cycle:
+how long it took to compute, to render, to composite and encode, how long it waited to be sent, and to upload.
+Event phases are timed by wrapping methods of the engine for the run, and include waiting for render workers.
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2023-present Tech. TTGames
+
+import argparse
+import asyncio
+import contextlib
+import functools
+import io
+import itertools
+import json
+import logging
+import math
+import pathlib
+import re
+import sys
+import tempfile
+import time
+import tomllib
+import types
+from typing import Any, Iterator
+
+from aiohttp import web
+import discord
+from PIL import Image
+from PIL import ImageDraw
+
+ROOT = pathlib.Path(__file__).parent.parent
+"""The root of the repository."""
+sys.path.insert(0, str(ROOT))
+
+# pylint: disable=wrong-import-position
+from NINA import bot
+from NINA.cogs import core
+from NINA.ext import imgops
+from NINA.ext import lazy
+from NINA.ext import NINA
+from NINA.ext import outbound
+from NINA.ext import store
+
+SAMPLES = ROOT / "templates" / "samples"
+"""The directory of the sample packs."""
+CAST = SAMPLES / "cast.toml"
+"""The cast of the game. Its image links are pointed at the local image server."""
+PACKS = {
+    "events": ROOT / "templates" / "events.toml",
+    "dixie": SAMPLES / "dixie_events.toml",
+    "dixie_experimental": SAMPLES / "dixie_events_experimental.toml",
+}
+"""The event packs, by name."""
+SEED = "1234"
+"""The seed the game is readied with."""
+CYCLES = 2
+"""The default amount of cycles run."""
+LATENCY = 0.15
+"""The default seconds every send to Discord takes, besides uploading."""
+UPLOAD_RATE = 4.0
+"""The default MiB per second attachments are uploaded at."""
+IMAGE_SIZE = (384, 384)
+"""The size of the generated tribute images."""
+ANIMATED_EVERY = 6
+"""Every how many tribute images one is an animated GIF."""
+FRAMES = 8
+"""The amount of frames of the animated tribute images."""
+_LINK = re.compile(r'"https?://[^"]+"')
+"""A link in a TOML file."""
+
+
+def tribute_image(index: int) -> tuple[bytes, str]:
+    """Generate a tribute image, the same on every run.
+
+    Args:
+        index: The number of the image.
+
+    Returns:
+        The encoded image and its content type.
+    """
+    frames = FRAMES if index % ANIMATED_EVERY == ANIMATED_EVERY - 1 else 1
+    images = []
+    for frame in range(frames):
+        hue = (index * 47 + frame * 8) % 256
+        im = Image.new("HSV", IMAGE_SIZE, (hue, 160, 200)).convert("RGB")
+        draw = ImageDraw.Draw(im)
+        radius = IMAGE_SIZE[0] // 4
+        x = IMAGE_SIZE[0] // 2 + round(math.cos(2 * math.pi * frame / frames) * radius // 2)
+        draw.ellipse((x - radius, IMAGE_SIZE[1] // 2 - radius, x + radius, IMAGE_SIZE[1] // 2 + radius),
+                     fill=(255, 255, 255))
+        images.append(im)
+    buffer = io.BytesIO()
+    if frames > 1:
+        images[0].save(buffer, "GIF", save_all=True, append_images=images[1:], duration=100, loop=0)
+        return buffer.getvalue(), "image/gif"
+    images[0].save(buffer, "PNG")
+    return buffer.getvalue(), "image/png"
+
+
+class Send:
+    """A request made to Discord on behalf of an interaction.
+
+    Attributes:
+        command: The command the interaction invoked.
+        kind: The kind of request, like "followup" or "edit".
+        started: The seconds into the run the request was made at.
+        finished: The seconds into the run the request completed at.
+        embeds: The amount of embeds sent.
+        files: The filenames and sizes in bytes of the attachments sent.
+    """
+    command: str
+    kind: str
+    started: float
+    finished: float
+    embeds: int
+    files: list[tuple[str, int]]
+
+    def __init__(self, command: str, kind: str, started: float, embeds: int, files: list[tuple[str, int]]) -> None:
+        """Initialize the Send object.
+
+        Args:
+            command: The command the interaction invoked.
+            kind: The kind of request.
+            started: The seconds into the run the request was made at.
+            embeds: The amount of embeds sent.
+            files: The filenames and sizes of the attachments sent.
+        """
+        self.command = command
+        self.kind = kind
+        self.started = started
+        self.finished = started
+        self.embeds = embeds
+        self.files = files
+
+    def __repr__(self) -> str:
+        return f"<Send(command={self.command}, kind={self.kind}, files={len(self.files)})>"
+
+    @property
+    def size(self) -> int:
+        """The bytes uploaded."""
+        return sum(size for _, size in self.files)
+
+
+class Discord:
+    """A stand-in of Discord, recording the requests made to it.
+
+    Attributes:
+        latency: The seconds every request takes, besides uploading.
+        upload_rate: The bytes per second attachments are uploaded at.
+        sends: The requests made, in order.
+        started: The perf_counter time the run started at.
+    """
+    latency: float
+    upload_rate: float
+    sends: list[Send]
+    started: float
+
+    def __init__(self, latency: float, upload_rate: float) -> None:
+        """Initialize the Discord object.
+
+        Args:
+            latency: The seconds every request takes, besides uploading.
+            upload_rate: The bytes per second attachments are uploaded at.
+        """
+        self.latency = latency
+        self.upload_rate = upload_rate
+        self.sends = []
+        self.started = time.perf_counter()
+        self._ids = itertools.count(1)
+
+    def now(self) -> float:
+        """The seconds into the run."""
+        return time.perf_counter() - self.started
+
+    def next_id(self) -> int:
+        """A fresh snowflake."""
+        return next(self._ids)
+
+    async def request(self, command: str, kind: str, **kwargs: Any) -> None:
+        """Make a request, taking as long as uploading its attachments would.
+
+        Args:
+            command: The command the interaction invoked.
+            kind: The kind of request.
+            **kwargs: The arguments of the request, as taken by `discord.Webhook.send`.
+        """
+        embeds = kwargs.get("embeds") or ([kwargs["embed"]] if kwargs.get("embed") else [])
+        files = []
+        for file in kwargs.get("files") or ([kwargs["file"]] if kwargs.get("file") else []):
+            files.append((file.filename, len(file.fp.read())))
+            file.close()
+        send = Send(command, kind, self.now(), len(embeds), files)
+        self.sends.append(send)
+        await asyncio.sleep(self.latency + send.size / self.upload_rate)
+        send.finished = self.now()
+
+
+class Message:
+    """A stand-in of `discord.WebhookMessage`."""
+
+    def __init__(self, interaction: "Interaction") -> None:
+        self.id = interaction.discord.next_id()
+        self._interaction = interaction
+
+    async def edit(self, **kwargs: Any) -> "Message":
+        await self._interaction.discord.request(self._interaction.command, "edit", **kwargs)
+        return self
+
+
+class Followup:
+    """A stand-in of the followup `discord.Webhook` of an interaction."""
+
+    def __init__(self, interaction: "Interaction") -> None:
+        self._interaction = interaction
+
+    async def send(self, wait: bool = False, **kwargs: Any) -> Message | None:
+        await self._interaction.discord.request(self._interaction.command, "followup", **kwargs)
+        return Message(self._interaction) if wait else None
+
+
+class Response:
+    """A stand-in of `discord.InteractionResponse`.
+
+    Attributes:
+        acknowledged: The seconds into the run the interaction was acknowledged at, if it was.
+    """
+    acknowledged: float | None
+
+    def __init__(self, interaction: "Interaction") -> None:
+        self._interaction = interaction
+        self.acknowledged = None
+
+    def is_done(self) -> bool:
+        return self.acknowledged is not None
+
+    async def defer(self, **_: Any) -> None:
+        self.acknowledged = self._interaction.discord.now()
+        await asyncio.sleep(self._interaction.discord.latency)
+
+    async def send_message(self, content: str | None = None, **kwargs: Any) -> None:
+        self.acknowledged = self._interaction.discord.now()
+        await self._interaction.discord.request(self._interaction.command, "response", content=content, **kwargs)
+
+
+class Channel:
+    """A stand-in of the channel of an interaction."""
+
+    def typing(self) -> contextlib.AbstractAsyncContextManager:
+        return contextlib.nullcontext()
+
+
+class Interaction:
+    """A stand-in of `discord.Interaction`, every command of the run being invoked in the same channel.
+
+    Attributes:
+        discord: The Discord stand-in the interaction was made on.
+        command: The name of the command invoked.
+        invoked: The seconds into the run the command was invoked at.
+    """
+    discord: Discord
+    command: str
+    invoked: float
+    guild_id = 1
+    channel_id = 1
+
+    def __init__(self, client: bot.NINABot, stand_in: Discord, command: str) -> None:
+        """Initialize the Interaction object.
+
+        Args:
+            client: The bot the interaction is for.
+            stand_in: The Discord stand-in the interaction is made on.
+            command: The name of the command invoked.
+        """
+        self.client = client
+        self.discord = stand_in
+        self.command = command
+        self.invoked = stand_in.now()
+        self.id = stand_in.next_id()
+        self.user = types.SimpleNamespace(id=stand_in.next_id(), name="bench")
+        self.channel = Channel()
+        self.response = Response(self)
+        self.followup = Followup(self)
+
+
+class Attachment:
+    """A stand-in of `discord.Attachment`, served by the image server."""
+
+    def __init__(self, url: str, filename: str, size: int) -> None:
+        self.url = url
+        self.filename = filename
+        self.size = size
+
+
+class ImageServer:
+    """A local HTTP server of tribute images, and of the files of the game.
+
+    Attributes:
+        files: The bodies and content types served, by path.
+        requests: The amount of requests served, by path.
+        url: The URL of the server, once started.
+    """
+    files: dict[str, tuple[bytes, str]]
+    requests: dict[str, int]
+    url: str
+
+    def __init__(self) -> None:
+        """Initialize the ImageServer object."""
+        self.files = {}
+        self.requests = {}
+        self.url = ""
+        self._runner: web.AppRunner | None = None
+
+    async def _serve(self, request: web.Request) -> web.Response:
+        """Serve a file."""
+        if request.path not in self.files:
+            raise web.HTTPNotFound()
+        self.requests[request.path] = self.requests.get(request.path, 0) + 1
+        body, content_type = self.files[request.path]
+        return web.Response(body=body, content_type=content_type)
+
+    async def start(self) -> None:
+        """Start serving on a free local port."""
+        app = web.Application()
+        app.router.add_get("/{path:.*}", self._serve)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", 0).start()
+        self.url = f"http://127.0.0.1:{self._runner.addresses[0][1]}"
+
+    async def stop(self) -> None:
+        """Stop serving."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def attachment(self, path: str, body: bytes) -> Attachment:
+        """Serve a file of the game, as an attachment of /setup."""
+        self.files[path] = (body, "application/toml")
+        return Attachment(self.url + path, path.rsplit("/", 1)[-1], len(body))
+
+    def cast(self) -> bytes:
+        """The sample cast, with every link pointing at a generated image served here.
+
+        Readying needs as many members in every district, the tributes left over are dropped.
+        """
+        text = CAST.read_text("utf-8")
+        districts = len(tomllib.loads(text)["districts"])
+        header, *tributes = text.split("[[cast]]")
+        text = "[[cast]]".join([header, *tributes[:len(tributes) // districts * districts]])
+        index = itertools.count()
+
+        def _serve_image(_: re.Match) -> str:
+            number = next(index)
+            body, content_type = tribute_image(number)
+            path = f"/images/{number}.{content_type.split('/')[1]}"
+            self.files[path] = (body, content_type)
+            return f'"{self.url}{path}"'
+
+        return _LINK.sub(_serve_image, text).encode("utf-8")
+
+
+class Timeline:
+    """Records when every event of the cycles was computed, rendered and encoded.
+
+    Computing an event is picking it, checking its requirements and resolving who it affects.
+    The time spent on picks that came to nothing counts toward the next event.
+
+    Attributes:
+        events: The seconds into the run each phase of every event ended at, and its compute time,
+            by cycle and event number.
+    """
+    events: dict[tuple[int, int], dict[str, float]]
+
+    def __init__(self, stand_in: Discord) -> None:
+        """Initialize the Timeline object.
+
+        Args:
+            stand_in: The Discord stand-in whose clock is used.
+        """
+        self.events = {}
+        self._discord = stand_in
+        self._current: dict[str, float] | None = None
+        self._computing = 0.0
+        self._depth = 0
+
+    def _compute(self, method: Any) -> Any:
+        """Time a method computing events, synchronous or not, counting nested calls once."""
+
+        @contextlib.contextmanager
+        def _timed() -> Iterator[None]:
+            self._depth += 1
+            started = time.perf_counter()
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if not self._depth:
+                    self._computing += time.perf_counter() - started
+
+        if asyncio.iscoroutinefunction(method):
+
+            @functools.wraps(method)
+            async def _async(*args, **kwargs):
+                with _timed():
+                    return await method(*args, **kwargs)
+
+            return _async
+
+        @functools.wraps(method)
+        def _sync(*args, **kwargs):
+            with _timed():
+                return method(*args, **kwargs)
+
+        return _sync
+
+    @contextlib.contextmanager
+    def installed(self) -> Iterator["Timeline"]:
+        """Record events for the duration of the context."""
+        originals = {
+            name: getattr(NINA.Event, name)
+            for name in ("check_requirements", "affiliationresolution", "rendered_resolve")
+        }
+        composite_image = imgops.composite_image
+        rendered_resolve = originals["rendered_resolve"]
+
+        @functools.wraps(rendered_resolve)
+        async def _rendered_resolve(event, tributes, simstate, event_no):
+            times = self.events[(simstate.cycle, event_no)] = {
+                "compute": self._computing,
+                "rendering": self._discord.now(),
+            }
+            self._computing = 0.0
+            self._current = times
+            try:
+                return await rendered_resolve(event, tributes, simstate, event_no)
+            finally:
+                self._current = None
+                times["rendered"] = self._discord.now()
+
+        @functools.wraps(composite_image)
+        async def _composite_image(*args, **kwargs):
+            times = self._current
+            started = self._discord.now()
+            try:
+                return await composite_image(*args, **kwargs)
+            finally:
+                if times is not None:
+                    times["encode"] = times.get("encode", 0.0) + self._discord.now() - started
+
+        NINA.Event.check_requirements = self._compute(originals["check_requirements"])
+        NINA.Event.affiliationresolution = self._compute(originals["affiliationresolution"])
+        NINA.Event.rendered_resolve = _rendered_resolve
+        imgops.composite_image = _composite_image
+        try:
+            yield self
+        finally:
+            for name, method in originals.items():
+                setattr(NINA.Event, name, method)
+            imgops.composite_image = composite_image
+
+    def rows(self, deliveries: dict[tuple[int, int], tuple[Send, int]], sends: list[Send]) -> list[dict[str, Any]]:
+        """The timeline of every event, in milliseconds.
+
+        Args:
+            deliveries: The send of every event and the size of its render, by cycle and event number.
+            sends: The requests made to Discord, to number the messages by.
+        """
+        rows = []
+        for (cycle, number), times in sorted(self.events.items()):
+            send, size = deliveries.get((cycle, number), (None, 0))
+            encode = times.get("encode", 0.0)
+            rows.append({
+                "cycle": cycle,
+                "event": number,
+                "at": times["rendering"] * 1000,
+                "compute": times["compute"] * 1000,
+                "render": (times["rendered"] - times["rendering"] - encode) * 1000,
+                "encode": encode * 1000,
+                "queued": (send.started - times["rendered"]) * 1000 if send else None,
+                "send": (send.finished - send.started) * 1000 if send else None,
+                "bytes": size,
+                "message": sends.index(send) if send else None,
+            })
+        return rows
+
+
+async def run(pack: str, cycles: int, stand_in: Discord, settings: dict[str, Any],
+              mosaic: bool) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    """Set up, ready, cycle and show the status of a game.
+
+    Args:
+        pack: The name of the event pack.
+        cycles: The amount of cycles to run, at most.
+        stand_in: The Discord stand-in.
+        settings: The configuration of the bot, see `templates/example_config.toml`.
+        mosaic: Whether the status is shown as mosaics.
+
+    Returns:
+        The latencies of the commands, and the timeline of the events.
+    """
+    server = ImageServer()
+    await server.start()
+    client = bot.NINABot(confg=settings, intents=discord.Intents.none(), command_prefix="")
+    client.full_tree = []
+    cog = core.Core(client)
+    timeline = Timeline(stand_in)
+    commands = []
+    deliveries = {}
+
+    async def _invoke(name: str, **kwargs: Any) -> list[Send]:
+        interaction = Interaction(client, stand_in, name)
+        first = len(stand_in.sends)
+        await getattr(cog, name).callback(cog, interaction, **kwargs)
+        # Wait for anything the command still has queued.
+        await outbound.SCHEDULER.send(outbound.destination(interaction), lambda: asyncio.sleep(0),
+                                      outbound.Priority.PROGRESS)
+        sends = [send for send in stand_in.sends[first:] if send.command == name]
+        commands.append({
+            "command": name,
+            "at": interaction.invoked * 1000,
+            "ack": ((interaction.response.acknowledged or interaction.invoked) - interaction.invoked) * 1000,
+            "first_send": (sends[0].finished - interaction.invoked) * 1000 if sends else None,
+            "total": (stand_in.now() - interaction.invoked) * 1000,
+            "sends": len(sends),
+            "bytes": sum(send.size for send in sends),
+        })
+        return sends
+
+    try:
+        with timeline.installed():
+            cast = server.attachment("/cast.toml", server.cast())
+            events = server.attachment("/events.toml", PACKS[pack].read_bytes())
+            # The clock starts with the first command, not with generating the images.
+            stand_in.started = time.perf_counter()
+            await _invoke("setup", cast=cast, events=events)
+            await _invoke("ready", seed=SEED)
+            game = await client.games.get(Interaction(client, stand_in, "bench"))
+            for _ in range(cycles):
+                if game.sim.cycle == -1:
+                    break
+                cycle = game.sim.cycle
+                for send in await _invoke("cycle"):
+                    for filename, size in send.files:
+                        # Events are rendered to their number, the other renders aren't numbers.
+                        if pathlib.PurePath(filename).stem.isdigit():
+                            deliveries[(cycle, int(pathlib.PurePath(filename).stem))] = (send, size)
+            await _invoke("status", mosaic=mosaic)
+    finally:
+        await client.close()
+        await server.stop()
+    return commands, timeline.rows(deliveries, stand_in.sends)
+
+
+def _ms(value: float | None) -> str:
+    """A duration in milliseconds, for the report."""
+    return f"{value:9.1f}ms" if value is not None else "        -  "
+
+
+def main() -> int:
+    """Runs the harness, returning the exit code."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-p", "--pack", choices=PACKS, default="events", help="The event pack to play.")
+    parser.add_argument("-c", "--cycles", type=int, default=CYCLES, help="The amount of cycles to run.")
+    parser.add_argument("-b", "--batch", type=int, default=None, help="The maximum amount of events per message.")
+    parser.add_argument("-w", "--workers", type=int, default=2, help="The amount of render worker processes.")
+    parser.add_argument("-f", "--font", default=NINA.FONT, help="The font to render with, a name or a path.")
+    parser.add_argument("--latency", type=float, default=LATENCY, help="The seconds every send takes.")
+    parser.add_argument("--upload", type=float, default=UPLOAD_RATE, help="The MiB per second uploads run at.")
+    parser.add_argument("--pace", type=float, default=NINA.EVENT_PACE, help="The seconds between event messages.")
+    parser.add_argument("--send-rate", type=float, default=outbound.RATE, help="The sends per second per channel.")
+    parser.add_argument("--no-mosaic", action="store_true", help="Show the status one district at a time.")
+    parser.add_argument("--json", type=pathlib.Path, help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    logging.getLogger("NINA").addHandler(logging.NullHandler())
+    logging.getLogger("NINA").propagate = False
+    lazy.preload()
+    NINA.FONT = args.font
+    NINA.EVENT_PACE = args.pace
+    settings = {"render_workers": args.workers, "send_rate": args.send_rate}
+    if args.batch is not None:
+        settings["event_batch"] = args.batch
+    stand_in = Discord(args.latency, args.upload * 1024 * 1024)
+    with tempfile.TemporaryDirectory() as tmp:
+        # The game, its downloads and renders only live as long as the run.
+        NINA.DATA_DIR = pathlib.Path(tmp)
+        NINA.IMAGE_STORE = store.ImageStore(NINA.DATA_DIR / "store")
+        NINA.VARIANT_STORE = store.ImageStore(NINA.DATA_DIR / "variants")
+        commands, events = asyncio.run(run(args.pack, args.cycles, stand_in, settings, not args.no_mosaic))
+
+    for command in commands:
+        print(f"/{command['command']:8} at {command['at'] / 1000:7.2f}s ack {_ms(command['ack'])} "
+              f"first send {_ms(command['first_send'])} total {_ms(command['total'])} "
+              f"{command['sends']:3} sends {command['bytes'] / 1024:8.1f}KiB")
+    print()
+    print("cycle event       at    compute     render     encode     queued       send     bytes message")
+    for event in events:
+        print(f"{event['cycle']:5} {event['event']:5} {event['at'] / 1000:7.2f}s {_ms(event['compute'])}"
+              f"{_ms(event['render'])}{_ms(event['encode'])}{_ms(event['queued'])}{_ms(event['send'])}"
+              f"{event['bytes'] / 1024:7.1f}KiB {event['message'] if event['message'] is not None else '-':>7}")
+    if args.json:
+        args.json.write_text(json.dumps({"commands": commands, "events": events}, indent=2) + "\n", "utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,316 @@
+"""Measures the throughput of the simulation engine, failing when a scenario regressed from its baseline.
+
+Scenarios run the sample cast against each bundled event pack, as is and scaled up synthetically.
+Scaled casts copy the sample districts and their members, keeping the size of the districts.
+Nothing is rendered or downloaded, cycles are computed like they are without an interaction.
+Reported are the events resolved per second, cycle latency percentiles, the time spent in the main event methods,
+and the peak memory allocated. The method times are inclusive, so nested calls count toward both methods.
+
+Runs aren't entirely reproducible, even with fixed seeds, as some choices follow the order of sets of tributes.
+Scenarios are run a few times, as long as they have the time, and the cycles of all runs are pooled.
+Baselines are machine specific, so none are committed. The first run on a machine saves its results as the baselines,
+later runs compare against them. Refresh them with `--save`.
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2023-present Tech. TTGames
+
+import argparse
+import asyncio
+import contextlib
+import functools
+import json
+import logging
+import os
+import pathlib
+import statistics
+import sys
+import time
+import tomllib
+import tracemalloc
+from typing import Any, Callable, Iterator
+
+ROOT = pathlib.Path(__file__).parent.parent
+"""The root of the repository."""
+sys.path.insert(0, str(ROOT))
+
+# pylint: disable=wrong-import-position
+from NINA.ext import NINA
+
+SAMPLES = ROOT / "templates" / "samples"
+"""The directory of the sample packs."""
+CAST = SAMPLES / "cast.toml"
+"""The cast all scenarios start from."""
+PACKS = {
+    "events": ROOT / "templates" / "events.toml",
+    "dixie": SAMPLES / "dixie_events.toml",
+    "dixie_experimental": SAMPLES / "dixie_events_experimental.toml",
+}
+"""The event packs, by name."""
+SCALES = (1, 10, 100)
+"""The default sizes of the casts, as multiples of the sample cast."""
+BASELINES = ROOT / "utils" / "baselines" / "engine.json"
+"""The file the baselines are stored in, local to the machine and ignored by git."""
+SEED = "1234"
+"""The seed every simulation is readied with."""
+CYCLES = 20
+"""The default maximum amount of cycles computed per scenario."""
+BUDGET = 30.0
+"""The default seconds of cycles after which a scenario stops early. Big casts take that long for a single cycle."""
+RUNS = 3
+"""The default minimum amount of runs per scenario."""
+MIN_SECONDS = 2.0
+"""The seconds of cycles a scenario is measured for at least, within its budget."""
+TOLERANCE = 0.3
+"""The default fraction a metric may be worse than its baseline by."""
+PHASES = ("check_requirements", "affiliationresolution", "resolve")
+"""The methods of events timed."""
+
+
+class PhaseTimer:
+    """Accumulates the time spent in methods of NINA.Event, counting recursive calls once.
+
+    Attributes:
+        seconds: The seconds spent in each method.
+        calls: The amount of outermost calls of each method.
+    """
+    seconds: dict[str, float]
+    calls: dict[str, int]
+
+    def __init__(self) -> None:
+        """Initialize the PhaseTimer object."""
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.calls = dict.fromkeys(PHASES, 0)
+        self._depth = dict.fromkeys(PHASES, 0)
+
+    def _wrap(self, name: str, method: Callable[..., Any]) -> Callable[..., Any]:
+        """Time a method, synchronous or not."""
+
+        @contextlib.contextmanager
+        def _timed() -> Iterator[None]:
+            self._depth[name] += 1
+            started = time.perf_counter()
+            try:
+                yield
+            finally:
+                self._depth[name] -= 1
+                if not self._depth[name]:
+                    self.seconds[name] += time.perf_counter() - started
+                    self.calls[name] += 1
+
+        if asyncio.iscoroutinefunction(method):
+
+            @functools.wraps(method)
+            async def _async(*args, **kwargs):
+                with _timed():
+                    return await method(*args, **kwargs)
+
+            return _async
+
+        @functools.wraps(method)
+        def _sync(*args, **kwargs):
+            with _timed():
+                return method(*args, **kwargs)
+
+        return _sync
+
+    @contextlib.contextmanager
+    def installed(self) -> Iterator["PhaseTimer"]:
+        """Time the methods for the duration of the context."""
+        originals = {name: getattr(NINA.Event, name) for name in PHASES}
+        for name, method in originals.items():
+            setattr(NINA.Event, name, self._wrap(name, method))
+        try:
+            yield self
+        finally:
+            for name, method in originals.items():
+                setattr(NINA.Event, name, method)
+
+
+def build(pack: str, scale: int) -> NINA.Simulation:
+    """Create the simulation of a scenario.
+
+    Args:
+        pack: The name of the event pack.
+        scale: The size of the cast, as a multiple of the sample cast.
+    """
+    sim = NINA.Simulation(CAST, PACKS[pack])
+    per_district = len(sim.cast) // len(sim.districts)
+    if scale > 1:
+        with open(CAST, "rb") as file:
+            data = tomllib.load(file)
+        dead_image = data.get("dead_image", "BW")
+        sim.districts = [
+            NINA.District({
+                "name": f"{district['name']} {copy}",
+                "color": district["color"]
+            }) for copy in range(scale) for district in data["districts"]
+        ]
+        sim.cast = [
+            NINA.Tribute({
+                **tribute, "name": f"{tribute['name']} {copy}",
+                "nickname": f"{tribute['nickname']} {copy}"
+            }, dead_image) for copy in range(scale) for tribute in data["cast"][:per_district * len(data["districts"])]
+        ]
+    # Readying needs as many members in every district.
+    sim.cast = sim.cast[:per_district * len(sim.districts)]
+    return sim
+
+
+async def simulate(pack: str,
+                   scale: int,
+                   cycles: int,
+                   budget: float = float("inf")) -> tuple[float, list[float], PhaseTimer]:
+    """Ready a scenario and compute its cycles.
+
+    Args:
+        pack: The name of the event pack.
+        scale: The size of the cast, as a multiple of the sample cast.
+        cycles: The maximum amount of cycles to compute.
+        budget: The seconds of cycles after which no more cycles are computed.
+
+    Returns:
+        The seconds readying took, the seconds each cycle took, and the method times.
+    """
+    sim = build(pack, scale)
+    with PhaseTimer().installed() as timer:
+        started = time.perf_counter()
+        await sim.ready(SEED)
+        ready = time.perf_counter() - started
+        latencies = []
+        while sim.cycle != -1 and len(latencies) < cycles and sum(latencies) < budget:
+            started = time.perf_counter()
+            await sim.computecycle()
+            latencies.append(time.perf_counter() - started)
+    return ready, latencies, timer
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """The value below which a fraction of the values fall, interpolated."""
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[round(fraction * 100) - 1]
+
+
+def run(pack: str, scale: int, cycles: int, budget: float, runs: int, memory: bool) -> dict[str, Any]:
+    """Benchmark a scenario.
+
+    Small scenarios are run again until they were measured for MIN_SECONDS, and their runs pooled.
+
+    Args:
+        pack: The name of the event pack.
+        scale: The size of the cast, as a multiple of the sample cast.
+        cycles: The maximum amount of cycles to compute per run.
+        budget: The seconds of cycles after which no more cycles, or runs, are computed.
+        runs: The minimum amount of runs, within the budget.
+        memory: Whether to measure the peak memory, in another run of as many cycles,
+            as tracing slows everything down.
+
+    Returns:
+        The metrics of the scenario. Times of readying and of the methods are per run.
+    """
+    readies = []
+    latencies = []
+    events = 0
+    phases = dict.fromkeys(PHASES, 0.0)
+    first_cycles = 0
+    while sum(latencies) < budget and (len(readies) < runs or sum(latencies) < MIN_SECONDS):
+        ready, run_latencies, timer = asyncio.run(simulate(pack, scale, cycles, budget - sum(latencies)))
+        readies.append(ready)
+        latencies.extend(run_latencies)
+        events += timer.calls["resolve"]
+        for name in PHASES:
+            phases[name] += timer.seconds[name]
+        first_cycles = first_cycles or len(run_latencies)
+    total = sum(latencies)
+    result = {
+        "cast": len(build(pack, scale).cast),
+        "runs": len(readies),
+        "cycles": len(latencies),
+        "events": events,
+        "events_per_s": events / total if total else 0.0,
+        "ready_ms": statistics.median(readies) * 1000,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p90_ms": percentile(latencies, 0.9) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": max(latencies) * 1000,
+    }
+    for name in PHASES:
+        result[f"{name}_ms"] = phases[name] / len(readies) * 1000
+    if memory:
+        tracemalloc.start()
+        try:
+            asyncio.run(simulate(pack, scale, first_cycles))
+            result["peak_mib"] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def regressions(result: dict[str, Any], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    """The metrics of a scenario worse than their baseline by more than the tolerance.
+
+    Args:
+        result: The metrics of the scenario.
+        baseline: The baseline metrics of the scenario.
+        tolerance: The fraction a metric may be worse by.
+    """
+    worse = []
+    if result["events_per_s"] < baseline["events_per_s"] * (1 - tolerance):
+        worse.append("events_per_s")
+    for metric in ("p50_ms", "p90_ms", "peak_mib"):
+        if metric in result and metric in baseline and result[metric] > baseline[metric] * (1 + tolerance):
+            worse.append(metric)
+    return worse
+
+
+def main() -> int:
+    """Runs the benchmark, returning the exit code."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-p", "--packs", nargs="+", choices=PACKS, default=list(PACKS), help="The event packs to run.")
+    parser.add_argument("-s", "--scales", nargs="+", type=int, default=SCALES, help="The cast sizes to run.")
+    parser.add_argument("-c", "--cycles", type=int, default=CYCLES, help="The maximum amount of cycles per scenario.")
+    parser.add_argument("-b", "--budget", type=float, default=BUDGET, help="The seconds of cycles per scenario.")
+    parser.add_argument("-r", "--runs", type=int, default=RUNS, help="The minimum amount of runs per scenario.")
+    parser.add_argument("-t", "--tolerance", type=float, default=TOLERANCE, help="The allowed regression fraction.")
+    parser.add_argument("--no-memory", action="store_true", help="Skip measuring the peak memory.")
+    parser.add_argument("--save", action="store_true", help="Store the results as the new baselines.")
+    args = parser.parse_args()
+
+    # Which events are picked depends on the order of sets of strings, so string hashing has to be fixed too.
+    if os.environ.get("PYTHONHASHSEED") != "0":
+        os.environ["PYTHONHASHSEED"] = "0"
+        os.execv(sys.executable, [sys.executable, *sys.argv])
+    logging.getLogger("NINA").addHandler(logging.NullHandler())
+    logging.getLogger("NINA").propagate = False
+
+    baselines = json.loads(BASELINES.read_text("utf-8")) if BASELINES.exists() else {}
+    results = {}
+    failed = False
+    for pack in args.packs:
+        for scale in args.scales:
+            scenario = f"{pack}@{scale}x"
+            result = results[scenario] = run(pack, scale, args.cycles, args.budget, args.runs, not args.no_memory)
+            worse = [] if args.save or scenario not in baselines else regressions(
+                result, baselines[scenario], args.tolerance)
+            failed |= bool(worse)
+            phases = " ".join(f"{name}={result[f'{name}_ms']:.0f}ms" for name in PHASES)
+            memory = f" peak={result['peak_mib']:.1f}MiB" if "peak_mib" in result else ""
+            print(f"{'FAIL' if worse else 'OK':4} {scenario:26} {result['cast']:5} tributes "
+                  f"{result['events']:6} events {result['events_per_s']:9.0f}/s "
+                  f"p50={result['p50_ms']:.1f}ms p90={result['p90_ms']:.1f}ms p99={result['p99_ms']:.1f}ms "
+                  f"ready={result['ready_ms']:.0f}ms {phases}{memory}"
+                  f"{f' regressed: {", ".join(worse)}' if worse else ''}")
+    # Scenarios without a baseline on this machine become their own.
+    saved = results if args.save else {
+        scenario: result for scenario, result in results.items() if scenario not in baselines
+    }
+    if saved:
+        BASELINES.parent.mkdir(parents=True, exist_ok=True)
+        BASELINES.write_text(json.dumps({**baselines, **saved}, indent=2, sort_keys=True) + "\n", "utf-8")
+        print(f"Saved {len(saved)} baselines to {BASELINES.relative_to(ROOT)}.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
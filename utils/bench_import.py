@@ -0,0 +1,107 @@
+"""Measures the import time of NINA's entry points, failing when one goes over its budget.
+
+Every measurement imports in a fresh interpreter, so nothing is cached but the bytecode.
+The engine and the package must also not pull in discord.py, Pillow and friends, which only rendering needs.
+Run with `-v` to see the slowest modules of each entry point, as reported by `python -X importtime`.
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2023-present Tech. TTGames
+
+import argparse
+import json
+import pathlib
+import statistics
+import subprocess
+import sys
+
+ROOT = pathlib.Path(__file__).parent.parent
+"""The root of the repository, imported from."""
+HEAVY = ("discord", "PIL.Image", "aiohttp", "owo", "colorama")
+"""The modules only needed to render and deliver."""
+BUDGETS = {
+    "NINA": (100, False),
+    "NINA.ext.NINA": (250, False),
+    "NINA.bot": (1500, True),
+}
+"""The entry points, with their budgets in milliseconds and whether they may import the heavy packages."""
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+# Lazily imported modules stay placeholders until they're used.
+print(json.dumps([elapsed, [name for name in {heavy} if type(sys.modules.get(name)).__name__ == "module"]]))
+"""
+
+
+def measure(module: str) -> tuple[float, list[str]]:
+    """Import a module in a fresh interpreter.
+
+    Args:
+        module: The module to import.
+
+    Returns:
+        The seconds the import took, and the heavy modules it executed.
+    """
+    probe = _PROBE.format(module=module, heavy=HEAVY)
+    result = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, capture_output=True, text=True, check=True)
+    elapsed, heavy = json.loads(result.stdout.splitlines()[-1])
+    return elapsed, heavy
+
+
+def slowest(module: str, count: int = 10) -> list[tuple[int, str]]:
+    """The modules taking the longest to import, including their own imports.
+
+    Args:
+        module: The module to import.
+        count: The amount of modules to list.
+
+    Returns:
+        The cumulative microseconds and names of the modules, slowest first.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT,
+                            capture_output=True,
+                            text=True,
+                            check=True)
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        times.append((int(cumulative), name.strip()))
+    return sorted(times, reverse=True)[:count]
+
+
+def main() -> int:
+    """Runs the benchmark, returning the exit code."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--runs", type=int, default=5, help="The amount of imports measured per entry point.")
+    parser.add_argument("-s", "--scale", type=float, default=1.0, help="Multiplies every budget, for slow machines.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="List the slowest modules of each entry point.")
+    args = parser.parse_args()
+
+    # The first import compiles the bytecode, which isn't what's measured.
+    for module in BUDGETS:
+        measure(module)
+    failed = False
+    for module, (budget, heavy_allowed) in BUDGETS.items():
+        runs = [measure(module) for _ in range(args.runs)]
+        median = statistics.median(elapsed for elapsed, _ in runs) * 1000
+        heavy = runs[0][1]
+        over = median > budget * args.scale
+        leaked = bool(heavy) and not heavy_allowed
+        failed |= over or leaked
+        status = "FAIL" if over or leaked else "OK"
+        print(f"{status:4} {module:16} {median:8.1f}ms (budget {budget * args.scale:.0f}ms)"
+              f"{f', imports {", ".join(heavy)}' if leaked else ''}")
+        if args.verbose:
+            for cumulative, name in slowest(module):
+                print(f"     {cumulative / 1000:8.1f}ms {name}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
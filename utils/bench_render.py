@@ -0,0 +1,434 @@
+"""Measures the rendering and encoding of NINA, failing when a render no longer looks like its golden image.
+
+Tribute images are generated locally, static and animated in various sizes, and stored like downloads would be.
+Nothing touches the network. Every case renders from cold caches, like the first render of a fresh game.
+Reported are the time taken, the bytes produced and the peak memory. On Linux, that's the peak resident memory
+above the resident memory at the start of the case, so memory the allocator already held isn't counted.
+Elsewhere, only the memory allocated by Python is traced.
+
+Renders are compared against golden images with a perceptual tolerance, as encoders don't produce identical bytes
+across versions and platforms. Renders with text depend on the font, so their goldens are kept per font.
+Save new goldens with `--save`, after making sure the renders look right.
+"""
+# License: EPL-2.0
+# SPDX-License-Identifier: EPL-2.0
+# Copyright (c) 2023-present Tech. TTGames
+
+import argparse
+import asyncio
+import contextlib
+import io
+import logging
+import math
+import pathlib
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable, Iterator
+
+from PIL import Image
+from PIL import ImageChops
+from PIL import ImageDraw
+from PIL import ImageFont
+
+ROOT = pathlib.Path(__file__).parent.parent
+"""The root of the repository."""
+sys.path.insert(0, str(ROOT))
+
+# pylint: disable=wrong-import-position
+from NINA.ext import imgops
+from NINA.ext import NINA
+from NINA.ext import store
+from NINA.ext import workers
+
+CAST = ROOT / "templates" / "samples" / "cast.toml"
+"""The cast the renders are made for."""
+EVENTS = ROOT / "templates" / "events.toml"
+"""The events the renders are made for."""
+GOLDENS = ROOT / "utils" / "baselines" / "render"
+"""The directory of the golden images. Those of renders with text are in a subdirectory per font."""
+SEED = "1234"
+"""The seed the simulation is readied with."""
+RUNS = 3
+"""The default amount of runs per case, of which the fastest is reported."""
+MEAN_ERROR = 3.0
+"""The mean difference of the channels, out of 255, a render may have from its golden image."""
+VISIBLE_ERROR = 32
+"""The difference of a channel, out of 255, from which a pixel counts as visibly different."""
+VISIBLE_PIXELS = 0.01
+"""The fraction of pixels that may differ visibly from the golden image."""
+TILES = {
+    "static_small": ((64, 64), 1, "PNG"),
+    "static_wide": ((1920, 1080), 1, "PNG"),
+    "static_large": ((2048, 2048), 1, "JPEG"),
+    "animated_gif": ((256, 256), 12, "GIF"),
+    "animated_webp": ((512, 512), 12, "WEBP"),
+}
+"""The generated tribute images, by name: their size, amount of frames and format."""
+SHORT_TEXT = "Nina stays put."
+"""A short event text."""
+LONG_TEXT = ("Nina sets up an elaborate trap, waits for hours in the rain, gets bored, wanders off to find some food, "
+             "and comes back to find that Machlian and Xinghuan walked into it together.")
+"""An event text long enough to be wrapped over several lines."""
+
+
+def make_tile(name: str) -> bytes:
+    """Generate a tribute image, the same on every run.
+
+    Args:
+        name: The name of the tile, in TILES.
+
+    Returns:
+        The encoded image.
+    """
+    size, frames, fmt = TILES[name]
+    images = []
+    for frame in range(frames):
+        gradient = Image.linear_gradient("L")
+        im = Image.merge("RGB", (gradient.resize(size), gradient.transpose(Image.Transpose.ROTATE_90).resize(size),
+                                 Image.new("L", size, 128)))
+        draw = ImageDraw.Draw(im)
+        radius = min(size) // 4
+        x = size[0] // 2 + round(math.cos(2 * math.pi * frame / frames) * radius)
+        y = size[1] // 2 + round(math.sin(2 * math.pi * frame / frames) * radius)
+        draw.ellipse((x - radius // 2, y - radius // 2, x + radius // 2, y + radius // 2), fill=(255, 255, 255))
+        draw.rectangle((0, 0, size[0] // 8, size[1] // 8), fill=(0, 0, 0))
+        if frames > 1:
+            # Like most animations, a few colors. Smooth gradients take lossless WebP minutes to encode.
+            im = im.quantize(32, dither=Image.Dither.NONE).convert("RGB")
+        images.append(im)
+    buffer = io.BytesIO()
+    if frames > 1:
+        images[0].save(buffer, fmt, save_all=True, append_images=images[1:], duration=80, loop=0, lossless=True)
+    else:
+        images[0].save(buffer, fmt)
+    return buffer.getvalue()
+
+
+class Case:
+    """A measured render.
+
+    Attributes:
+        name: The name of the case, also of its golden image.
+        text: Whether the render has text on it, making it depend on the font.
+        seconds: The seconds the fastest run took.
+        size: The bytes produced.
+        peak: The peak memory in bytes.
+        output: The encoded render of the last run.
+    """
+    name: str
+    text: bool
+    seconds: float
+    size: int
+    peak: int
+    output: bytes
+
+    def __init__(self, name: str, text: bool) -> None:
+        """Initialize the Case object.
+
+        Args:
+            name: The name of the case.
+            text: Whether the render has text on it.
+        """
+        self.name = name
+        self.text = text
+        self.seconds = float("inf")
+        self.size = 0
+        self.peak = 0
+        self.output = b""
+
+    def golden(self, font: str) -> pathlib.Path:
+        """The golden image of the case.
+
+        Args:
+            font: The font renders are made with.
+        """
+        if self.text:
+            return GOLDENS / pathlib.Path(font).stem / f"{self.name}.webp"
+        return GOLDENS / f"{self.name}.webp"
+
+
+@contextlib.contextmanager
+def peak_memory() -> Iterator[list[int]]:
+    """Measure the peak memory of the context, in bytes, into the yielded list."""
+    status = pathlib.Path("/proc/self/status")
+    peak = [0]
+
+    def _read(field: str) -> int:
+        for line in status.read_text().splitlines():
+            if line.startswith(field):
+                return int(line.split()[1]) * 1024
+        return 0
+
+    try:
+        # Resets the peak resident memory of the process.
+        pathlib.Path("/proc/self/clear_refs").write_text("5")
+    except OSError:
+        tracemalloc.start()
+        try:
+            yield peak
+        finally:
+            peak[0] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        return
+    start = _read("VmRSS:")
+    yield peak
+    peak[0] = max(0, _read("VmHWM:") - start)
+
+
+class Bench:
+    """Renders cases over a simulation of generated tribute images.
+
+    Attributes:
+        tmp: The directory the stores live in.
+        sources: The store sources of the generated tiles, by name.
+        cases: The measured cases.
+        runs: The amount of runs per case.
+    """
+    tmp: pathlib.Path
+    sources: dict[str, str]
+    cases: list[Case]
+    runs: int
+
+    def __init__(self, tmp: pathlib.Path, runs: int) -> None:
+        """Initialize the Bench object.
+
+        Args:
+            tmp: The directory the stores live in.
+            runs: The amount of runs per case.
+        """
+        self.tmp = tmp
+        self.runs = runs
+        self.sources = {}
+        self.cases = []
+        self._stores = 0
+
+    async def prepare(self) -> None:
+        """Generate the tiles and store them, normalized like downloads are."""
+        NINA.IMAGE_STORE = store.ImageStore(self.tmp / "store")
+
+        def _normalize(raw):
+            return imgops.encode_sync(imgops.resize(Image.open(raw)))
+
+        for name in TILES:
+            self.sources[name] = f"bench://{name}"
+            await NINA.IMAGE_STORE.put(self.sources[name], await asyncio.to_thread(make_tile, name), _normalize)
+
+    async def simulation(self) -> NINA.Simulation:
+        """A freshly readied simulation whose tributes use the generated tiles, with cold caches."""
+        NINA.VARIANT_STORE = store.ImageStore(self.tmp / f"variants-{self._stores}")
+        self._stores += 1
+        NINA.TILE_CACHE.clear()
+        sim = NINA.Simulation(CAST, EVENTS, data_dir=self.tmp / "data")
+        sim.cast = sim.cast[:len(sim.cast) // len(sim.districts) * len(sim.districts)]
+        names = list(TILES)
+        for i, tribute in enumerate(sim.cast):
+            tribute.images = {"alive": self.sources[names[i % len(names)]], "dead": self.sources["static_small"]}
+        await sim.ready(SEED)
+        return sim
+
+    async def measure(self, name: str, text: bool, render: Callable[[], Awaitable[bytes]],
+                      setup: Callable[[], Awaitable[Any]] | None = None) -> Case:
+        """Time a render over several runs.
+
+        Args:
+            name: The name of the case.
+            text: Whether the render has text on it.
+            render: Renders, returning the encoded render. Called with the result of setup, if any.
+            setup: Prepares every run, untimed.
+        """
+        case = Case(name, text)
+        for _ in range(self.runs):
+            state = await setup() if setup else None
+            with peak_memory() as peak:
+                started = time.perf_counter()
+                output = await (render(state) if setup else render())
+                elapsed = time.perf_counter() - started
+            case.seconds = min(case.seconds, elapsed)
+            case.peak = max(case.peak, peak[0])
+            case.size = len(output)
+            case.output = output
+        self.cases.append(case)
+        return case
+
+    async def run(self) -> None:
+        """Measure every case."""
+        await self.prepare()
+        for name in TILES:
+            raw = make_tile(name)
+            await self.measure(f"resize.{name}", False,
+                               lambda raw=raw: asyncio.to_thread(lambda: imgops.encode_sync(
+                                   imgops.resize(Image.open(io.BytesIO(raw)), border_c="#ff7b00"))))
+
+        sim = await self.simulation()
+        for length, text in (("short", SHORT_TEXT), ("long", LONG_TEXT)):
+
+            def _draw(text=text) -> bytes:
+                canvas = Image.new("RGBA", (1792, 640), (0, 0, 0, 0))
+                NINA.draw_max_text(canvas, text, (canvas.width, 128), "md", (canvas.width // 2, 640), sim.draw_args)
+                return imgops.encode_sync(canvas)
+
+            await self.measure(f"draw_max_text.{length}", True, lambda _draw=_draw: asyncio.to_thread(_draw))
+
+        for count in (1, 2, 3, 5):
+
+            async def _resolve_setup(count=count):
+                sim = await self.simulation()
+                event = next(event for cycle in sim.cycles for event in cycle.events
+                             if len(event.tribute_changes) == count)
+                return sim, event
+
+            async def _resolve(state, count=count):
+                sim, event = state
+                _, render = await event.rendered_resolve(sim.cast[:count], sim, 1)
+                return render.data
+
+            await self.measure(f"rendered_resolve.{count}_tributes", True, _resolve, _resolve_setup)
+
+        for name, index, dead in (("static", 0, False), ("animated", 4, False), ("dead", 1, True)):
+
+            async def _status_setup(index=index, dead=dead):
+                sim = await self.simulation()
+                sim.cast[index].status = int(dead)
+                return sim, sim.cast[index]
+
+            async def _status(state):
+                sim, tribute = state
+                return (await tribute.get_status_render(sim)).data
+
+            await self.measure(f"status_render.{name}", True, _status, _status_setup)
+
+        async def _district(sim):
+            return (await sim.districts[1].get_render(sim)).data
+
+        await self.measure("district_render", True, _district, self.simulation)
+
+        for name, count, request in (("mortem_1", 1, 0), ("mortem_6", 6, 0), ("victors_3", 3, 1)):
+
+            async def _endcycle_setup(count=count, request=request):
+                sim = await self.simulation()
+                for tribute in sim.cast[:count]:
+                    tribute.status = 1 - request
+                return sim
+
+            async def _endcycle(sim, count=count, request=request):
+                return (await NINA.generate_endcycle(1, sim.cast[:count], sim, request)).data
+
+            await self.measure(f"endcycle.{name}", True, _endcycle, _endcycle_setup)
+
+        await self.measure_fallbacks()
+
+    async def measure_fallbacks(self) -> None:
+        """Time magicsave_sync running into each of its fallback strategies.
+
+        The size limit is lowered to just under the output of the previous strategy, so the next one has to be used.
+        The render is static and full of detail, so every strategy produces less than the one before.
+        """
+        boxes = ((-2.0, -1.25, 0.5, 1.25), (-0.8, 0.0, -0.7, 0.1), (-0.75, 0.05, -0.74, 0.06))
+        image = Image.merge("RGB", [Image.effect_mandelbrot(imgops.SIZE, box, 256) for box in boxes])
+        limit = imgops.MAX_DISCORD_SIZE
+        path = self.tmp / "fallback.webp"
+        try:
+            for strategy in ("lossless", "quality_90", "quality_75", "quality_50", "minimum"):
+
+                def _save() -> bytes:
+                    imgops.magicsave_sync(image, path)
+                    return path.read_bytes()
+
+                case = await self.measure(f"magicsave.{strategy}", False, lambda _save=_save: asyncio.to_thread(_save))
+                imgops.MAX_DISCORD_SIZE = case.size
+        finally:
+            imgops.MAX_DISCORD_SIZE = limit
+
+
+def frames_of(data: bytes) -> list[Image.Image]:
+    """The first, middle and last frames of an encoded image, in RGBA.
+
+    Args:
+        data: The encoded image.
+    """
+    im = Image.open(io.BytesIO(data))
+    frames = []
+    for index in sorted({0, getattr(im, "n_frames", 1) // 2, getattr(im, "n_frames", 1) - 1}):
+        im.seek(index)
+        frames.append(im.convert("RGBA"))
+    return frames
+
+
+def compare(output: bytes, golden: bytes) -> str | None:
+    """Compare a render with its golden image.
+
+    Args:
+        output: The encoded render.
+        golden: The encoded golden image.
+
+    Returns:
+        What differs too much, or None if they look the same.
+    """
+    outputs, goldens = frames_of(output), frames_of(golden)
+    if len(outputs) != len(goldens) or Image.open(io.BytesIO(output)).size != Image.open(io.BytesIO(golden)).size:
+        return "size or frames differ"
+    for ours, theirs in zip(outputs, goldens):
+        diff = ImageChops.difference(ours, theirs)
+        histogram = diff.histogram()
+        mean = statistics.fmean(
+            sum(value * count for value, count in enumerate(histogram[band * 256:(band + 1) * 256])) /
+            (diff.width * diff.height) for band in range(4))
+        # A pixel differs visibly if any of its channels does.
+        worst = diff.getchannel(0)
+        for band in range(1, 4):
+            worst = ImageChops.lighter(worst, diff.getchannel(band))
+        visible = sum(worst.histogram()[VISIBLE_ERROR:]) / (diff.width * diff.height)
+        if mean > MEAN_ERROR or visible > VISIBLE_PIXELS:
+            return f"mean error {mean:.2f}, {visible:.2%} visibly different"
+    return None
+
+
+def main() -> int:
+    """Runs the benchmark, returning the exit code."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-f", "--font", default=NINA.FONT, help="The font to render with, a name or a path.")
+    parser.add_argument("-r", "--runs", type=int, default=RUNS, help="The amount of runs per case.")
+    parser.add_argument("-w", "--workers", type=int, default=0, help="The amount of render worker processes.")
+    parser.add_argument("--save", action="store_true", help="Store the renders as the new golden images.")
+    args = parser.parse_args()
+
+    try:
+        ImageFont.truetype(args.font, 16)
+    except OSError:
+        print(f"The font {args.font} isn't installed. Pass another one with --font.")
+        return 2
+    NINA.FONT = args.font
+    workers.POOL.workers = args.workers
+    # Falling back to the minimum quality warns, which is expected here.
+    logging.getLogger("NINA").addHandler(logging.NullHandler())
+    logging.getLogger("NINA").propagate = False
+    with tempfile.TemporaryDirectory() as tmp:
+        bench = Bench(pathlib.Path(tmp), args.runs)
+        try:
+            asyncio.run(bench.run())
+        finally:
+            workers.POOL.shutdown()
+
+    failed = False
+    for case in bench.cases:
+        golden = case.golden(args.font)
+        if args.save:
+            golden.parent.mkdir(parents=True, exist_ok=True)
+            golden.write_bytes(case.output)
+            status, detail = "SAVE", ""
+        elif not golden.exists():
+            status, detail = "NEW", " no golden image"
+        else:
+            difference = compare(case.output, golden.read_bytes())
+            status, detail = ("FAIL", f" {difference}") if difference else ("OK", "")
+            failed |= bool(difference)
+        print(f"{status:4} {case.name:32} {case.seconds * 1000:9.1f}ms {case.size / 1024:9.1f}KiB "
+              f"peak={case.peak / 1024 / 1024:.1f}MiB{detail}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())